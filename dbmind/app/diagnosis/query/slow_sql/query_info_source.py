@@ -24,6 +24,7 @@ from dbmind.common.parser.sql_parsing import fill_value, standardize_sql
 from dbmind.common.parser.sql_parsing import get_generate_prepare_sqls_function
 from dbmind.common.parser.sql_parsing import remove_parameter_part, is_query_normalized
 from dbmind.common.parser.sql_parsing import replace_question_mark_with_value, replace_question_mark_with_dollar
+from dbmind.common.sequence_buffer import dict_belongs_to, is_dict_matched_regex
 from dbmind.common.types import Sequence
 from dbmind.common.utils import ExceptionCatcher
 from dbmind.components.sql_rewriter.sql_rewriter import rewrite_sql_api
@@ -57,6 +58,30 @@ def exception_follower(output=None):
 
 REQUIRED_PARAMETERS = ('enable_nestloop', 'enable_hashjoin', 'enable_mergejoin', 'enable_thread_pool',
                        'enable_indexscan', 'enable_hashagg', 'enable_sort', 'max_connections')
+# The metrics below are fetched by every slow query context. Hence, we prefetch them
+# for a batch of slow queries at once, see ``prefetch_query_contexts()``.
+# The key is the metric name and the value is the extra label regex to narrow the result.
+PREFETCHED_INSTANCE_METRICS = {
+    'pg_settings_setting': {'name': '|'.join(REQUIRED_PARAMETERS)},
+    'gaussdb_total_connection': {},
+    'gaussdb_qps_by_instance': {},
+    'pg_thread_pool_rate': {},
+}
+PREFETCHED_HOST_METRICS = {
+    'os_disk_ioutils': {},
+    'os_disk_usage': {},
+    'os_cpu_usage': {},
+    'os_mem_usage': {},
+    'os_process_fds_rate': {},
+    'os_cpu_processor_number': {},
+    'os_network_receive_drop': {},
+    'os_network_transmit_drop': {},
+    'os_network_transmit_bytes': {},
+    'os_network_receive_bytes': {},
+}
+# Don't let the union window exceed one hour. Otherwise, DAI will
+# estimate a coarser step than the one of each slow query's window.
+MAX_PREFETCH_WINDOW_SECONDS = 3600
 
 
 class TableStructure:
@@ -333,6 +358,41 @@ def _get_driver_value(rows, key, precision=0, default=0):
         return rows[0].get(key, default) if len(rows) == 1 else [item.get(key, default) for item in rows]
 
 
+class PrefetchedFetcher:
+    """It has the same chained interface with ``dai.LazyFetcher``,
+    but only filters the prefetched sequences in memory."""
+
+    def __init__(self, server, sequences):
+        # All the prefetched sequences come from the ``server``.
+        self.server = server
+        self.sequences = sequences
+        self.labels = dict()
+        self.labels_like = dict()
+        self.is_server_matched = True
+
+    def filter(self, **kwargs):
+        self.labels.update(kwargs)
+        return self
+
+    def from_server(self, host):
+        self.is_server_matched = self.is_server_matched and host == self.server
+        return self
+
+    def filter_like(self, **kwargs):
+        self.labels_like.update(kwargs)
+        return self
+
+    def fetchall(self):
+        if not self.is_server_matched:
+            return []
+        return [s for s in self.sequences
+                if dict_belongs_to(s.labels, self.labels) and is_dict_matched_regex(s.labels, self.labels_like)]
+
+    def fetchone(self):
+        rv = self.fetchall()
+        return rv[0] if rv else Sequence()
+
+
 class QueryContextFromTSDBAndRPC(QueryContext):
     """The object of slow query data processing factory"""
 
@@ -343,6 +403,8 @@ class QueryContextFromTSDBAndRPC(QueryContext):
         :param expansion_factor: Ensure that the time expansion rate of the data can be collected
         """
         super().__init__(slow_sql_instance)
+        # metric name -> (server, sequences), filled by ``prefetch_query_contexts()``.
+        self.prefetched_sequences = dict()
         self.query_type = 'raw'
         self.fetch_interval = self.acquire_fetch_interval()
         self.expansion_factor = kwargs.get('expansion_factor', 2)
@@ -409,6 +471,26 @@ class QueryContextFromTSDBAndRPC(QueryContext):
         else:
             self.is_sql_valid = False
 
+    def attach_prefetched_sequences(self, metric_name, server, sequences):
+        """Only keep the slice that falls into the time window of this query."""
+        start = int(self.query_start_time.timestamp() * 1000)
+        end = int(self.query_end_time.timestamp() * 1000)
+        sliced = []
+        for sequence in sequences:
+            sub = sequence[start, end]
+            if len(sub) == 0:
+                continue
+            # Copy the slice to cut off the reference of the whole
+            # sequence, which is pickled to the worker along with the context.
+            sliced.append(Sequence(sub.timestamps, sub.values, name=sub.name,
+                                   step=sequence.step, labels=sub.labels))
+        self.prefetched_sequences[metric_name] = (server, sliced)
+
+    def get_metric_sequence(self, metric_name):
+        if metric_name in self.prefetched_sequences:
+            return PrefetchedFetcher(*self.prefetched_sequences[metric_name])
+        return dai.get_metric_sequence(metric_name, self.query_start_time, self.query_end_time)
+
     @exception_follower(output=list)
     @exception_catcher
     def adjust_schema(self):
@@ -528,42 +610,30 @@ class QueryContextFromTSDBAndRPC(QueryContext):
                 table_info.db_name = self.slow_sql_instance.db_name
                 table_info.schema_name = schema_name
                 table_info.table_name = table_name
-                dead_rate_info = dai.get_metric_sequence("pg_tables_structure_dead_rate",
-                                                         self.query_start_time,
-                                                         self.query_end_time).from_server(
+                dead_rate_info = self.get_metric_sequence("pg_tables_structure_dead_rate").from_server(
                     self.slow_sql_instance.instance).filter(
                     datname=f"{self.slow_sql_instance.db_name}").filter(
                     schemaname=f"{schema_name}").filter(relname=f"{table_name}").fetchone()
                 if is_sequence_valid(dead_rate_info):
                     table_info.dead_rate = _get_sequence_first_value(dead_rate_info, precision=4)
-                    live_tup_info = dai.get_metric_sequence("pg_tables_structure_n_live_tup",
-                                                            self.query_start_time,
-                                                            self.query_end_time).from_server(
+                    live_tup_info = self.get_metric_sequence("pg_tables_structure_n_live_tup").from_server(
                         self.slow_sql_instance.instance).filter(
                         datname=f"{self.slow_sql_instance.db_name}").filter(
                         schemaname=f"{schema_name}").filter(relname=f"{table_name}").fetchone()
-                    dead_tup_info = dai.get_metric_sequence("pg_tables_structure_n_dead_tup",
-                                                            self.query_start_time,
-                                                            self.query_end_time).from_server(
+                    dead_tup_info = self.get_metric_sequence("pg_tables_structure_n_dead_tup").from_server(
                         self.slow_sql_instance.instance).filter(
                         datname=f"{self.slow_sql_instance.db_name}").filter(
                         schemaname=f"{schema_name}").filter(relname=f"{table_name}").fetchone()
-                    vacuum_delay_info = dai.get_metric_sequence("pg_tables_structure_vacuum_delay",
-                                                                self.query_start_time,
-                                                                self.query_end_time).from_server(
+                    vacuum_delay_info = self.get_metric_sequence("pg_tables_structure_vacuum_delay").from_server(
                         self.slow_sql_instance.instance).filter(
                         datname=f"{self.slow_sql_instance.db_name}").filter(
                         schemaname=f"{schema_name}").filter(relname=f"{table_name}").fetchone()
-                    last_data_changed_delay_info = dai.get_metric_sequence(
-                        "pg_tables_structure_last_data_changed_delay",
-                        self.query_start_time,
-                        self.query_end_time).from_server(
+                    last_data_changed_delay_info = self.get_metric_sequence(
+                        "pg_tables_structure_last_data_changed_delay").from_server(
                         self.slow_sql_instance.instance).filter(
                         datname=f"{self.slow_sql_instance.db_name}").filter(
                         schemaname=f"{schema_name}").filter(relname=f"{table_name}").fetchone()
-                    analyze_delay_info = dai.get_metric_sequence("pg_tables_structure_analyze_delay",
-                                                                 self.query_start_time,
-                                                                 self.query_end_time).from_server(
+                    analyze_delay_info = self.get_metric_sequence("pg_tables_structure_analyze_delay").from_server(
                         self.slow_sql_instance.instance).filter(
                         datname=f"{self.slow_sql_instance.db_name}").filter(
                         schemaname=f"{schema_name}").filter(relname=f"{table_name}").fetchone()
@@ -601,8 +671,7 @@ class QueryContextFromTSDBAndRPC(QueryContext):
                         table_info.vacuum_delay = _get_driver_value(user_table_rows, 'vacuum_delay', default=-1)
                         table_info.data_changed_delay = _get_driver_value(user_table_rows,
                                                                           'data_changed_delay', default=-1)
-                pg_table_size_info = dai.get_metric_sequence("pg_tables_size_totalsize", self.query_start_time,
-                                                             self.query_end_time).from_server(
+                pg_table_size_info = self.get_metric_sequence("pg_tables_size_totalsize").from_server(
                     self.slow_sql_instance.instance).filter(
                     datname=f"{self.slow_sql_instance.db_name}").filter(
                     nspname=f"{schema_name}").filter(relname=f"{table_name}").fetchone()
@@ -616,8 +685,7 @@ class QueryContextFromTSDBAndRPC(QueryContext):
                                                                    return_tuples=False)
                     if is_driver_result_valid(table_size_rows):
                         table_info.table_size = _get_driver_value(table_size_rows, 'mbytes', precision=2)
-                index_number_info = dai.get_metric_sequence("pg_index_idx_scan", self.query_start_time,
-                                                            self.query_end_time).from_server(
+                index_number_info = self.get_metric_sequence("pg_index_idx_scan").from_server(
                     self.slow_sql_instance.instance).filter(
                     datname=f"{self.slow_sql_instance.db_name}").filter(
                     nspname=f"{schema_name}").filter(tablename=f"{table_name}").fetchall()
@@ -641,8 +709,7 @@ class QueryContextFromTSDBAndRPC(QueryContext):
         pg_settings = {}
         for parameter in REQUIRED_PARAMETERS:
             pg_setting = PgSetting()
-            sequence = dai.get_metric_sequence("pg_settings_setting", self.query_start_time,
-                                               self.query_end_time).from_server(
+            sequence = self.get_metric_sequence("pg_settings_setting").from_server(
                 self.slow_sql_instance.instance).filter(
                 name=f"{parameter}").fetchone()
             if is_sequence_valid(sequence):
@@ -664,14 +731,11 @@ class QueryContextFromTSDBAndRPC(QueryContext):
     def acquire_database_info(self) -> DatabaseInfo:
         """Acquire table database related information related to slow query, such as thread pool, connection, TPS"""
         database_info = DatabaseInfo()
-        used_connection_sequences = dai.get_metric_sequence("gaussdb_total_connection", self.query_start_time,
-                                                            self.query_end_time).from_server(
+        used_connection_sequences = self.get_metric_sequence("gaussdb_total_connection").from_server(
             self.slow_sql_instance.instance).fetchall()
-        cur_tps_sequence = dai.get_metric_sequence("gaussdb_qps_by_instance", self.query_start_time,
-                                                    self.query_end_time).from_server(
+        cur_tps_sequence = self.get_metric_sequence("gaussdb_qps_by_instance").from_server(
             self.slow_sql_instance.instance).fetchone()
-        thread_pool_occupy_rate = dai.get_metric_sequence("pg_thread_pool_rate", self.query_start_time,
-                                                          self.query_end_time).from_server(
+        thread_pool_occupy_rate = self.get_metric_sequence("pg_thread_pool_rate").from_server(
             self.slow_sql_instance.instance).fetchone()
         if is_sequence_valid(used_connection_sequences):
             database_info.connection = _get_sequences_sum_value(used_connection_sequences)
@@ -735,36 +799,26 @@ class QueryContextFromTSDBAndRPC(QueryContext):
     def acquire_system_info(self) -> SystemInfo:
         """Acquire system information on the database server """
         system_info = SystemInfo()
-        ioutils_info = dai.get_metric_sequence("os_disk_ioutils", self.query_start_time,
-                                               self.query_end_time).from_server(
+        ioutils_info = self.get_metric_sequence("os_disk_ioutils").from_server(
             f"{self.slow_sql_instance.db_host}").fetchall()
         # we only acquire usage of the disk which instance data directory is located
         mountpoint, _, _ = dai.get_data_directory_mountpoint_info(self.slow_sql_instance.instance)
-        disk_usage_info = dai.get_metric_sequence("os_disk_usage", self.query_start_time,
-                                                  self.query_end_time).from_server(
+        disk_usage_info = self.get_metric_sequence("os_disk_usage").from_server(
             f"{self.slow_sql_instance.db_host}").filter(mountpoint=mountpoint).fetchone()
-        user_cpu_usage_info = dai.get_metric_sequence("os_cpu_usage", self.query_start_time,
-                                                      self.query_end_time).from_server(
+        user_cpu_usage_info = self.get_metric_sequence("os_cpu_usage").from_server(
             f"{self.slow_sql_instance.db_host}").fetchone()
-        mem_usage_info = dai.get_metric_sequence("os_mem_usage", self.query_start_time,
-                                                 self.query_end_time).from_server(
+        mem_usage_info = self.get_metric_sequence("os_mem_usage").from_server(
             f"{self.slow_sql_instance.db_host}").fetchone()
-        process_fds_rate_info = dai.get_metric_sequence("os_process_fds_rate", self.query_start_time,
-                                                        self.query_end_time).from_server(
+        process_fds_rate_info = self.get_metric_sequence("os_process_fds_rate").from_server(
             f"{self.slow_sql_instance.db_host}").fetchone()
-        cpu_process_number_info = dai.get_metric_sequence("os_cpu_processor_number", self.query_start_time,
-                                                          self.query_end_time).from_server(
+        cpu_process_number_info = self.get_metric_sequence("os_cpu_processor_number").from_server(
             f"{self.slow_sql_instance.db_host}").fetchone()
         db_cpu_usage_info = \
-            dai.get_metric_sequence("gaussdb_progress_cpu_usage",
-                                    self.query_start_time,
-                                    self.query_end_time)\
+            self.get_metric_sequence("gaussdb_progress_cpu_usage")\
             .filter_like(instance=self.slow_sql_instance.db_host + PORT_SUFFIX)\
             .fetchall()
         db_mem_usage_info = \
-            dai.get_metric_sequence("gaussdb_progress_mem_usage",
-                                    self.query_start_time,
-                                    self.query_end_time)\
+            self.get_metric_sequence("gaussdb_progress_mem_usage")\
             .filter_like(instance=self.slow_sql_instance.db_host + PORT_SUFFIX)\
             .fetchall()
         if is_sequence_valid(process_fds_rate_info):
@@ -795,21 +849,13 @@ class QueryContextFromTSDBAndRPC(QueryContext):
     @exception_catcher
     def acquire_network_info(self) -> NetWorkInfo:
         network_info = NetWorkInfo()
-        node_network_receive_drop_info = dai.get_metric_sequence('os_network_receive_drop',
-                                                                 self.query_start_time,
-                                                                 self.query_end_time).from_server(
+        node_network_receive_drop_info = self.get_metric_sequence('os_network_receive_drop').from_server(
             f"{self.slow_sql_instance.db_host}").fetchall()
-        node_network_transmit_drop_info = dai.get_metric_sequence('os_network_transmit_drop',
-                                                                  self.query_start_time,
-                                                                  self.query_end_time).from_server(
+        node_network_transmit_drop_info = self.get_metric_sequence('os_network_transmit_drop').from_server(
             f"{self.slow_sql_instance.db_host}").fetchall()
-        node_network_transmit_bytes_info = dai.get_metric_sequence('os_network_transmit_bytes',
-                                                                   self.query_start_time,
-                                                                   self.query_end_time).from_server(
+        node_network_transmit_bytes_info = self.get_metric_sequence('os_network_transmit_bytes').from_server(
             f"{self.slow_sql_instance.db_host}").fetchall()
-        node_network_receive_bytes_info = dai.get_metric_sequence('os_network_receive_bytes',
-                                                                  self.query_start_time,
-                                                                  self.query_end_time).from_server(
+        node_network_receive_bytes_info = self.get_metric_sequence('os_network_receive_bytes').from_server(
             f"{self.slow_sql_instance.db_host}").fetchall()
         node_network_duplex_info = dai.get_latest_metric_value('node_network_info').from_server_like(
             f"{self.slow_sql_instance.db_host}.*").fetchall()
@@ -966,6 +1012,47 @@ class QueryContextFromTSDBAndRPC(QueryContext):
         return memory_detail
 
 
+def prefetch_query_contexts(query_contexts):
+    """Prefetch the common metrics for a batch of slow query contexts.
+
+    The contexts are grouped by time window at first. For each group, every metric
+    is fetched by one regex query over the union window and all the servers in the group,
+    and then each context is handed an in-memory slice. Hence, the number of requests to
+    the time-series database depends on metrics rather than slow queries.
+    """
+    contexts = sorted(query_contexts, key=lambda c: c.query_start_time)
+    groups = []
+    for context in contexts:
+        if groups:
+            group_start, group_end, group = groups[-1]
+            new_end = max(group_end, context.query_end_time)
+            if (new_end - group_start).total_seconds() <= MAX_PREFETCH_WINDOW_SECONDS:
+                groups[-1] = (group_start, new_end, group)
+                group.append(context)
+                continue
+        groups.append((context.query_start_time, context.query_end_time, [context]))
+
+    for start_time, end_time, group in groups:
+        for metrics, get_server in (
+                (PREFETCHED_INSTANCE_METRICS, lambda c: c.slow_sql_instance.instance),
+                (PREFETCHED_HOST_METRICS, lambda c: c.slow_sql_instance.db_host)
+        ):
+            servers = set(get_server(context) for context in group)
+            for metric_name, labels_like in metrics.items():
+                try:
+                    sequences = dai.get_metric_sequences_of_servers(
+                        metric_name, start_time, end_time, servers, **labels_like
+                    )
+                except Exception as e:
+                    # The context can still fetch by itself.
+                    logging.warning('[SLOW QUERY] Failed to prefetch %s: %s.', metric_name, e)
+                    continue
+                for context in group:
+                    server = get_server(context)
+                    if server:
+                        context.attach_prefetched_sequences(metric_name, server, sequences.get(server, []))
+
+
 class QueryContextFromDriver(QueryContext):
     def __init__(self, slow_sql_instance, **kwargs):
         super().__init__(slow_sql_instance)
@@ -11,6 +11,7 @@
 # MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
 # See the Mulan PSL v2 for more details.
 
+import bisect
 import inspect
 from datetime import datetime, timedelta
 from itertools import product
@@ -20,7 +21,8 @@ from dbmind.common.algorithm import anomaly_detection
 from dbmind.common.algorithm.anomaly_detection.agg import merge_with_and_operator
 from dbmind.common.algorithm.forecasting.forecasting_algorithm import quickly_forecast
 from dbmind.common.algorithm.stat_utils import approximatively_merge as merge
-from dbmind.common.types import Alarm
+from dbmind.common.sequence_buffer import frozendict
+from dbmind.common.types import Alarm, Sequence
 from dbmind.common.types.enums import ALARM_LEVEL, ALARM_TYPES
 from dbmind.service import dai
 from dbmind.service.utils import SequenceUtils
@@ -88,6 +90,41 @@ class DetectorInfo:
         )
 
 
+def slide_window(sequences, new_sequences, start_timestamp):
+    """Appends the new points to the sequences with the same labels and
+    drops the points before `start_timestamp`. The sequences without any
+    point left, e.g., the series have stopped reporting, are dropped."""
+    new_sequences = {frozendict(s.labels): s for s in new_sequences}
+    rv = []
+    for sequence in sequences:
+        new_sequence = new_sequences.pop(frozendict(sequence.labels), None)
+        timestamps, values = list(sequence.timestamps), list(sequence.values)
+        if new_sequence is not None and len(new_sequence) > 0:
+            # Prefer the new points because the last point of a window may be incomplete.
+            cut = bisect.bisect_left(timestamps, new_sequence.timestamps[0])
+            timestamps = timestamps[:cut] + list(new_sequence.timestamps)
+            values = values[:cut] + list(new_sequence.values)
+        cut = bisect.bisect_left(timestamps, start_timestamp)
+        if cut == len(timestamps):
+            continue
+        rv.append(
+            Sequence(timestamps[cut:], values[cut:], name=sequence.name,
+                     step=sequence.step, labels=sequence.labels)
+        )
+    rv.extend(s for s in new_sequences.values() if len(s) > 0)
+    return rv
+
+
+def align_anomalies(anomalies, timestamps):
+    """Aligns the anomalies to the timestamps, so that the anomalies of a series
+    with missing points, e.g., a series that has stopped reporting, can be merged.
+    The missing points are not anomalous."""
+    if len(anomalies) == len(timestamps):
+        return anomalies
+    anomalous = dict(zip(anomalies.timestamps, anomalies.values))
+    return Sequence(timestamps=timestamps, values=[bool(anomalous.get(t, False)) for t in timestamps])
+
+
 class GenericAnomalyDetector:
     def __init__(self,
                  name: str,
@@ -107,19 +144,96 @@ class GenericAnomalyDetector:
         if forecasting_seconds and fit_once:
             self.models = [None for _ in self.detector_info]
             self.fit_once = fit_once
+        # States kept between the detections that fetch incrementally.
+        self._windows = dict()
+        self._last_seen_timestamps = dict()
+
+    def _fetch(self, metric_name, metric_filter, start_datetime, end_datetime,
+               instance_like=None, incremental_fetch=False):
+        # Use the step of the whole window for the new points as well,
+        # otherwise the window mixes the points of different resolutions.
+        step = dai.estimate_appropriate_step_ms(start_datetime, end_datetime)
+
+        def fetch(start, end):
+            fetcher = dai.get_metric_sequence(metric_name, start, end, step=step).filter(**metric_filter)
+            if instance_like:
+                fetcher = fetcher.from_server_like(instance_like)
+            return fetcher.fetchall()
+
+        if not incremental_fetch:
+            return fetch(start_datetime, end_datetime)
 
-    def detect(self):
+        # Only fetch the points since the last detection and
+        # slide the window kept from the last detection.
+        key = (metric_name, frozendict(metric_filter), instance_like)
+        last_end_datetime, last_sequences = self._windows.get(key, (None, None))
+        if last_end_datetime is None or last_end_datetime <= start_datetime:
+            sequences = fetch(start_datetime, end_datetime)
+        else:
+            sequences = slide_window(
+                last_sequences,
+                fetch(last_end_datetime, end_datetime),
+                int(start_datetime.timestamp() * 1000)
+            )
+        if sequences:
+            self._windows[key] = (end_datetime, sequences)
+        else:
+            self._windows.pop(key, None)
+        return sequences
+
+    def _evict(self, start_datetime):
+        """Drops the states of the series which have no point in the current window.
+        If such a series reports again, it is fetched and detected as a new one."""
+        for key in [key for key, (end_datetime, _) in self._windows.items()
+                    if end_datetime <= start_datetime]:
+            del self._windows[key]
+        start_timestamp = int(start_datetime.timestamp() * 1000)
+        for key in [key for key, timestamp in self._last_seen_timestamps.items()
+                    if timestamp < start_timestamp]:
+            del self._last_seen_timestamps[key]
+
+    def detect(self, incremental_fetch=False):
+        """Detects anomalies in the last `duration` seconds.
+
+        :param incremental_fetch: if True, keep the fetched windows and the last seen
+            timestamp of each series between calls, then only fetch the new points
+            and only report anomalies that involve the new points. The series
+            without any new point are skipped. The detection itself is not
+            incremental: the detectors refit the whole window of the series
+            with new points.
+        :return: a list of alarms.
+        """
         main_metric_name = self.detector_info[0].metric_name
         main_metric_filter = self.detector_info[0].metric_filter
         end_datetime = datetime.now()
         start_datetime = end_datetime - timedelta(seconds=self.duration)  # unit: second
-        main_sequences = dai.get_metric_sequence(
-            main_metric_name,
-            start_datetime,
-            end_datetime
-        ).filter(**main_metric_filter).fetchall()
+        main_sequences = self._fetch(
+            main_metric_name, main_metric_filter,
+            start_datetime, end_datetime,
+            incremental_fetch=incremental_fetch
+        )
+        last_seen_timestamps = dict()
+        if incremental_fetch:
+            updated_sequences = []
+            for main_sequence in main_sequences:
+                if len(main_sequence) == 0:
+                    continue
+                series_key = frozendict(main_sequence.labels)
+                last_seen = self._last_seen_timestamps.get(series_key)
+                if last_seen is not None and main_sequence.timestamps[-1] <= last_seen:
+                    continue
+                last_seen_timestamps[series_key] = last_seen
+                self._last_seen_timestamps[series_key] = main_sequence.timestamps[-1]
+                updated_sequences.append(main_sequence)
+            main_sequences = updated_sequences
+            self._evict(start_datetime)
+
         alarms = []
-        for main_sequence in main_sequences:
+        # Without forecasting, the main sequences can be detected in batch.
+        main_anomalies = None
+        if not self.forecasting_seconds:
+            main_anomalies = self.detector_info[0].detector.fit_predict_many(main_sequences)
+        for j, main_sequence in enumerate(main_sequences):
             sequences_list = [[main_sequence]]
             instance = SequenceUtils.from_server(main_sequence)
             if ":" in instance:
@@ -132,16 +246,15 @@ class GenericAnomalyDetector:
                 metric_name = di.metric_name
                 metric_filter = di.metric_filter
 
-                fetcher = dai.get_metric_sequence(
-                    metric_name, start_datetime, end_datetime
-                ).filter(**metric_filter)
-
                 instance_label = dai._get_data_source_flag(metric_name)
-                if instance_label not in metric_filter:  # In case of duplication
-                    fetcher = fetcher.from_server_like(instance_like)
-
-                sequences = fetcher.fetchall()
-                sequences_list.append(sequences)
+                sequences = self._fetch(
+                    metric_name, metric_filter,
+                    start_datetime, end_datetime,
+                    # In case of duplication
+                    instance_like=None if instance_label in metric_filter else instance_like,
+                    incremental_fetch=incremental_fetch
+                )
+                sequences_list.append([sequence for sequence in sequences if len(sequence) > 0])
 
             for sequence_set in product(*sequences_list):
                 anomalies = []
@@ -156,10 +269,14 @@ class GenericAnomalyDetector:
                             self.models[i] = model
 
                         anomalies.append(detector.fit_predict(merge(sequence, forecast_seq)))
+                    elif i == 0:
+                        anomalies.append(main_anomalies[j])
                     else:
                         anomalies.append(detector.fit_predict(sequence))
 
-                result = merge_with_and_operator(anomalies)
+                result = merge_with_and_operator(
+                    [anomalies[0]] + [align_anomalies(a, anomalies[0].timestamps) for a in anomalies[1:]]
+                )
                 if True in result.values:
                     alarm = Alarm(**self.alarm_info.to_dict())
                     alarm.instance = instance
@@ -170,6 +287,10 @@ class GenericAnomalyDetector:
                     alarm.start_timestamp = result.timestamps[result.values.index(True)]
                     alarm.end_timestamp = result.timestamps[-result.values[::-1].index(True) - 1]
                     alarm.anomaly_type = " ".join(self.anomaly_types)
+                    last_seen = last_seen_timestamps.get(frozendict(main_sequence.labels))
+                    if last_seen is not None and alarm.end_timestamp <= last_seen:
+                        # Has been reported by the last detection.
+                        continue
                     alarms.append(alarm)
 
         return alarms
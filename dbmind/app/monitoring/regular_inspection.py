@@ -11,16 +11,19 @@
 # MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
 # See the Mulan PSL v2 for more details.
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from collections import defaultdict
 
 from dbmind import global_vars
 from dbmind.common.algorithm.data_statistic import get_statistic_data, box_plot
+from dbmind.common.types import Sequence
 from dbmind.metadatabase import dao
 from dbmind.service import dai
 from dbmind.service.web.jsonify_utils import \
     sqlalchemy_query_jsonify_for_multiple_instances as sqlalchemy_query_jsonify_for_multiple_instances
 from dbmind.service.dai import is_sequence_valid
+from dbmind.service.utils import SequenceUtils
 from dbmind.service.web import data_transformer
 
 ONE_DAY = 24 * 60
@@ -66,7 +69,14 @@ def get_sequence_value(s, func=None):
     return 0
 
 
+def _first_sequence(sequences):
+    return sequences[0] if sequences else Sequence()
+
+
 class DailyInspection:
+    sections = ('resource', 'dml', 'db_size', 'table_size', 'history_alarm', 'future_alarm',
+                'slow_sql_rca', 'connection', 'dynamic_memory', 'performance')
+
     def __init__(self, instance, start=None, end=None):
         self._report = {}
         self._start = start
@@ -76,6 +86,14 @@ class DailyInspection:
         self._instances_with_port = all_agents.get(instance)
         self._instances_with_no_port = [i.split(':')[0] for i in self._instances_with_port]
 
+    def _fetch_sequences(self, *metrics):
+        """Fetch the first sequence of each metric from the agent instance concurrently."""
+        joined = dai.fetch_joined_sequences(
+            [dai.get_metric_sequence(metric, self._start, self._end).from_server(self._agent_instance)
+             for metric in metrics]
+        )
+        return [_first_sequence(sequences) for sequences in joined.get((), ((),) * len(metrics))]
+
     @property
     def resource(self):
         rv = {'header': ('metric', 'instance', 'max', 'min', 'avg', 'the_95th'), 'rows': []}
@@ -90,14 +108,9 @@ class DailyInspection:
 
     @property
     def dml(self):
-        select_sequence = dai.get_metric_sequence('pg_sql_count_select', self._start, self._end).\
-            from_server(self._agent_instance).fetchone()
-        update_sequence = dai.get_metric_sequence('pg_sql_count_update', self._start, self._end).\
-            from_server(self._agent_instance).fetchone()
-        insert_sequence = dai.get_metric_sequence('pg_sql_count_insert', self._start, self._end).\
-            from_server(self._agent_instance).fetchone()
-        delete_sequence = dai.get_metric_sequence('pg_sql_count_delete', self._start, self._end).\
-            from_server(self._agent_instance).fetchone()
+        select_sequence, update_sequence, insert_sequence, delete_sequence = self._fetch_sequences(
+            'pg_sql_count_select', 'pg_sql_count_update', 'pg_sql_count_insert', 'pg_sql_count_delete'
+        )
         dml_distribution = {'select': get_sequence_value(select_sequence, max),
                             'delete': get_sequence_value(delete_sequence, max),
                             'update': get_sequence_value(update_sequence, max),
@@ -107,10 +120,9 @@ class DailyInspection:
     @property
     def performance(self):
         performance_detail = {}
-        tps_sequence = dai.get_metric_sequence('gaussdb_qps_by_instance', self._start, self._end).\
-            from_server(self._agent_instance).fetchone()
-        p95_sequence = dai.get_metric_sequence('statement_responsetime_percentile_p95',
-                                           self._start, self._end).from_server(self._agent_instance).fetchone()
+        tps_sequence, p95_sequence = self._fetch_sequences(
+            'gaussdb_qps_by_instance', 'statement_responsetime_percentile_p95'
+        )
         if is_sequence_valid(tps_sequence):
             avg_val, min_val, max_val, the_95th_val = get_statistic_data(tps_sequence.values)
             performance_detail['tps'] = {'avg': avg_val, 'max': max_val, 'min': min_val, 'the_95th': the_95th_val}
@@ -135,17 +147,22 @@ class DailyInspection:
     @property
     def table_size(self):
         rv = {'header': ('dbname', 'schema', 'tablename', 'tablesize', 'indexsize'), 'rows': []}
-        sequences = dai.get_metric_sequence('pg_tables_size_relsize', self._start, self._end).\
-            from_server(self._agent_instance).fetchall()
-        for sequence in sequences:
-            if is_sequence_valid(sequence):
-                schema = sequence.labels.get('nspname', 'UNKNOWN')
-                relname = sequence.labels.get('relname', 'UNKNOWN')
-                datname = sequence.labels.get('datname', 'UNKNOWN')
-                indexsize_seq = dai.get_metric_sequence('pg_tables_size_indexsize', self._start, self._end).\
-                    from_server(self._agent_instance).filter(nspname=schema, relname=relname).fetchone()
-                rv['rows'].append((datname, schema, relname, round(get_sequence_value(sequence, max), 2),
-                                   round(get_sequence_value(indexsize_seq, max), 2)))
+        joined = dai.fetch_joined_sequences(
+            (dai.get_metric_sequence('pg_tables_size_relsize', self._start, self._end).
+             from_server(self._agent_instance),
+             dai.get_metric_sequence('pg_tables_size_indexsize', self._start, self._end).
+             from_server(self._agent_instance)),
+            on=('datname', 'nspname', 'relname')
+        )
+        for relsize_sequences, indexsize_sequences in joined.values():
+            indexsize_seq = _first_sequence(indexsize_sequences)
+            for sequence in relsize_sequences:
+                if is_sequence_valid(sequence):
+                    schema = sequence.labels.get('nspname', 'UNKNOWN')
+                    relname = sequence.labels.get('relname', 'UNKNOWN')
+                    datname = sequence.labels.get('datname', 'UNKNOWN')
+                    rv['rows'].append((datname, schema, relname, round(get_sequence_value(sequence, max), 2),
+                                       round(get_sequence_value(indexsize_seq, max), 2)))
         return rv
 
     @property
@@ -211,10 +228,9 @@ class DailyInspection:
     @property
     def connection(self):
         active_connection, total_connection = {}, {}
-        active_conn_sequence = dai.get_metric_sequence('gaussdb_active_connection', self._start, self._end).\
-            from_server(self._agent_instance).fetchone()
-        total_conn_sequence = dai.get_metric_sequence('gaussdb_total_connection', self._start, self._end).\
-            from_server(self._agent_instance).fetchone()
+        active_conn_sequence, total_conn_sequence = self._fetch_sequences(
+            'gaussdb_active_connection', 'gaussdb_total_connection'
+        )
         if is_sequence_valid(active_conn_sequence):
             avg_val, min_val, max_val, the_95th_val = get_statistic_data(active_conn_sequence.values)
             active_connection = {'max': max_val, 'min': min_val, 'avg': avg_val, 'the_95th': the_95th_val}
@@ -227,13 +243,23 @@ class DailyInspection:
     @property
     def dynamic_memory(self):
         dynamic_used_memory = defaultdict()
+        if not self._instances_with_port:
+            return dynamic_used_memory
+        # Fetch all the instances at once and join them with the memory of their hosts.
+        joined = dai.fetch_joined_sequences(
+            (dai.get_metric_sequence('pg_total_memory_detail_mbytes', self._start, self._end).
+             from_server_like('|'.join(self._instances_with_port)).filter(type='dynamic_used_memory'),
+             dai.get_latest_metric_value('node_memory_MemTotal_bytes').
+             filter_like(instance='(%s)%s' % ('|'.join(self._instances_with_no_port), dai.PORT_SUFFIX))),
+            on=lambda sequence: (SequenceUtils.from_server(sequence) or '').split(':')[0]
+        )
         for instance in self._instances_with_port:
             host, _ = instance.split(':')
-            host_like = host + "(:[0-9]{4,5}|)"
-            dynamic_memory_sequence = dai.get_metric_sequence('pg_total_memory_detail_mbytes', self._start, self._end).\
-                from_server(instance).filter(type='dynamic_used_memory').fetchone()
-            total_memory_sequence = dai.get_latest_metric_value('node_memory_MemTotal_bytes').\
-                filter_like(instance=host_like).fetchone()
+            memory_sequences, total_memory_sequences = joined.get(host, ((), ()))
+            dynamic_memory_sequence = _first_sequence(
+                [sequence for sequence in memory_sequences if SequenceUtils.from_server(sequence) == instance]
+            )
+            total_memory_sequence = _first_sequence(total_memory_sequences)
             if is_sequence_valid(total_memory_sequence) and is_sequence_valid(dynamic_memory_sequence): 
                 # transfer bytes to unit 'MB'
                 total_memory = get_sequence_value(total_memory_sequence) / 1024 / 1024
@@ -246,16 +272,10 @@ class DailyInspection:
         return dynamic_used_memory
     
     def __call__(self):
-        return {'resource': self.resource,
-                'dml': self.dml,
-                'db_size': self.db_size,
-                'table_size': self.table_size,
-                'history_alarm': self.history_alarm,
-                'future_alarm': self.future_alarm,  
-                'slow_sql_rca': self.slow_sql_rca,
-                'connection': self.connection, 
-                'dynamic_memory': self.dynamic_memory, 
-                'performance': self.performance}
+        # Sections are independent and mostly wait for TSDB or the meta-database.
+        with ThreadPoolExecutor(max_workers=len(self.sections)) as executor:
+            futures = {section: executor.submit(getattr, self, section) for section in self.sections}
+            return {section: future.result() for section, future in futures.items()}
 
 
 def _get_regular_inspection_report(instance, inspection_type, start, end, limit):
@@ -12,6 +12,7 @@
 # See the Mulan PSL v2 for more details.
 
 import logging
+import os
 from collections import defaultdict, Counter
 from datetime import datetime, timedelta
 import time
@@ -119,6 +120,11 @@ def rpc_index_advise(executor,
     index_advisor_workload.MAX_INDEX_STORAGE = max_index_storage
 
     index_advisor_workload.get_workload_costs = index_advisor_workload.get_plan_cost
+    # Share the cost cache with the index_advisor command through the same file.
+    if global_vars.confpath:
+        index_advisor_workload.set_cost_cache(
+            os.path.join(global_vars.confpath, index_advisor_workload.COST_CACHE_FILE)
+        )
     detail_info, _, _ = index_advisor_workload.index_advisor_workload({'historyIndexes': {}}, executor, templates,
                                                                       multi_iter_mode=True, show_detail=True,
                                                                       n_distinct=1, reltuples=10,
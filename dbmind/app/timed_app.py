@@ -17,7 +17,8 @@ from datetime import timedelta, datetime
 
 from dbmind import global_vars, constants
 from dbmind.app.diagnosis.query.entry import diagnose_query
-from dbmind.app.diagnosis.query.slow_sql.query_info_source import QueryContextFromTSDBAndRPC
+from dbmind.app.diagnosis.query.slow_sql.query_info_source import (QueryContextFromTSDBAndRPC,
+                                                                   prefetch_query_contexts)
 from dbmind.app.monitoring import ad_pool_manager, regular_inspection
 from dbmind.app.optimization import (need_recommend_index,
                                      do_index_recomm,
@@ -87,7 +88,7 @@ def anomaly_detection():
         running = detection.get(ad_pool_manager.DetectorParam.RUNNING)
         detector = detection.get(ad_pool_manager.DetectorParam.DETECTOR)
         if running and detector:
-            history_alarms.extend(detector.detect())
+            history_alarms.extend(detector.detect(incremental_fetch=True))
     logging.debug('The length of detected alarms is %d.', len(history_alarms))
     # save history alarms
     dai.save_history_alarms(history_alarms, anomaly_detection_interval)
@@ -126,6 +127,7 @@ def slow_sql_diagnosis():
             logging.warning(
                 'Cannot diagnose slow queries because %s.', e
             )
+    prefetch_query_contexts([context for context, in query_contexts])
     slow_queries = global_vars.worker.parallel_execute(
         diagnose_query, query_contexts
     ) or []
@@ -55,7 +55,7 @@ CONFIG_OPTIONS = {
     'WORKER-type': ['local', 'dist'],
     'LOG-level': ['DEBUG', 'INFO', 'WARNING', 'ERROR']
 }
-POSITIVE_INTEGER_CONFIG = ['LOG-maxbytes', 'LOG-backupcount']
+POSITIVE_INTEGER_CONFIG = ['LOG-maxbytes', 'LOG-backupcount', 'TSDB-buffer_disk_ttl']
 BOOLEAN_CONFIG = []
 
 
@@ -28,6 +28,7 @@ from dbmind.cmd.configs.config_utils import (
     load_sys_configs
 )
 from dbmind.cmd.configs.configurators import DynamicConfig
+from dbmind.common.algorithm.forecasting.arima_model.arima_alg import ARIMA
 from dbmind.common.utils.base import try_to_get_an_element
 from dbmind.common import platform
 from dbmind.common import utils
@@ -253,6 +254,32 @@ def init_tsdb_with_config():
     return TsdbClientFactory.get_tsdb_client()
 
 
+def init_sequence_buffer_with_config():
+    # Set the on-disk tier of the sequence buffer if the user enables it.
+    disk_size = global_vars.configs.getint('TSDB', 'buffer_disk_size', fallback=0)
+    if disk_size <= 0:
+        return
+    disk_ttl = global_vars.configs.getint('TSDB', 'buffer_disk_ttl', fallback=24 * 60 * 60)
+    from dbmind.common.sequence_buffer import SequenceSegmentStore
+    from dbmind.service import dai
+    dai.buff.disk_store = SequenceSegmentStore(
+        os.path.join(global_vars.confpath, constants.SEQUENCE_BUFFER_DIRECTORY),
+        max_bytes=disk_size * 1024 * 1024,
+        ttl=disk_ttl * 1000  # unit: millisecond
+    )
+
+
+def init_metadatabase():
+    # The tables added by a new version, e.g., the rollup tables of slow queries,
+    # are missing if the service is upgraded without running the setup again.
+    from dbmind.metadatabase.dao.slow_queries import init_slow_queries_rollups
+    try:
+        if init_slow_queries_rollups():
+            logging.info('The rollup tables of slow queries have been rebuilt.')
+    except Exception as e:
+        logging.warning('Failed to initialize the rollup tables of slow queries.', exc_info=e)
+
+
 def init_anomaly_detection_pool():
     from dbmind.app.monitoring import ad_pool_manager
     ad_pool_manager.rebuild_detector()
@@ -318,6 +345,8 @@ class DBMindMain(Daemon):
 
         # Initialize RPC agent.
         init_rpc_with_config(tsdb)
+        init_sequence_buffer_with_config()
+        init_metadatabase()
         for p in utils.split(global_vars.configs.get('AGENT', 'password')):
             logging_handler.add_sensitive_word(p)
 
@@ -334,6 +363,9 @@ class DBMindMain(Daemon):
         # the sub-process to copy a partial HTTP buffer.
         local_workers = global_vars.configs.getint('WORKER', 'process_num', fallback=-1)
         global_vars.worker = self.worker = get_worker_instance('local', local_workers)
+        # The worker processes have been forked, so only the master
+        # process dispatches the ARIMA order search to them.
+        ARIMA.executor = self.worker
 
         # Start timed tasks.
         app.register_timed_app()
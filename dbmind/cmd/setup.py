@@ -28,6 +28,7 @@ from dbmind.cmd.configs.config_utils import (
 from dbmind.cmd.configs.configurators import UpdateConfig, DynamicConfig, GenerationConfig
 from dbmind.common import utils, security
 from dbmind.common.exceptions import SetupError, SQLExecutionError, DuplicateTableError
+from dbmind.metadatabase.dao.slow_queries import rebuild_slow_queries_rollups
 from dbmind.metadatabase.ddl import create_metadatabase_schema, destroy_metadatabase
 
 
@@ -123,6 +124,9 @@ def initialize_and_check_config(confpath, interactive=False, quiet=False):
                 override()
             if input_char == 'K':
                 utils.cli.write_to_terminal('Ignoring...', color='green')
+                # Tables added by the new version, e.g., the rollup tables of slow queries.
+                create_metadatabase_schema(check_first=True)
+                rebuild_slow_queries_rollups()
         else:
             override()
 
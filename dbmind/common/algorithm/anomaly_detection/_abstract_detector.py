@@ -12,7 +12,7 @@
 # See the Mulan PSL v2 for more details.
 from abc import abstractmethod
 
-from ._utils import pick_out_anomalies
+from ._utils import group_by_timestamps, pick_out_anomalies
 from ...types import Sequence
 
 
@@ -30,6 +30,30 @@ class AbstractDetector(object):
         anomalies = self._predict(sequence)
         return anomalies
 
+    def _fit_predict_many(self, values):
+        """Fits and predicts a 2-D array of which each row is
+        the values of a sequence. Returns None if the detector
+        doesn't support detecting sequences in batch."""
+        return None
+
+    def fit_predict_many(self, sequences):
+        """Detects a batch of sequences. The sequences sharing the same
+        timestamps are stacked into a 2-D array and processed together.
+
+        :param sequences: a list of sequences.
+        :return: a list of predicted sequences in the same order.
+        """
+        rv = [None] * len(sequences)
+        for indexes, timestamps, values in group_by_timestamps(sequences):
+            predicted = None if values is None else self._fit_predict_many(values)
+            if predicted is None:
+                for i in indexes:
+                    rv[i] = self.fit_predict(sequences[i])
+                continue
+            for i, row in zip(indexes, predicted):
+                rv[i] = Sequence(timestamps=timestamps, values=row)
+        return rv
+
     def detect(self, sequence: Sequence):
         anomalies = self.fit_predict(sequence)
         return pick_out_anomalies(sequence, anomalies)
@@ -11,6 +11,10 @@
 # MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
 # See the Mulan PSL v2 for more details.
 
+from collections import defaultdict
+
+import numpy as np
+
 from ...types import Sequence
 
 
@@ -38,6 +42,29 @@ def merge_contiguous_anomalies_timestamps(sequence_timestamps, anomaly_timestamp
     return anomaly_timestamp_list
 
 
+def group_by_timestamps(sequences):
+    """Groups the sequences by their timestamps and stacks the values
+    of each group into a 2-D array. If the values of a group cannot be
+    stacked (e.g., empty or not numeric), the array is None.
+
+    :return: a list of (indexes of sequences, timestamps, 2-D array).
+    """
+    groups = defaultdict(list)
+    for i, s in enumerate(sequences):
+        groups[s.timestamps].append(i)
+
+    rv = []
+    for timestamps, indexes in groups.items():
+        values = None
+        if len(timestamps) > 0:
+            try:
+                values = np.array([sequences[i].values_array for i in indexes], dtype='float')
+            except (TypeError, ValueError):
+                pass
+        rv.append((indexes, timestamps, values))
+    return rv
+
+
 def pick_out_anomalies(sequence, anomalies, ignore_head=True, ignore_tail=True):
     """According to the detection results,
     pick out the samples detected as abnormal,
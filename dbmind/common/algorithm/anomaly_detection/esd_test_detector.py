@@ -48,7 +48,7 @@ class EsdTestDetector(AbstractDetector):
         if len(s.values) == 0:
             raise RuntimeError("Valid values are not enough for training.")
 
-        v = np.array(s.values).astype('float')
+        v = s.values_array.astype('float')
         v_copy = np.array(v)
         n = v_copy[~np.isnan(v_copy)].size
         r = np.zeros(n)
@@ -83,7 +83,7 @@ class EsdTestDetector(AbstractDetector):
         )
 
     def _predict(self, s: Sequence) -> Sequence:
-        np_values = np.array(s.values)
+        np_values = s.values_array
         new_sum = np_values + self._normal_sum
         new_count = self._normal_count + 1
         new_mean = new_sum / new_count
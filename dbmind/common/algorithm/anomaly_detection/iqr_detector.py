@@ -22,8 +22,8 @@ class InterQuartileRangeDetector(AbstractDetector):
         self.outliers = outliers
 
     def _fit(self, s: Sequence) -> None:
-        q1 = np.nanquantile(s.values, 0.25)
-        q3 = np.nanquantile(s.values, 0.75)
+        q1 = np.nanquantile(s.values_array, 0.25)
+        q3 = np.nanquantile(s.values_array, 0.75)
         iqr = q3 - q1
 
         if isinstance(self.outliers[0], (int, float)):
@@ -37,6 +37,23 @@ class InterQuartileRangeDetector(AbstractDetector):
             self.upper_bound = float("inf")
 
     def _predict(self, s: Sequence) -> Sequence:
-        values = np.array(s.values)
+        values = s.values_array
         predicted_values = (values > self.upper_bound) | (values < self.lower_bound)
         return Sequence(timestamps=s.timestamps, values=predicted_values)
+
+    def _fit_predict_many(self, values):
+        q1 = np.nanquantile(values, 0.25, axis=1, keepdims=True)
+        q3 = np.nanquantile(values, 0.75, axis=1, keepdims=True)
+        iqr = q3 - q1
+
+        if isinstance(self.outliers[0], (int, float)):
+            lower_bound = (q1 - iqr * self.outliers[0])
+        else:
+            lower_bound = -float("inf")
+
+        if isinstance(self.outliers[1], (int, float)):
+            upper_bound = (q3 + iqr * self.outliers[1])
+        else:
+            upper_bound = float("inf")
+
+        return (values > upper_bound) | (values < lower_bound)
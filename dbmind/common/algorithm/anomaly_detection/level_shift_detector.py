@@ -34,13 +34,13 @@ class LevelShiftDetector(AbstractDetector):
 
     def _predict(self, s: Sequence) -> Sequence:
         abs_diff_values = stat_utils.np_double_rolling(
-            s.values,
+            s.values_array,
             window=(self.window, self.window),
             diff_mode="abs_diff",
             agg=self.agg
         )
         diff_values = stat_utils.np_double_rolling(
-            s.values,
+            s.values_array,
             window=(self.window, self.window),
             diff_mode="diff",
             agg=self.agg
@@ -49,3 +49,22 @@ class LevelShiftDetector(AbstractDetector):
         iqr_result = self._iqr_detector.fit_predict(Sequence(s.timestamps, abs_diff_values))
         sign_check_result = self._sign_detector.fit_predict(Sequence(s.timestamps, diff_values))
         return merge_with_and_operator([iqr_result, sign_check_result])
+
+    def _fit_predict_many(self, values):
+        abs_diff_values = stat_utils.np_double_rolling_2d(
+            values,
+            window=(self.window, self.window),
+            diff_mode="abs_diff",
+            agg=self.agg
+        )
+        diff_values = stat_utils.np_double_rolling_2d(
+            values,
+            window=(self.window, self.window),
+            diff_mode="diff",
+            agg=self.agg
+        )
+
+        iqr_result = InterQuartileRangeDetector(outliers=self.outliers)._fit_predict_many(abs_diff_values)
+        sign_check_result = ThresholdDetector(high=THRESHOLD.get(self.side)[0],
+                                              low=THRESHOLD.get(self.side)[1])._fit_predict_many(diff_values)
+        return iqr_result & sign_check_result
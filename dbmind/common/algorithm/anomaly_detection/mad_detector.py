@@ -37,9 +37,16 @@ class MadDetector(AbstractDetector):
         """Nothing to impl"""
 
     def _predict(self, s: Sequence) -> Sequence:
-        x = np.array(s.values)
+        x = s.values_array
         x_median = np.median(x)
         abs_diff_median = np.abs(x - x_median)
         mad = self.scale_factor * np.median(abs_diff_median)
         rel_median = abs_diff_median / mad
         return Sequence(timestamps=s.timestamps, values=rel_median > self.threshold)
+
+    def _fit_predict_many(self, values):
+        x_median = np.median(values, axis=1, keepdims=True)
+        abs_diff_median = np.abs(values - x_median)
+        mad = self.scale_factor * np.median(abs_diff_median, axis=1, keepdims=True)
+        rel_median = abs_diff_median / mad
+        return rel_median > self.threshold
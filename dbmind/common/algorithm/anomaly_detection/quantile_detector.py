@@ -26,10 +26,15 @@ class QuantileDetector(AbstractDetector):
         if len(s.values) == 0:
             raise RuntimeError("Valid values are not enough for training.")
 
-        self.upper_bound = np.nanquantile(s.values, self.high)
-        self.lower_bound = np.nanquantile(s.values, self.low)
+        self.upper_bound = np.nanquantile(s.values_array, self.high)
+        self.lower_bound = np.nanquantile(s.values_array, self.low)
 
     def _predict(self, s: Sequence) -> Sequence:
-        np_values = np.array(s.values)
+        np_values = s.values_array
         predicted_values = (np_values > self.upper_bound) | (np_values < self.lower_bound)
         return Sequence(timestamps=s.timestamps, values=predicted_values)
+
+    def _fit_predict_many(self, values):
+        upper_bound = np.nanquantile(values, self.high, axis=1, keepdims=True)
+        lower_bound = np.nanquantile(values, self.low, axis=1, keepdims=True)
+        return (values > upper_bound) | (values < lower_bound)
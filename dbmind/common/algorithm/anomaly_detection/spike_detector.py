@@ -34,13 +34,13 @@ class SpikeDetector(AbstractDetector):
 
     def _predict(self, s: Sequence) -> Sequence:
         abs_diff_values = stat_utils.np_double_rolling(
-            s.values,
+            s.values_array,
             window=(self.window, 1),
             diff_mode="abs_diff",
             agg=self.agg
         )
         diff_values = stat_utils.np_double_rolling(
-            s.values,
+            s.values_array,
             window=(self.window, 1),
             diff_mode="diff",
             agg=self.agg
@@ -50,6 +50,25 @@ class SpikeDetector(AbstractDetector):
         sign_check_result = self._sign_detector.fit_predict(Sequence(s.timestamps, diff_values))
         return merge_with_and_operator([iqr_result, sign_check_result])
 
+    def _fit_predict_many(self, values):
+        abs_diff_values = stat_utils.np_double_rolling_2d(
+            values,
+            window=(self.window, 1),
+            diff_mode="abs_diff",
+            agg=self.agg
+        )
+        diff_values = stat_utils.np_double_rolling_2d(
+            values,
+            window=(self.window, 1),
+            diff_mode="diff",
+            agg=self.agg
+        )
+
+        iqr_result = InterQuartileRangeDetector(outliers=self.outliers)._fit_predict_many(abs_diff_values)
+        sign_check_result = ThresholdDetector(high=THRESHOLD.get(self.side)[0],
+                                              low=THRESHOLD.get(self.side)[1])._fit_predict_many(diff_values)
+        return iqr_result & sign_check_result
+
 
 def remove_spike(s: Sequence, outliers=(None, 3), side="positive", window=1):
     spike_ad_sequence = SpikeDetector(outliers=outliers, side=side, window=window).fit_predict(s)
@@ -31,7 +31,7 @@ class ThresholdDetector(AbstractDetector):
 
     def _predict(self, s: Sequence) -> Sequence:
         n = len(s.values)
-        np_values = np.array(s.values)
+        np_values = s.values_array
         predicted_values = (np_values > self.high) | (np_values < self.low)
         if self.percentage is None:
             return Sequence(timestamps=s.timestamps, values=predicted_values)
@@ -39,3 +39,11 @@ class ThresholdDetector(AbstractDetector):
             return Sequence(timestamps=s.timestamps, values=(True,) * n)
         else:
             return Sequence(timestamps=s.timestamps, values=(False,) * n)
+
+    def _fit_predict_many(self, values):
+        predicted_values = (values > self.high) | (values < self.low)
+        if self.percentage is None:
+            return predicted_values
+        n = values.shape[1]
+        over_percentage = np.count_nonzero(predicted_values, axis=1) >= self.percentage * n
+        return np.repeat(over_percentage[:, np.newaxis], n, axis=1)
@@ -14,8 +14,12 @@
 from functools import partial
 
 import numpy as np
+from scipy.fft import next_fast_len
 from scipy.stats import pearsonr, zscore
 
+# Below this sliding length, the dot product for each shift is cheaper than FFT.
+FFT_SLIDING_LENGTH = 16
+
 
 def pearson(x, y):
     return pearsonr(x, y)[0]
@@ -34,6 +38,73 @@ def cross_correlation(data1, data2, shift_num):
     return pearson(data1, iter_shift(data2, shift_num))
 
 
+def _shifted_inner_products(x, ys, sliding_length):
+    """Return the inner products of x and each row of ys shifted by
+    -sliding_length ... sliding_length, whose shape is (len(ys), 2 * sliding_length + 1)."""
+    n = len(x)
+    shifts = np.arange(-sliding_length, sliding_length + 1)
+    if sliding_length <= FFT_SLIDING_LENGTH:
+        products = np.empty((len(ys), len(shifts)))
+        for i, shift in enumerate(shifts):
+            if shift >= 0:
+                products[:, i] = ys[:, :n - shift] @ x[shift:]
+            else:
+                products[:, i] = ys[:, -shift:] @ x[:n + shift]
+        return products
+    # The circular cross-correlation equals the linear one as there is enough padding.
+    nfft = next_fast_len(2 * n + 1)
+    spectrum = np.fft.rfft(x, nfft) * np.conj(np.fft.rfft(ys, nfft, axis=1))
+    return np.fft.irfft(spectrum, nfft, axis=1)[:, shifts % nfft]
+
+
+def batch_pearson_correlation(x, ys, sliding_length=0):
+    """Calculate the shifted Pearson correlation coefficients between x and each row of ys
+    at once, which equals to `CorrelationAnalysis(analyze_method='pearson').analyze()` row by row.
+
+    :param x: an array-like time series
+    :param ys: a 2-D array, each row is a time series with the same length as x
+    :param sliding_length: shift each row of ys from -sliding_length to sliding_length
+    :return: a tuple of two arrays, i.e., the correlation coefficients with the largest
+        absolute values and their shifts
+    """
+    x = np.nan_to_num(np.asarray(x, dtype=float))
+    ys = np.nan_to_num(np.asarray(ys, dtype=float).reshape(-1, len(x)))
+    correlations = np.zeros(len(ys))
+    final_shifts = np.zeros(len(ys), dtype=int)
+    n = len(x)
+    if n < 2 or len(ys) == 0 or np.max(x) == np.min(x):
+        return correlations, final_shifts
+    valid = np.max(ys, axis=1) != np.min(ys, axis=1)
+    if not np.any(valid):
+        return correlations, final_shifts
+
+    ys = ys[valid]
+    sliding_length = min(int(abs(sliding_length)), n)
+    shifts = np.arange(-sliding_length, sliding_length + 1)
+    # The shifted row is filled with zeros, so only the remaining values count.
+    prefix = np.zeros((len(ys), n + 1))
+    np.cumsum(ys, axis=1, out=prefix[:, 1:])
+    prefix_square = np.zeros((len(ys), n + 1))
+    np.cumsum(ys * ys, axis=1, out=prefix_square[:, 1:])
+    ends = np.where(shifts >= 0, n - shifts, n)
+    starts = np.where(shifts >= 0, 0, -shifts)
+    sum_y = prefix[:, ends] - prefix[:, starts]
+    sum_yy = prefix_square[:, ends] - prefix_square[:, starts]
+    # x is never shifted, so centering it doesn't change the coefficients.
+    x = x - np.mean(x)
+    sum_xy = _shifted_inner_products(x, ys, sliding_length)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shifted_correlations = sum_xy / np.sqrt(np.sum(x * x) * (sum_yy - sum_y * sum_y / n))
+    shifted_correlations = np.clip(np.nan_to_num(shifted_correlations, nan=0, posinf=0, neginf=0), -1, 1)
+
+    # Keep the first one with the largest absolute value, the same as the loop over shifts.
+    best = np.argmax(np.abs(shifted_correlations), axis=1)
+    best_correlations = shifted_correlations[np.arange(len(ys)), best]
+    correlations[valid] = best_correlations
+    final_shifts[valid] = np.where(best_correlations != 0, shifts[best], 0)
+    return correlations, final_shifts
+
+
 class CorrelationAnalysis:
     """A class to analyze the correlation between two time series, including correlation coefficient,
     fluctuation direction and fluctuation order.
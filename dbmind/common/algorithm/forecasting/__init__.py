@@ -13,3 +13,4 @@
 
 from .forecasting_algorithm import ForecastingFactory
 from .forecasting_algorithm import quickly_forecast
+from .forecasting_algorithm import quickly_forecast_many
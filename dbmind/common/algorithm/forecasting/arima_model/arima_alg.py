@@ -13,6 +13,9 @@
 
 import itertools
 import logging
+import threading
+import time
+from collections import OrderedDict
 from types import SimpleNamespace
 
 import numpy as np
@@ -40,6 +43,60 @@ MIN_AR_ORDER, MAX_AR_ORDER = 0, 6
 MIN_MA_ORDER, MAX_MA_ORDER = 0, 6
 MIN_DIFF_TIMES, MAX_DIFF_TIMES = 0, 3
 P_VALUE_THRESHOLD = 0.05
+ORDER_CACHE_SIZE = 1024
+ORDER_CACHE_TTL = 3600  # unit: second
+
+# The selected order and fitted parameters of each metric, which
+# help to skip the order search and warm-start the optimizer.
+_order_cache = OrderedDict()
+_order_cache_lock = threading.Lock()
+
+
+def _get_cached_order(key):
+    if key is None:
+        return None
+    with _order_cache_lock:
+        entry = _order_cache.get(key)
+        if entry is None:
+            return None
+        # Search the order again after a while in case the feature of the metric changed.
+        if time.monotonic() - entry.searched_time > ORDER_CACHE_TTL:
+            _order_cache.pop(key)
+            return None
+        _order_cache.move_to_end(key)
+        return entry
+
+
+def _cache_order(key, order, params, searched_time=None):
+    if key is None:
+        return
+    with _order_cache_lock:
+        _order_cache[key] = SimpleNamespace(
+            order=order,
+            params=np.array(params),
+            searched_time=time.monotonic() if searched_time is None else searched_time
+        )
+        _order_cache.move_to_end(key)
+        while len(_order_cache) > ORDER_CACHE_SIZE:
+            _order_cache.popitem(last=False)
+
+
+def clear_order_cache():
+    with _order_cache_lock:
+        _order_cache.clear()
+
+
+def _evaluate_order(original_data, p, d, q, is_transparams=False):
+    """Return the BIC of ARIMA(p, d, q) for the data, or None if not available.
+    This function is at the module level so that it can be sent to worker processes."""
+    model = ARIMA(is_transparams=is_transparams)
+    model.original_data = original_data
+    try:
+        model.fit_once(p, d, q)
+    except InvalidParameter:
+        return None
+    bic = model.bic
+    return None if np.isnan(bic) else bic
 
 
 def trans_params(params, p, q):
@@ -89,6 +146,10 @@ class ARIMA(ForecastingAlgorithm):
     ARIMA = AR(Auto-Regressive) + I(Integrated) + MA(Moving Average)
     """
 
+    # An executor which has the method `parallel_execute(func, iterable)`,
+    # such as the ProcessWorker. If set, the candidate orders are evaluated concurrently.
+    executor = None
+
     def __init__(self, is_transparams=False, given_parameters=None):
         self.is_transparams = is_transparams
         self.given_parameters = given_parameters
@@ -102,67 +163,81 @@ class ARIMA(ForecastingAlgorithm):
     def fit(self, sequence):
         self.original_data = np.array(sequence.values).astype('float64')
         if self.given_parameters is None:
-            # To determine d by Augmented-Dickey-Fuller method.
-            n_diff = MIN_DIFF_TIMES
-            for n_diff in range(MIN_DIFF_TIMES, MAX_DIFF_TIMES + 1):
-                diff_data = np.diff(self.original_data, n=n_diff)
-                adf_res = adfuller(diff_data, max_lag=None)
-                if adf_res[1] < P_VALUE_THRESHOLD and adf_res[0] < adf_res[4]['5%']:
-                    d = n_diff
-                    break
+            key = (sequence.name, tuple(sorted(sequence.labels.items()))) if sequence.name else None
+            cached = _get_cached_order(key)
+            if cached is not None and self._fit_cached_order(cached):
+                searched_time = cached.searched_time
             else:
-                d = n_diff
-
-            orders = []
-            p_q_pairs = itertools.product(
-                range(MIN_AR_ORDER, MAX_AR_ORDER + 1, 2),
-                range(MIN_MA_ORDER, MAX_MA_ORDER + 1, 2)
-            )
-            for p, q in p_q_pairs:  # Look for the optimal parameters (p, q).
-                if p == 0 and q == 0:
-                    continue
-
-                try:
-                    self.fit_once(p, d, q)
-                    if not np.isnan(self.bic):
-                        orders.append((self.bic, p, q))
-                except InvalidParameter:
-                    continue
-
-            sorted_orders = sorted(orders)
-            if len(sorted_orders) == 0:
-                raise InvalidParameter(
-                    'Cannot get proper parameters for the sequence: %s.' % str(sequence.values)
-                )
-
-            _, p0, q0 = sorted_orders[0]
-            for p, q in [(p0 - 1, q0), (p0, q0 - 1), (p0 + 1, q0), (p0, q0 + 1)]:
-                if p < 0 or q < 0:
-                    continue
-
-                try:
-                    self.fit_once(p, d, q)
-                    if not np.isnan(self.bic):
-                        orders.append((self.bic, p, q))
-                except InvalidParameter:
-                    continue
-
-            for _, p, q in sorted(orders):
-                try:
-                    self.fit_once(p, d, q)
-                    break
-                except InvalidParameter:
-                    continue
-            else:
-                raise AttributeError('Not any (p, d, q) combination is available.')
-
+                self._search_order(sequence)
+                searched_time = None
+            _cache_order(key, (self.order.ar, self.order.diff, self.order.ma), self.params, searched_time)
         else:
             p, d, q = self.given_parameters
             self.fit_once(p, d, q)
 
         self.resid = self.get_resid()
 
-    def fit_once(self, p, d, q):
+    def _fit_cached_order(self, cached):
+        p, d, q = cached.order
+        try:
+            self.fit_once(p, d, q, start_params=cached.params)
+        except InvalidParameter:
+            return False
+        return not np.isnan(self.bic)
+
+    def _evaluate_orders(self, d, p_q_pairs):
+        p_q_pairs = list(p_q_pairs)
+        bics = None
+        if self.executor is not None and len(p_q_pairs) > 1:
+            bics = self.executor.parallel_execute(
+                _evaluate_order,
+                ((self.original_data, p, d, q, self.is_transparams) for p, q in p_q_pairs)
+            )
+        if bics is None:
+            bics = [_evaluate_order(self.original_data, p, d, q, self.is_transparams) for p, q in p_q_pairs]
+        return [(bic, p, q) for bic, (p, q) in zip(bics, p_q_pairs) if bic is not None]
+
+    def _search_order(self, sequence):
+        # To determine d by Augmented-Dickey-Fuller method.
+        n_diff = MIN_DIFF_TIMES
+        for n_diff in range(MIN_DIFF_TIMES, MAX_DIFF_TIMES + 1):
+            diff_data = np.diff(self.original_data, n=n_diff)
+            adf_res = adfuller(diff_data, max_lag=None)
+            if adf_res[1] < P_VALUE_THRESHOLD and adf_res[0] < adf_res[4]['5%']:
+                d = n_diff
+                break
+        else:
+            d = n_diff
+
+        # Look for the optimal parameters (p, q).
+        p_q_pairs = itertools.product(
+            range(MIN_AR_ORDER, MAX_AR_ORDER + 1, 2),
+            range(MIN_MA_ORDER, MAX_MA_ORDER + 1, 2)
+        )
+        orders = self._evaluate_orders(d, ((p, q) for p, q in p_q_pairs if p or q))
+
+        sorted_orders = sorted(orders)
+        if len(sorted_orders) == 0:
+            raise InvalidParameter(
+                'Cannot get proper parameters for the sequence: %s.' % str(sequence.values)
+            )
+
+        _, p0, q0 = sorted_orders[0]
+        orders.extend(self._evaluate_orders(
+            d,
+            ((p, q) for p, q in [(p0 - 1, q0), (p0, q0 - 1), (p0 + 1, q0), (p0, q0 + 1)] if p >= 0 and q >= 0)
+        ))
+
+        for _, p, q in sorted(orders):
+            try:
+                self.fit_once(p, d, q)
+                break
+            except InvalidParameter:
+                continue
+        else:
+            raise AttributeError('Not any (p, d, q) combination is available.')
+
+    def fit_once(self, p, d, q, start_params=None):
         """
         fit p, q for ARIMA model.
         :param p: type->int  Auto-Correlation order of the ARIMA model which indicates
@@ -171,6 +246,8 @@ class ARIMA(ForecastingAlgorithm):
                              the data to make it stationary.
         :param q: type->int  Moving Average order of the ARIMA model which indicates
                              how many historical resid the MA procedure uses.
+        :param start_params: type->np.array  The parameters to warm-start the optimizer,
+                             e.g., the fitted parameters of the last time.
         """
 
         def loglike(params):
@@ -183,10 +260,15 @@ class ARIMA(ForecastingAlgorithm):
         self.endog = y
         self.order = SimpleNamespace(ar=p, diff=d, ma=q)
 
-        old_hash = hash(self.endog.tobytes())
-        start_params = self._fit_start_params()
-        new_hash = hash(self.endog.tobytes())
-        dbmind_assert(old_hash == new_hash)
+        if start_params is not None and len(start_params) == p + q:
+            start_params = np.array(start_params, dtype='float64')
+            if self.is_transparams:
+                start_params = inv_trans_params(start_params, p, q)
+        else:
+            old_hash = hash(self.endog.tobytes())
+            start_params = self._fit_start_params()
+            new_hash = hash(self.endog.tobytes())
+            dbmind_assert(old_hash == new_hash)
 
         lbfgs_attributes = {
             'disp': 0,
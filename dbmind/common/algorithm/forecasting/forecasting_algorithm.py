@@ -13,6 +13,8 @@
 
 import logging
 import threading
+import time
+from collections import defaultdict
 from types import SimpleNamespace
 from typing import Union, List
 
@@ -102,8 +104,10 @@ def decompose_sequence(sequence):
     )
     if is_seasonal:
         seasonal, trend, residual = seasonal_interface.seasonal_decompose(raw_data, period=period)
-        train_sequence = Sequence(timestamps=sequence.timestamps, values=trend)
-        train_sequence = sequence_interpolate(train_sequence)
+        # Keep the name and labels so that the model can identify the metric.
+        train_sequence = Sequence(timestamps=sequence.timestamps, values=trend,
+                                  name=sequence.name, step=sequence.step, labels=sequence.labels)
+        train_sequence = sequence_interpolate(train_sequence, strip_details=False)
         seasonal_data = SimpleNamespace(
             is_seasonal=is_seasonal,
             seasonal=seasonal,
@@ -116,6 +120,59 @@ def decompose_sequence(sequence):
     return seasonal_data, train_sequence
 
 
+def decompose_sequences(sequences):
+    """Vectorized `decompose_sequence` for many sequences.
+    The sequences with the same length are stacked into a 2-D array to
+    detect seasonality and decompose together.
+
+    :return: a list of (seasonal_data, train_sequence) in the same order,
+        or None for the sequence that cannot be decomposed.
+    """
+    rv = [None] * len(sequences)
+    groups = defaultdict(list)
+    for i, sequence in enumerate(sequences):
+        groups[len(sequence)].append(i)
+
+    for indexes in groups.values():
+        matrix = np.array([sequences[i].values for i in indexes], dtype='float64')
+        seasonal_results = seasonal_interface.is_seasonal_series_2d(
+            matrix,
+            high_ac_threshold=0.1,
+            min_seasonal_freq=2
+        )
+        periods = defaultdict(list)
+        for row, (is_seasonal, period) in enumerate(seasonal_results):
+            if is_seasonal:
+                periods[period].append(row)
+            else:
+                rv[indexes[row]] = (None, sequences[indexes[row]])
+
+        for period, rows in periods.items():
+            try:
+                seasonal, trend, residual = seasonal_interface.seasonal_decompose_2d(matrix[rows], period=period)
+            except ValueError as e:
+                logging.warning('Cannot decompose sequences with period %d: %s.', period, e)
+                continue
+            for j, row in enumerate(rows):
+                sequence = sequences[indexes[row]]
+                train_sequence = Sequence(timestamps=sequence.timestamps, values=trend[j],
+                                          name=sequence.name, step=sequence.step, labels=sequence.labels)
+                try:
+                    train_sequence = sequence_interpolate(train_sequence, strip_details=False)
+                except ValueError as e:
+                    logging.warning('Cannot decompose the sequence %s: %s.', sequence.name, e)
+                    continue
+                seasonal_data = SimpleNamespace(
+                    is_seasonal=True,
+                    seasonal=seasonal[j],
+                    trend=trend[j],
+                    resid=residual[j],
+                    period=period
+                )
+                rv[indexes[row]] = (seasonal_data, train_sequence)
+    return rv
+
+
 def compose_sequence(seasonal_data, train_sequence, forecast_values):
     forecast_length = len(forecast_values)
     if seasonal_data and seasonal_data.is_seasonal:
@@ -161,7 +218,7 @@ def quickly_forecast(sequence, forecasting_minutes, lower=0, upper=float('inf'),
             raise ValueError("The forecasting minutes is too short.")
 
         # 2. interpolate
-        interpolated_sequence = sequence_interpolate(sequence)
+        interpolated_sequence = sequence_interpolate(sequence, strip_details=False)
 
         # 3. decompose sequence
         seasonal_data, train_sequence = decompose_sequence(interpolated_sequence)
@@ -202,3 +259,96 @@ def quickly_forecast(sequence, forecasting_minutes, lower=0, upper=float('inf'),
         return result_sequence
     else:
         return result_sequence, model
+
+
+def _fit_and_forecast(train_sequence, forecasting_length):
+    """Fit a model and forecast, returning the forecast data and elapsed seconds.
+    This function is at the module level so that it can be sent to worker processes."""
+    start_time = time.monotonic()
+    model = ForecastingFactory.get_instance(train_sequence)
+    model.fit(train_sequence)
+    forecast_data = trim_head_and_tail_nan(model.forecast(forecasting_length))
+    return forecast_data, time.monotonic() - start_time
+
+
+def quickly_forecast_many(sequences, forecasting_minutes, lower=0, upper=float('inf'), executor=None):
+    """
+    Batched version of `quickly_forecast` for a fleet of sequences. The seasonality
+    detection and decomposition are vectorized over the sequences with the same length,
+    and the models are fitted by the executor if given.
+    :param sequences: type->list of Sequence
+    :param forecasting_minutes: type->int or float
+    :param lower: The lower limit of the forecast result
+    :param upper: The upper limit of the forecast result.
+    :param executor: An object which has the method `parallel_execute(func, iterable)`, e.g., the ProcessWorker.
+    :return: a list of forecast sequences and a list of elapsed seconds for each sequence,
+        both in the same order as the given sequences. The forecast sequence is empty if failed.
+    """
+    forecast_sequences = [Sequence() for _ in sequences]
+    elapsed_seconds = [0.] * len(sequences)
+    try:
+        _check_forecasting_time(forecasting_minutes)
+    except ValueError as e:
+        logging.warning(f"An Exception was raised while quickly forecasting: {e}")
+        return forecast_sequences, elapsed_seconds
+
+    # 1. check for sequence length and forecasting minutes, then interpolate
+    indexes, interpolated_sequences, forecasting_lengths = [], [], []
+    for i, sequence in enumerate(sequences):
+        start_time = time.monotonic()
+        try:
+            if len(sequence) <= 1:
+                raise ValueError("The sequence length is too short.")
+            forecasting_length = int(forecasting_minutes * 60 * 1000 / sequence.step)
+            if forecasting_length == 0 or forecasting_minutes == 0:
+                raise ValueError("The forecasting minutes is too short.")
+            interpolated_sequences.append(sequence_interpolate(sequence, strip_details=False))
+            indexes.append(i)
+            forecasting_lengths.append(forecasting_length)
+        except ValueError as e:
+            logging.warning(f"An Exception was raised while quickly forecasting: {e}")
+        elapsed_seconds[i] += time.monotonic() - start_time
+
+    # 2. decompose sequences in batch, the elapsed time is shared by these sequences
+    start_time = time.monotonic()
+    decomposed = decompose_sequences(interpolated_sequences)
+    for i in indexes:
+        elapsed_seconds[i] += (time.monotonic() - start_time) / len(indexes)
+    tasks = [(j, decomposed[j][1], forecasting_lengths[j]) for j in range(len(indexes)) if decomposed[j]]
+
+    # 3. fit models and forecast
+    if executor is not None and len(tasks) > 1:
+        outputs = executor.parallel_execute(
+            _fit_and_forecast, ((train_sequence, length) for _, train_sequence, length in tasks)
+        ) or [None] * len(tasks)
+    else:
+        outputs = []
+        for _, train_sequence, length in tasks:
+            try:
+                outputs.append(_fit_and_forecast(train_sequence, length))
+            except Exception as e:
+                logging.warning(f"An Exception was raised while quickly forecasting: {e}")
+                outputs.append(None)
+
+    # 4. compose sequences
+    for (j, train_sequence, length), output in zip(tasks, outputs):
+        if output is None:
+            continue
+        forecast_data, fitting_seconds = output
+        i = indexes[j]
+        elapsed_seconds[i] += fitting_seconds
+        if len(forecast_data) != length:
+            logging.warning('Unexpected length of the forecast data of %s.', sequences[i].name)
+            continue
+        forecast_timestamps, forecast_values = compose_sequence(
+            decomposed[j][0],
+            train_sequence,
+            forecast_data
+        )
+        forecast_sequences[i] = Sequence(
+            timestamps=forecast_timestamps,
+            values=np.maximum(np.minimum(forecast_values, upper), lower),
+            name=sequences[i].name,
+            labels=sequences[i].labels
+        )
+    return forecast_sequences, elapsed_seconds
@@ -62,6 +62,10 @@ def is_seasonal_series(x, high_ac_threshold: float = 0.5, min_seasonal_freq=3):
     detrended = x - decompose_trend(x, np.ones(window) / window)
 
     ac_coef = acf(detrended, nlags=len(x) - 1)  # auto-correlation coefficient
+    return _find_period(ac_coef, high_ac_threshold, min_seasonal_freq)
+
+
+def _find_period(ac_coef, high_ac_threshold, min_seasonal_freq):
     valleys = signal.find_peaks(-ac_coef, height=(0, None))[0]
     lower_bound = valleys[0] if valleys.size else 0
     high_ac_peak_pos = signal.find_peaks(ac_coef, height=(0, None))[0]
@@ -83,6 +87,35 @@ def is_seasonal_series(x, high_ac_threshold: float = 0.5, min_seasonal_freq=3):
     return False, None
 
 
+def acf_2d(x, nlags=None):
+    """Vectorized `acf` for each row of a 2-D array.
+    The auto-covariances are computed by FFT instead of `np.correlate`."""
+    x = np.asarray(x, dtype='float64')
+    n = x.shape[1]
+    if nlags is None:
+        nlags = n - 1
+
+    x_diff = x - x.mean(axis=1, keepdims=True)
+    fft_size = 1 << (2 * n - 1).bit_length()  # avoid circular overlapping.
+    freq = np.fft.rfft(x_diff, n=fft_size, axis=1)
+    acov = np.fft.irfft(freq * np.conjugate(freq), n=fft_size, axis=1)[:, :n] / n
+    return acov[:, :nlags + 1] / acov[:, :1]
+
+
+def is_seasonal_series_2d(x, high_ac_threshold: float = 0.5, min_seasonal_freq=3):
+    """Vectorized `is_seasonal_series` for each row of a 2-D array.
+
+    :return: a list of (is_seasonal, period) for each row.
+    """
+    n = x.shape[1]
+    window = max(MIN_WINDOW, n // (min_seasonal_freq + 1))
+    window = min(window, n - 1)
+    detrended = x - decompose_trend_2d(x, np.ones(window) / window)
+
+    ac_coefs = acf_2d(detrended, nlags=n - 1)
+    return [_find_period(ac_coef, high_ac_threshold, min_seasonal_freq) for ac_coef in ac_coefs]
+
+
 def get_seasonal_period(values, high_ac_threshold: float = 0.5, min_seasonal_freq=3):
     return is_seasonal_series(values, high_ac_threshold, min_seasonal_freq)[1]
 
@@ -131,6 +164,28 @@ def decompose_trend(x, conv_kernel):
     return result
 
 
+def extrapolate_2d(x, head, tail, length):
+    """Vectorized `extrapolate` for each row of a 2-D array."""
+    head_template = x[:, :length]
+    k = np.polyfit(np.arange(1, head_template.shape[1] + 1), head_template.T, deg=1)[0][:, np.newaxis]
+    head = k * np.arange(head) + x[:, :1] - head * k
+    tail_template = x[:, -length:]
+    k = np.polyfit(np.arange(1, tail_template.shape[1] + 1), tail_template.T, deg=1)[0][:, np.newaxis]
+    tail = k * np.arange(tail) + x[:, -1:] + k
+    return np.concatenate((head, x, tail), axis=1)
+
+
+def decompose_trend_2d(x, conv_kernel):
+    """Vectorized `decompose_trend` for each row of a 2-D array."""
+    length = len(conv_kernel)
+    tail = (length - 1) // 2
+    head = length - 1 - tail
+    windows = np.lib.stride_tricks.sliding_window_view(x, length, axis=1)
+    # The convolution flips the kernel.
+    result = windows @ conv_kernel[::-1]
+    return extrapolate_2d(result, head, tail, length)
+
+
 def decompose_seasonal(x, detrended, period):
     """
     To decompose the seasonal component from detrended data, the method overlays
@@ -168,3 +223,28 @@ def seasonal_decompose(x, period=None):
     seasonal = decompose_seasonal(x, detrended, period)
     resid = detrended - seasonal
     return seasonal, trend, resid
+
+
+def seasonal_decompose_2d(x, period):
+    """Vectorized `seasonal_decompose` for each row of a 2-D array,
+    of which all rows share the same period."""
+    if np.ndim(x) != 2:
+        raise ValueError("The input data must be 2-D numpy.array.")
+
+    if not isinstance(period, int):
+        raise ValueError("You must specify a period.")
+
+    if not np.all(np.isfinite(x)):
+        raise ValueError("The input data has infinite value or nan value.")
+
+    n = x.shape[1]
+    if n < 2 * period:
+        raise ValueError(f"The input data should be longer than two periods:{2 * period} at least.")
+
+    trend = decompose_trend_2d(x, _conv_kernel(period))
+    detrended = x - trend
+    period_averages = np.stack([np.mean(detrended[:, i::period], axis=1) for i in range(period)], axis=1)
+    period_averages -= np.mean(period_averages, axis=1, keepdims=True)
+    seasonal = np.tile(period_averages, n // period + 1)[:, :n]
+    resid = detrended - seasonal
+    return seasonal, trend, resid
@@ -86,6 +86,73 @@ def np_double_rolling(values, window=(1, 1), diff_mode="diff", agg='median', tri
     return r_data
 
 
+def double_padding_2d(values, window):
+    """2-D version of `double_padding`, padding each row."""
+    length = values.shape[1]
+    window = 1 if length < window else window
+    left_idx = window - 1 - (window - 1) // 2
+    right_idx = length - 1 - (window - 1) // 2
+    values[:, :left_idx] = values[:, left_idx:left_idx + 1]  # padding left
+    values[:, right_idx + 1:] = values[:, right_idx:right_idx + 1]  # padding right
+    return values
+
+
+def np_rolling_2d(values, window=1, trim=False, agg='median'):
+    """2-D version of `np_rolling`, rolling along each row.
+
+    Each row is padded by NaN so that all windows can be viewed as
+    one array and aggregated by a single NaN-aware operation, which
+    has the same results as the truncated windows of `np_rolling`.
+    """
+    funcs = {
+        'median': np.nanmedian,
+        'mean': np.nanmean,
+        'std': lambda a, axis: np.nanstd(a, axis=axis, ddof=1)
+    }
+    func = funcs[agg]
+    length = values.shape[1]
+    left_idx = window - 1 - (window - 1) // 2
+    padded = np.pad(
+        values.astype('float'), ((0, 0), (left_idx, window - 1 - left_idx)), constant_values=np.nan
+    )
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window, axis=1)
+    res = func(windows, axis=-1)
+    if agg == 'std':
+        # Be consistent with `np_nanstd`.
+        positions = np.arange(length)
+        sizes = np.minimum(positions + window - left_idx, length) - np.maximum(0, positions - left_idx)
+        res[:, sizes == 1] = 0.0
+    if trim:
+        res = double_padding_2d(res, window)
+    return res
+
+
+def np_double_rolling_2d(values, window=(1, 1), diff_mode="diff", agg='median', trim=True):
+    """2-D version of `np_double_rolling`, processing each row."""
+    values_length = values.shape[1]
+    window1 = 1 if values_length < window[0] else window[0]
+    window2 = 1 if values_length < window[1] else window[1]
+
+    shifted_values = values.astype('float')
+    if values_length >= 2:
+        shifted_values[:, 1:] = shifted_values[:, :-1].copy()
+        shifted_values[:, 0] = np.nan
+    left_rolling = np_rolling_2d(shifted_values, window=window1, agg=agg)
+    right_rolling = np_rolling_2d(values[:, ::-1], window=window2, agg=agg)[:, ::-1]
+    r_data = right_rolling - left_rolling
+
+    functions = {
+        'abs': lambda x: np.abs(x),
+        'rel': lambda x: x / left_rolling
+    }
+    methods = diff_mode.split('_')[:-1]
+    for method in methods:
+        r_data = functions[method](r_data)
+    if trim:
+        r_data = double_padding_2d(r_data, max(window1, window2))
+    return r_data
+
+
 def measure_head_and_tail_nan(data):
     data_not_nan = -1 * np.isnan(data)
     left = data_not_nan.argmax()
@@ -116,9 +116,12 @@ class Driver:
         return self.parsed_dsn['password']
 
     def query(self, stmt, timeout=0, force_connection_db=None,
-              return_tuples=False, fetch_all=False, ignore_error=False):
+              return_tuples=False, fetch_all=False, ignore_error=False, raise_error=False):
+        """Return an empty list if the execution fails, unless `raise_error` is set,
+        which lets the caller tell a failure from an empty result."""
         dbmind_assert(self.initialized)
 
+        error = None
         cursor_dict = {}
         if not return_tuples:
             cursor_dict['cursor_factory'] = psycopg2.extras.RealDictCursor
@@ -159,6 +162,7 @@ class Driver:
                         'but threshold is %fs.' % (time.monotonic() - start, timeout)
                     )
                     result = []
+                    error = e
                 except psycopg2.errors.FeatureNotSupported:
                     logging.warning('FeatureNotSupported while executing %s.', stmt)
                     result = []
@@ -175,9 +179,13 @@ class Driver:
         except psycopg2.InternalError as e:
             logging.error("Cannot execute '%s' due to internal error: %s." % (stmt, e.pgerror))
             result = []
+            error = e
         except Exception as e:
             logging.exception(e)
             result = []
+            error = e
+        if raise_error and error is not None:
+            raise error
         return result
 
     def get_conn(self, force_connection_db=None):
@@ -341,12 +349,13 @@ class DriverBundle:
         parsed_dsn['dbname'] = dbname
         return ' '.join(['{}={}'.format(k, v) for (k, v) in parsed_dsn.items()])
 
-    def query(self, stmt, timeout=0, force_connection_db=None, return_tuples=False):
+    def query(self, stmt, timeout=0, force_connection_db=None, return_tuples=False, raise_error=False):
         """A decorator for Driver.query. If the caller sets
         the parameter `force_connection_db`, this method only returns
         the query result from this specified database.
         Otherwise, the method will return the
         union set of each database's execution result.
+        If `raise_error` is set, the failure of any database is raised.
 
         This method need to guaranteed thread safety.
         """
@@ -356,7 +365,8 @@ class DriverBundle:
         if force_connection_db is not None:
             if force_connection_db not in self._bundle:
                 return []
-            return self._bundle[force_connection_db].query(stmt, timeout, None, return_tuples)
+            return self._bundle[force_connection_db].query(stmt, timeout, None, return_tuples,
+                                                           raise_error=raise_error)
 
         # Use multiple threads to query.
         futures = []
@@ -364,7 +374,7 @@ class DriverBundle:
             driver = self._bundle[dbname]
             futures.append(
                 DriverBundle._thread_pool_executor.submit(
-                    driver.query, stmt, timeout, None, return_tuples
+                    driver.query, stmt, timeout, None, return_tuples, raise_error=raise_error
                 )
             )
 
@@ -380,6 +390,8 @@ class DriverBundle:
                     else:
                         union_set.add(tuple(row.items()))
             except Exception as e:
+                if raise_error:
+                    raise
                 logging.exception(e)
         if return_tuples:
             return list(union_set)
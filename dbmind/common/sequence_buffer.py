@@ -10,14 +10,20 @@
 # EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
 # MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
 # See the Mulan PSL v2 for more details.
+import hashlib
+import json
 import logging
 import math
+import mmap
+import os
 import threading
 import time
 import re
 from collections import defaultdict
 from typing import Callable
 
+import numpy as np
+
 from .algorithm.basic import how_many_lesser_elements, binary_search, binary_search_rightmost, binary_search_leftmost
 from .types.sequence import Sequence
 from .utils import dbmind_assert
@@ -536,8 +542,299 @@ def is_dict_matched_regex(parent: dict, regex: dict):
     return True
 
 
+class LabelIndex:
+    """Inverted index over the label sets of a metric.
+
+    Each label set is given an incremental id. For equality filters, we
+    intersect the posting lists (label name -> label value -> ids). For regex
+    filters, the matched ids are cached per rule and only the ids added since
+    the last lookup are checked. Because label sets are never removed from the
+    buffer (eviction only empties their trees), the index only grows.
+    """
+    MAX_CACHED_RULES = 256
+
+    def __init__(self):
+        self.label_sets = []
+        self._ids = dict()
+        self._postings = defaultdict(lambda: defaultdict(set))
+        # (label name, rule) -> [number of checked ids, matched ids]
+        self._regex_cache = dict()
+
+    def __len__(self):
+        return len(self.label_sets)
+
+    def add(self, frozen_labels):
+        if frozen_labels in self._ids:
+            return
+        id_ = len(self.label_sets)
+        self.label_sets.append(frozen_labels)
+        self._ids[frozen_labels] = id_
+        for k, v in frozen_labels:
+            self._postings[k][v].add(id_)
+
+    def update(self, keys):
+        for frozen_labels in keys:
+            self.add(frozen_labels)
+
+    def _match_regex(self, label_name, rule):
+        key = (label_name, rule)
+        if key not in self._regex_cache:
+            if len(self._regex_cache) >= self.MAX_CACHED_RULES:
+                self._regex_cache.clear()
+            self._regex_cache[key] = [0, set()]
+        entry = self._regex_cache[key]
+        checked, matched = entry
+        if checked < len(self.label_sets):
+            pattern = re.compile(rule)
+            for id_ in range(checked, len(self.label_sets)):
+                value = dict(self.label_sets[id_]).get(label_name)
+                if value is not None and pattern.match(value):
+                    matched.add(id_)
+            entry[0] = len(self.label_sets)
+        return matched
+
+    def search(self, labels, labels_like=None):
+        """Returns the label sets which contain `labels` and match `labels_like`,
+        in the order they were added."""
+        candidates = []
+        for k, v in labels.items():
+            posting = self._postings[k].get(v) if k in self._postings else None
+            if not posting:
+                return []
+            candidates.append(posting)
+        for k, rule in (labels_like or {}).items():
+            matched = self._match_regex(k, rule)
+            if not matched:
+                return []
+            candidates.append(matched)
+
+        if len(candidates) == 0:
+            return list(self.label_sets)
+        candidates.sort(key=len)
+        ids = set(candidates[0])
+        for posting in candidates[1:]:
+            ids.intersection_update(posting)
+            if not ids:
+                return []
+        return [self.label_sets[id_] for id_ in sorted(ids)]
+
+
+class SequenceSegmentStore:
+    """The optional on-disk tier of :class:`SequenceBufferPool`.
+
+    Each series, which is identified by its metric name, labels and step, owns
+    an append-only file. Every sequence put into the buffer pool is appended to
+    that file as a segment whose layout is::
+
+        [count: int64][timestamps: int64 * count][values: float64 * count]
+
+    A segment is written by a single ``write()`` on a file opened with ``O_APPEND``,
+    so concurrent writers (e.g., the children of ProcessWorker) never interleave
+    a segment. The files are read by memory mapping and a truncated trailing segment,
+    left by a crash, is ignored. The metric name and labels of a series are
+    kept in a sidecar JSON file, which is replaced atomically.
+
+    :param directory: where to place the files.
+    :param max_bytes: the upper bound of the total size of segment files.
+    :param ttl: how long (in milliseconds) a point is retained on disk.
+    """
+    SEGMENT_SUFFIX = '.seg'
+    META_SUFFIX = '.json'
+    _HEADER_BYTES = 8
+    _POINT_BYTES = 16
+
+    def __init__(self, directory, max_bytes=float('inf'), ttl=float('inf')):
+        self.directory = os.path.realpath(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self._lock = threading.RLock()
+        # series id -> {'name': ..., 'labels': ..., 'step': ..., 'access': ...}
+        self._index = dict()
+        self.refresh()
+
+    @staticmethod
+    def series_id(metric_name, frozen_labels, step):
+        key = json.dumps([metric_name, list(frozen_labels), step])
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def _path(self, series_id, suffix):
+        return os.path.join(self.directory, series_id + suffix)
+
+    def refresh(self):
+        """Loads the series written by other processes or by the previous run."""
+        with self._lock:
+            for filename in os.listdir(self.directory):
+                series_id, suffix = os.path.splitext(filename)
+                if suffix != self.META_SUFFIX or series_id in self._index:
+                    continue
+                try:
+                    with open(self._path(series_id, self.META_SUFFIX)) as fp:
+                        meta = json.load(fp)
+                    meta['access'] = os.path.getmtime(self._path(series_id, self.SEGMENT_SUFFIX))
+                except (OSError, ValueError) as e:
+                    logging.warning('[SequenceSegmentStore] skipped the broken series %s.', series_id, exc_info=e)
+                    continue
+                self._index[series_id] = meta
+
+    def _write_meta(self, series_id, meta):
+        path = self._path(series_id, self.META_SUFFIX)
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp_path, 'w') as fp:
+            json.dump(meta, fp)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def _pack(cls, timestamps, values):
+        return b''.join((
+            np.array([len(timestamps)], dtype='<i8').tobytes(),
+            np.asarray(timestamps, dtype='<i8').tobytes(),
+            np.asarray(values, dtype='<f8').tobytes()
+        ))
+
+    def append(self, sequence: Sequence):
+        if len(sequence) == 0 or not sequence.step:
+            return
+        try:
+            payload = self._pack(sequence.timestamps_array, sequence.values_array)
+        except (TypeError, ValueError):
+            # Only numeric sequences can be persisted.
+            return
+
+        frozen_labels = frozendict(sequence.labels)
+        series_id = self.series_id(sequence.name, frozen_labels, sequence.step)
+        with self._lock:
+            if series_id not in self._index:
+                meta = {'name': sequence.name, 'labels': [list(pair) for pair in frozen_labels],
+                        'step': sequence.step}
+                self._write_meta(series_id, meta)
+                self._index[series_id] = meta
+            if not self._index[series_id].get('repaired'):
+                self._repair(series_id)
+                self._index[series_id]['repaired'] = True
+            fd = os.open(self._path(series_id, self.SEGMENT_SUFFIX),
+                         os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, payload)
+            finally:
+                os.close(fd)
+            self._index[series_id]['access'] = time.time()
+
+    def _read_segments(self, series_id):
+        """Returns the complete segments of the series and the size they take up."""
+        path = self._path(series_id, self.SEGMENT_SUFFIX)
+        segments = []
+        offset = 0
+        try:
+            size = os.path.getsize(path)
+            if size == 0:
+                return segments, offset
+            with open(path, 'rb') as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                while offset + self._HEADER_BYTES <= size:
+                    count = int(np.frombuffer(mm, dtype='<i8', count=1, offset=offset)[0])
+                    end = offset + self._HEADER_BYTES + self._POINT_BYTES * count
+                    if count <= 0 or end > size:
+                        # A partial segment written by an interrupted process.
+                        break
+                    start = offset + self._HEADER_BYTES
+                    timestamps = np.frombuffer(mm, dtype='<i8', count=count, offset=start).copy()
+                    values = np.frombuffer(mm, dtype='<f8', count=count, offset=start + 8 * count).copy()
+                    segments.append((timestamps, values))
+                    offset = end
+        except OSError as e:
+            logging.warning('[SequenceSegmentStore] cannot read the series %s.', series_id, exc_info=e)
+        return segments, offset
+
+    def _repair(self, series_id):
+        """Cuts off the partial segment at the tail, otherwise the segments
+        appended after it cannot be read."""
+        path = self._path(series_id, self.SEGMENT_SUFFIX)
+        if not os.path.exists(path):
+            return
+        _, valid_size = self._read_segments(series_id)
+        if valid_size < os.path.getsize(path):
+            logging.warning('[SequenceSegmentStore] truncated the partial segment of the series %s.', series_id)
+            os.truncate(path, valid_size)
+
+    def find(self, metric_name, labels, labels_like=None):
+        def lookup():
+            return [
+                series_id for series_id, meta in self._index.items()
+                if meta['name'] == metric_name
+                and dict_belongs_to(restore2dict(meta['labels']), labels)
+                and is_dict_matched_regex(restore2dict(meta['labels']), labels_like)
+            ]
+
+        with self._lock:
+            rv = lookup()
+            if len(rv) == 0:
+                self.refresh()
+                rv = lookup()
+            return rv
+
+    def load(self, series_id):
+        """Returns the persisted segments of the series as a list of columnar sequences."""
+        with self._lock:
+            meta = self._index[series_id]
+            meta['access'] = time.time()
+            labels = restore2dict(meta['labels'])
+            return [
+                Sequence(timestamps, values, name=meta['name'], step=meta['step'],
+                         labels=labels, columnar=True)
+                for timestamps, values in self._read_segments(series_id)[0]
+            ]
+
+    def _remove(self, series_id):
+        self._index.pop(series_id, None)
+        for suffix in (self.SEGMENT_SUFFIX, self.META_SUFFIX):
+            try:
+                os.unlink(self._path(series_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    def _size(self, series_id):
+        try:
+            return os.path.getsize(self._path(series_id, self.SEGMENT_SUFFIX))
+        except OSError:
+            return 0
+
+    def evict(self, cutoff):
+        """Evicts the points lesser than the cut-off point, then evicts
+        the least recently used series until the size is under the bound."""
+        with self._lock:
+            self.refresh()
+            for series_id in list(self._index):
+                segments, _ = self._read_segments(series_id)
+                if len(segments) == 0:
+                    self._remove(series_id)
+                    continue
+                if min(timestamps[0] for timestamps, _ in segments) >= cutoff:
+                    continue
+                kept = []
+                for timestamps, values in segments:
+                    index = int(np.searchsorted(timestamps, cutoff, side='left'))
+                    if index < len(timestamps):
+                        kept.append(self._pack(timestamps[index:], values[index:]))
+                if len(kept) == 0:
+                    self._remove(series_id)
+                    continue
+                path = self._path(series_id, self.SEGMENT_SUFFIX)
+                tmp_path = '%s.%d.tmp' % (path, os.getpid())
+                with open(tmp_path, 'wb') as fp:
+                    fp.write(b''.join(kept))
+                os.replace(tmp_path, path)
+
+            sizes = {series_id: self._size(series_id) for series_id in self._index}
+            total_size = sum(sizes.values())
+            for series_id in sorted(self._index, key=lambda i: self._index[i]['access']):
+                if total_size <= self.max_bytes:
+                    break
+                total_size -= sizes[series_id]
+                self._remove(series_id)
+
+
 class SequenceBufferPool:
-    def __init__(self, ttl=float('inf'), vacuum_timeout=10, buffer=None):
+    def __init__(self, ttl=float('inf'), vacuum_timeout=10, buffer=None, disk_store=None):
         """\
         This data structure contains two-level keys:
         the first is metric name, the second is immutable labels.
@@ -551,10 +848,14 @@ class SequenceBufferPool:
          [SequenceTree([1,2,3,...], step=1), SequenceTree([1,3,...], step=2)]   [SequenceTree([1, 3, 5], step=2)
 
         :param ttl:
+        :param disk_store: an optional `SequenceSegmentStore` which keeps the sequences
+            across restarts and is shared by worker processes.
         """
         self.ttl = ttl
         self.timeout = vacuum_timeout
+        self.disk_store = disk_store
         self._buffer = defaultdict(dict) if buffer is None else buffer
+        self._label_indexes = defaultdict(LabelIndex)
         self._lock = threading.RLock()
         self._evict_thread = threading.Thread(
             target=self._evict_task,
@@ -595,17 +896,26 @@ class SequenceBufferPool:
         while True:
             time.sleep(self.timeout)
             self.evict(self.time() - self.ttl)
+            if self.disk_store is not None:
+                try:
+                    self.disk_store.evict(self.time() - self.disk_store.ttl)
+                except OSError as e:
+                    logging.warning('Failed to evict the on-disk sequence buffer.', exc_info=e)
 
     def _get_matched_collection(self, metric_name, labels, labels_like=None):
         with self._lock:
             lists = []
-            dictionaries = [restore2dict(t) for t in self._buffer[metric_name].keys()]
-            for d in dictionaries:
-                if dict_belongs_to(d, labels) and is_dict_matched_regex(d, labels_like):
-                    list_ = self._buffer[metric_name][frozendict(d)]
-                    dbmind_assert(isinstance(list_, list))
-                    if len(list_) > 0:
-                        lists.append(list_)
+            metric_dict = self._buffer[metric_name]
+            index = self._label_indexes[metric_name]
+            # The buffer may be shared with other processes, so
+            # we have to catch up with the label sets added by them.
+            if len(index) != len(metric_dict):
+                index.update(metric_dict.keys())
+            for frozen_labels in index.search(labels, labels_like):
+                list_ = metric_dict[frozen_labels]
+                dbmind_assert(isinstance(list_, list))
+                if len(list_) > 0:
+                    lists.append(list_)
             return lists
 
     def _get_or_create_sequence_trees(self, metric_name, labels, step):
@@ -666,12 +976,25 @@ class SequenceBufferPool:
             new_timestamps, sequence.values, sequence.name, sequence.step, sequence.labels
         )
 
-    def put(self, sequence: Sequence):
-        with self._lock:
-            dbmind_assert(sequence.name)
-            dbmind_assert(sequence.labels)
-            dbmind_assert(sequence.step > 0)
+    def _persist(self, sequences):
+        """Appends the sequences to the disk store, which should be called
+        without holding the lock, so the disk I/O doesn't block other fetchers."""
+        if self.disk_store is None:
+            return
+        for sequence in sequences:
+            try:
+                self.disk_store.append(sequence)
+            except OSError as e:
+                logging.warning('Failed to persist the sequence %s.', sequence.name, exc_info=e)
+
+    def put(self, sequence: Sequence, persist=True):
+        dbmind_assert(sequence.name)
+        dbmind_assert(sequence.labels)
+        dbmind_assert(sequence.step > 0)
+        if persist:
+            self._persist([sequence])
 
+        with self._lock:
             metric_name = sequence.name
             labels = sequence.labels
             step = sequence.step
@@ -744,7 +1067,35 @@ class SequenceBufferPool:
             tree = trees[0]
         return tree
 
+    def _load_from_disk(self, metric_name, labels, labels_like=None):
+        """Puts the sequences persisted by the disk store into the memory,
+        so the following lookup only needs to fetch the gaps. The disk store
+        is read without holding the lock."""
+        with self._lock:
+            if len(self._get_matched_collection(metric_name, labels, labels_like)) > 0:
+                return
+        cutoff = self.time() - self.disk_store.ttl
+        sequences = [
+            sequence
+            for series_id in self.disk_store.find(metric_name, labels, labels_like)
+            for sequence in self.disk_store.load(series_id)
+            if sequence.timestamps[-1] >= cutoff
+        ]
+        with self._lock:
+            for sequence in sequences:
+                self.put(sequence, persist=False)
+
     def get(self, metric_name, start_time, end_time, step, labels, fetcher_func: Callable, labels_like=None):
+        if self.disk_store is not None:
+            self._load_from_disk(metric_name, labels, labels_like)
+        # The fetched sequences are persisted after releasing the lock.
+        fetched = []
+        try:
+            return self._get(metric_name, start_time, end_time, step, labels, fetcher_func, labels_like, fetched)
+        finally:
+            self._persist(fetched)
+
+    def _get(self, metric_name, start_time, end_time, step, labels, fetcher_func, labels_like, fetched):
         with self._lock:
             matched_collection = self._get_matched_collection(metric_name, labels, labels_like)
             if len(matched_collection) == 0:
@@ -754,7 +1105,8 @@ class SequenceBufferPool:
                     # If the length of the sequence is 0, we don't need to put it into the buffer pool.
                     # Otherwise, there will be a sequence with zero step in the tree list.
                     if sequence.step:
-                        self.put(sequence)
+                        self.put(sequence, persist=False)
+                        fetched.append(sequence)
                 return sequences
 
             rv = []
@@ -776,7 +1128,8 @@ class SequenceBufferPool:
                     cached_sequences = sequences = fetcher_func(start_time, end_time, step)
                     for sequence in sequences:
                         sequence.step = sequence.step or step
-                        self.put(sequence)
+                        self.put(sequence, persist=False)
+                        fetched.append(sequence)
                     tree = self.locate_tree(trees, step)
                 dbmind_assert(tree.step)
 
@@ -799,7 +1152,8 @@ class SequenceBufferPool:
                     cached_sequences = sequences = fetcher_func(s, e, tree.step)
                     for sequence in sequences:
                         sequence.step = sequence.step or tree.step
-                        self.put(sequence)
+                        self.put(sequence, persist=False)
+                        fetched.append(sequence)
 
                 tree = self.locate_tree(trees, step)
                 try:
@@ -10,10 +10,16 @@
 # EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
 # MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
 # See the Mulan PSL v2 for more details.
+import codecs
+import json
 import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from urllib.parse import urlparse
 
+import numpy as np
+
 from dbmind.common.http.requests_utils import create_requests_session
 from dbmind.common.utils import cached_property
 
@@ -23,6 +29,14 @@ from ..types import Sequence
 from ..types.ssl import SSLContext
 
 
+# Prometheus refuses to return more than 11,000 points per series for a range query.
+MAX_POINTS_PER_SERIES = 11000
+MAX_PARALLEL_CHUNKS = 4
+STREAM_CHUNK_BYTES = 64 * 1024
+_RESULT_ARRAY_RE = re.compile(r'"result"\s*:\s*\[')
+_json_decoder = json.JSONDecoder()
+
+
 def label_to_query(labels: dict = None, labels_like: dict = None):
     query_list = list()
     if isinstance(labels, dict) and labels:
@@ -34,29 +48,122 @@ def label_to_query(labels: dict = None, labels_like: dict = None):
     return "{" + ",".join(query_list) + "}"
 
 
+def _iter_result_series(text_chunks):
+    """Parse the ``data.result`` array of a Prometheus response incrementally
+    and yield the series one by one. Hence, neither the whole response text nor
+    the whole JSON object needs to be held in memory."""
+    chunks = iter(text_chunks)
+    buffer = ''
+    exhausted = False
+
+    def read_more(least_length):
+        nonlocal buffer, exhausted
+        # Read until the buffer is long enough, so that the retrying
+        # decode of a large series costs linear time rather than quadratic.
+        while not exhausted and len(buffer) < least_length:
+            try:
+                buffer += next(chunks)
+            except StopIteration:
+                exhausted = True
+
+    match = None
+    while match is None:
+        match = _RESULT_ARRAY_RE.search(buffer)
+        if match is None:
+            if exhausted:
+                return
+            read_more(len(buffer) + 1)
+    pos = match.end()
+
+    while True:
+        while True:
+            # Skip whitespaces and separators between two series.
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) or exhausted:
+                break
+            buffer, pos = buffer[pos:], 0
+            read_more(1)
+        if pos >= len(buffer) or buffer[pos] == ']':
+            return
+        try:
+            datum, pos = _json_decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if exhausted:
+                raise
+            buffer, pos = buffer[pos:], 0
+            read_more(2 * len(buffer))
+            continue
+        yield datum
+
+
+def _datum_to_arrays(datum):
+    if 'values' not in datum:
+        datum['values'] = [datum.pop('value')]
+    datum_metric = datum.get('metric') or {}
+    datum_values = datum.get('values') or ()
+    timestamps = np.fromiter((int(item[0] * 1000) for item in datum_values),
+                             dtype=np.int64, count=len(datum_values))
+    values = np.fromiter((float(item[1]) for item in datum_values),
+                         dtype=np.float64, count=len(datum_values))
+    return datum_metric, timestamps, values
+
+
+def _create_sequence(datum_metric, timestamps, values, step=None):
+    metric_name = datum_metric.pop('__name__', None)
+    return Sequence(
+        timestamps=timestamps,
+        values=values,
+        name=metric_name,
+        labels=datum_metric,
+        step=step,
+        align_timestamp=(step is not None),
+        columnar=True
+    )
+
+
 # Standardized the format of return value.
 def _standardize(data, step=None):
     if step is not None:
         step = step * 1000  # convert to ms
     rv = []
     for datum in data:
-        if 'values' not in datum:
-            datum['values'] = [datum.pop('value')]
-        datum_metric = datum.get('metric') or {}
-        datum_values = datum.get('values') or {}
-        metric_name = datum_metric.pop('__name__', None)
-        rv.append(
-            Sequence(
-                timestamps=tuple(int(item[0] * 1000) for item in datum_values),
-                values=tuple(float(item[1]) for item in datum_values),
-                name=metric_name,
-                labels=datum_metric,
-                step=step,
-                align_timestamp=(step is not None)
-            )
-        )
+        rv.append(_create_sequence(*_datum_to_arrays(datum), step=step))
+    return rv
+
+
+def _stitch_chunks(chunks, step=None):
+    """Stitch the series of each chunk, which is in time order, into sequences."""
+    if step is not None:
+        step = step * 1000  # convert to ms
+    stitched = dict()
+    for chunk in chunks:
+        for key, (datum_metric, timestamps, values) in chunk.items():
+            if key not in stitched:
+                stitched[key] = (datum_metric, [], [])
+            stitched[key][1].append(timestamps)
+            stitched[key][2].append(values)
+
+    rv = []
+    for datum_metric, timestamps_list, values_list in stitched.values():
+        # Adjacent chunks may share the boundary point.
+        timestamps, indexes = np.unique(np.concatenate(timestamps_list), return_index=True)
+        values = np.concatenate(values_list)[indexes]
+        rv.append(_create_sequence(datum_metric, timestamps, values, step=step))
     return rv
 
+
+def _cast_step_to_seconds(step):
+    if isinstance(step, (int, float)):
+        return step
+    if isinstance(step, str):
+        try:
+            return float(step)
+        except ValueError:
+            return cast_duration_to_seconds(step)
+    return None
+
+
 class PrometheusClient(TsdbClient):
     """
     A Class for collection of metrics from a Prometheus Host.
@@ -88,6 +195,20 @@ class PrometheusClient(TsdbClient):
         with create_requests_session(*self._session_args) as session:
             return session.get(url=url, **kwargs)
 
+    def _stream_result(self, url, **kwargs):
+        """Send a GET request and parse the result of the response in streaming."""
+        with create_requests_session(*self._session_args) as session:
+            response = session.get(url=url, stream=True, **kwargs)
+            with response:
+                if response.status_code != 200:
+                    raise ApiClientException(
+                        "HTTP Status Code {} ({!r})".format(response.status_code, response.content)
+                    )
+                decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+                text_chunks = (decoder.decode(chunk) for chunk in
+                               response.iter_content(chunk_size=STREAM_CHUNK_BYTES))
+                yield from _iter_result_series(text_chunks)
+
     def _post(self, url, **kwargs):
         with create_requests_session(*self._session_args) as session:
             return session.post(url=url, **kwargs)
@@ -171,7 +292,8 @@ class PrometheusClient(TsdbClient):
         :param end_time: (datetime) A datetime object that specifies the metric range end time.
         :param chunk_size: (timedelta) Duration of metric data downloaded in one request. For
             example, setting it to timedelta(hours=3) will download 3 hours worth of data in each
-            request made to the prometheus host
+            request made to the prometheus host. The chunks are fetched in parallel and stitched.
+            If not given, the range is only split when a series would exceed 11,000 points.
         :param step: (str) Query resolution step width in duration format or float number of seconds
         :param min_value; filter the sequence whose value is greater than min_value
         :param max_value; filter the sequence whose value is less than max_value
@@ -198,43 +320,80 @@ class PrometheusClient(TsdbClient):
         if start > end:
             return data
 
-        chunk_seconds = round((end_time - start_time).total_seconds())
-
         if step is None:
             # using the query API to get raw data
-            response = self._get(
-                "{0}/api/v1/query".format(self.url),
-                params={
+            url = "{0}/api/v1/query".format(self.url)
+
+            def get_params(chunk_start, chunk_end):
+                return {
                     **params,
                     **{
-                        "query": query + "[" + str(chunk_seconds) + "s" + "]",
-                        "time": end,
+                        "query": query + "[" + str(chunk_end - chunk_start) + "s" + "]",
+                        "time": chunk_end,
                     }
-                },
-                headers=self.headers,
-            )
+                }
         else:
             if min_value:
                 query = str(min_value) + '<=' + query
             if max_value:
                 query = query + '<' + str(max_value)
             # using the query_range API to get raw data
-            response = self._get(
-                "{0}/api/v1/query_range".format(self.url),
-                params={**params, **{"query": query, "start": start, "end": end, "step": step}},
-                headers=self.headers,
+            url = "{0}/api/v1/query_range".format(self.url)
+
+            def get_params(chunk_start, chunk_end):
+                return {**params, **{"query": query, "start": chunk_start, "end": chunk_end, "step": step}}
+
+        ranges = self._split_range(start, end, chunk_size, step)
+        if len(ranges) == 1:
+            data = _standardize(
+                self._stream_result(url, params=get_params(start, end), headers=self.headers),
+                step=step or self.scrape_interval
             )
+        else:
+            # Fetch the chunks in parallel and only keep the parsed
+            # arrays of each chunk rather than the response text.
+            with ThreadPoolExecutor(max_workers=min(len(ranges), MAX_PARALLEL_CHUNKS)) as executor:
+                chunks = list(executor.map(
+                    lambda r: self._fetch_chunk(url, get_params(*r)), ranges
+                ))
+            data = _stitch_chunks(chunks, step=step or self.scrape_interval)
 
-        if response.status_code == 200:
-            data += response.json()["data"]["result"]
+        logging.debug('Fetched sequence (%s) from tsdb from %s to %s in %d chunk(s). '
+                      'The length of sequence is %s.',
+                      metric_name, start_time, end_time, len(ranges), len(data))
+        return data
+
+    @staticmethod
+    def _split_range(start, end, chunk_size=None, step=None):
+        """Split the range [start, end] (unit: second) into chunks. If ``chunk_size``
+        is not given, only split when a series will exceed the limit of points."""
+        step_seconds = _cast_step_to_seconds(step)
+        if chunk_size is not None:
+            chunk_seconds = max(int(chunk_size.total_seconds()), 1)
+            if step_seconds and step_seconds >= 1:
+                # Keep the evaluation timestamps of every chunk on the same grid.
+                chunk_seconds = max(int(step_seconds), chunk_seconds - chunk_seconds % int(step_seconds))
+        elif step_seconds:
+            chunk_seconds = max(int(step_seconds * (MAX_POINTS_PER_SERIES - 1)), 1)
         else:
-            raise ApiClientException(
-                "HTTP Status Code {} ({!r})".format(response.status_code, response.content)
-            )
+            return [(start, end)]
 
-        logging.debug('Fetched sequence (%s) from tsdb from %s to %s. The length of sequence is %s.',
-                      metric_name, start_time, end_time, len(data))
-        return _standardize(data, step=step or self.scrape_interval)
+        ranges = []
+        chunk_start = start
+        while True:
+            chunk_end = min(chunk_start + chunk_seconds, end)
+            ranges.append((chunk_start, chunk_end))
+            if chunk_end >= end:
+                break
+            chunk_start = chunk_end
+        return ranges
+
+    def _fetch_chunk(self, url, params):
+        rv = dict()
+        for datum in self._stream_result(url, params=params, headers=self.headers):
+            datum_metric, timestamps, values = _datum_to_arrays(datum)
+            rv[tuple(sorted(datum_metric.items()))] = (datum_metric, timestamps, values)
+        return rv
 
     def delete_metric_data(self,
                            metric_name: str,
@@ -12,6 +12,8 @@
 # See the Mulan PSL v2 for more details.
 from typing import Optional
 
+import numpy as np
+
 from dbmind.common.algorithm.basic import binary_search, binary_search_leftmost, binary_search_rightmost
 from dbmind.common.algorithm.basic import how_many_lesser_elements
 from dbmind.common.utils import dbmind_assert
@@ -58,7 +60,23 @@ class Sequence(RPCJSONAble):
             rv[i] = rv[i - 1] + diff[i]
         return tuple(rv)
 
-    def __init__(self, timestamps=None, values=None, name=None, step=None, labels=None, align_timestamp=False):
+    @staticmethod
+    def _align_timestamps_array(raw: np.ndarray, step: int):
+        """The vectorized version of ``_align_timestamps()`` for columnar mode."""
+        if len(raw) == 0:
+            return raw
+
+        diff = np.diff(raw)
+        remainder = diff % step
+        diff = np.where(remainder > 0, np.where(diff < step, step, diff - remainder), diff)
+        rv = np.empty_like(raw)
+        rv[0] = raw[0]
+        np.cumsum(diff, out=rv[1:])
+        rv[1:] += raw[0]
+        return rv
+
+    def __init__(self, timestamps=None, values=None, name=None, step=None, labels=None, align_timestamp=False,
+                 columnar=False):
         """Sequence is an **immutable** data structure, which wraps time series and
         its information.
 
@@ -67,11 +85,27 @@ class Sequence(RPCJSONAble):
             All properties are cached property due to immutability.
             Forced to modify a Sequence object could cause error.
 
-        It is one and only representation for time series in DBMind."""
+        It is one and only representation for time series in DBMind.
+
+        If ``columnar`` is True, the sequence is backed by contiguous int64 (timestamps)
+        and float64 (values) arrays rather than tuples. Validation, alignment, slicing
+        and concatenation are vectorized in this mode, and the tuple API
+        (e.g., ``timestamps``, ``values``) is still available as a lazy view."""
         timestamps = OptionalValue(timestamps).get(_EMPTY_TUPLE)
         values = OptionalValue(values).get(_EMPTY_TUPLE)
-        self._timestamps = tuple(timestamps)
-        self._values = tuple(values)
+        self._columnar = columnar
+        self._timestamps_array = self._values_array = None
+        self._timestamps_tuple = self._values_tuple = None
+        if columnar:
+            success, message = Sequence._check_columnar_validity(timestamps, values)
+            if not success:
+                raise ValueError(message)
+            # Always copy, otherwise the caller can modify the sequence through its array.
+            self._timestamps_array = np.array(timestamps, dtype=np.int64)
+            self._values_array = np.array(values, dtype=np.float64)
+        else:
+            self._timestamps_tuple = tuple(timestamps)
+            self._values_tuple = tuple(values)
         # ``self.name`` is an optional variable.
         self.name = name
         self._step = step
@@ -82,12 +116,36 @@ class Sequence(RPCJSONAble):
         self._parent_start = None
         self._parent_end = None
 
+        if columnar:
+            if align_timestamp:
+                self._timestamps_array = self._align_timestamps_array(self._timestamps_array, self.step)
+            success, message = Sequence._check_columnar_order(self._timestamps_array)
+            if not success:
+                raise ValueError(message)
+            self._timestamps_array.flags.writeable = False
+            self._values_array.flags.writeable = False
+            return
+
         if align_timestamp:
-            self._timestamps = self._align_timestamps(self._timestamps, self.step)
-        success, message = Sequence._check_validity(self._timestamps, self._values)
+            self._timestamps_tuple = self._align_timestamps(self._timestamps_tuple, self.step)
+        success, message = Sequence._check_validity(self._timestamps_tuple, self._values_tuple)
         if not success:
             raise ValueError(message)
 
+    @property
+    def _timestamps(self):
+        """The tuple of the timestamps stored by this node. It is
+        converted lazily from the array in columnar mode."""
+        if self._timestamps_tuple is None:
+            self._timestamps_tuple = tuple(self._timestamps_array.tolist())
+        return self._timestamps_tuple
+
+    @property
+    def _values(self):
+        if self._values_tuple is None:
+            self._values_tuple = tuple(self._values_array.tolist())
+        return self._values_tuple
+
     @staticmethod
     def _check_validity(timestamps, values):
         # invalid scenarios
@@ -108,6 +166,25 @@ class Sequence(RPCJSONAble):
         # valid
         return True, None
 
+    @staticmethod
+    def _check_columnar_validity(timestamps, values):
+        if timestamps is None or values is None:
+            return False, 'NoneType object is not iterable.'
+        if len(timestamps) != len(values):
+            return False, 'The length between timestamps (%d) and values (%d) must be equal.' % (
+                len(timestamps), len(values)
+            )
+        if len(timestamps) > 0 and not np.issubdtype(np.asarray(timestamps).dtype, np.integer):
+            return False, 'The type of timestamp must be integer.'
+        return True, None
+
+    @staticmethod
+    def _check_columnar_order(timestamps):
+        # Strictly increasing implies no duplicate timestamp.
+        if len(timestamps) > 1 and not np.all(timestamps[1:] > timestamps[:-1]):
+            return False, 'Timestamps must be strictly increasing.'
+        return True, None
+
     @staticmethod
     def _create_sub_sequence(parent, ts_start, ts_end):
         """This Sequence slicing method is not the same as list slicing. List in Python
@@ -115,11 +192,16 @@ class Sequence(RPCJSONAble):
         But the sub-sequence includes the last element, i.e., ts_end.
         """
         dbmind_assert(parent is not None, 'BUG: #1 parent should not be NoneType.')
-        if OptionalContainer(getattr(parent, '_timestamps')).get(0) == ts_start and \
+        if parent._columnar:
+            parent_timestamps = parent._timestamps_array
+            if len(parent_timestamps) > 0 and parent_timestamps[0] == ts_start and \
+                    parent_timestamps[-1] == ts_end:
+                return parent
+        elif OptionalContainer(getattr(parent, '_timestamps')).get(0) == ts_start and \
                 OptionalContainer(getattr(parent, '_timestamps')).get(-1) == ts_end:
             return parent
 
-        sub = Sequence(name=parent.name, labels=parent.labels, step=parent.step)
+        sub = Sequence(name=parent.name, labels=parent.labels, step=parent.step, columnar=parent._columnar)
         if ts_start > ts_end:
             return sub
 
@@ -155,10 +237,32 @@ class Sequence(RPCJSONAble):
         ts_end = OptionalValue(self._parent_end).get(this_ts_end)
         return start_node._timestamps, start_node._values, ts_start, ts_end
 
+    def _get_columnar_range(self):
+        """Columnar version of ``_get_entity()``. Return a triple:
+        (start node, left index, right index), and the sequence is
+        in the range [left, right) of the arrays of the start node."""
+        start_node = self
+        while start_node._parent is not None:
+            start_node = start_node._parent
+        timestamps = start_node._timestamps_array
+        if start_node is self:
+            return start_node, 0, len(timestamps)
+
+        left = int(np.searchsorted(timestamps, self._parent_start, side='left'))
+        right = int(np.searchsorted(timestamps, self._parent_end, side='right'))
+        return start_node, left, max(left, right)
+
     def get(self, timestamp) -> Optional[int]:
         """Get a target by timestamp.
 
         :return If not found, return None."""
+        if self._columnar:
+            start_node, left, right = self._get_columnar_range()
+            idx = left + int(np.searchsorted(start_node._timestamps_array[left:right], timestamp))
+            if idx < right and start_node._timestamps_array[idx] == timestamp:
+                return start_node._values_array[idx].item()
+            return
+
         timestamps, values, ts_start, ts_end = self._get_entity()
         if None in (ts_start, ts_end):
             return
@@ -171,6 +275,9 @@ class Sequence(RPCJSONAble):
 
     @cached_property
     def length(self):
+        if self._columnar:
+            _, left, right = self._get_columnar_range()
+            return right - left
         timestamps, _, ts_start, ts_end = self._get_entity()
         if timestamps == _EMPTY_TUPLE:
             return 0
@@ -188,6 +295,9 @@ class Sequence(RPCJSONAble):
     @cached_property
     def values(self):
         """The property will generate a copy."""
+        if self._columnar:
+            start_node, left, right = self._get_columnar_range()
+            return tuple(start_node._values_array[left:right].tolist())
         timestamps, values, ts_start, ts_end = self._get_entity()
         return values[binary_search_leftmost(timestamps, ts_start):
                       binary_search_rightmost(timestamps, ts_end) + 1]
@@ -195,13 +305,39 @@ class Sequence(RPCJSONAble):
     @property
     def timestamps(self):
         """The property will generate a copy."""
+        if self._columnar:
+            start_node, left, right = self._get_columnar_range()
+            return start_node._timestamps[left:right]
         timestamps, values, ts_start, ts_end = self._get_entity()
         return timestamps[binary_search_leftmost(timestamps, ts_start):
                           binary_search_rightmost(timestamps, ts_end) + 1]
 
+    @property
+    def values_array(self):
+        """Return the values as a NumPy array. In columnar mode, it
+        is a read-only view without copy."""
+        if self._columnar:
+            start_node, left, right = self._get_columnar_range()
+            return start_node._values_array[left:right]
+        return np.asarray(self.values)
+
+    @property
+    def timestamps_array(self):
+        """Similar to ``values_array``, the dtype is int64."""
+        if self._columnar:
+            start_node, left, right = self._get_columnar_range()
+            return start_node._timestamps_array[left:right]
+        return np.array(self.timestamps, dtype=np.int64)
+
+    @property
+    def columnar(self):
+        return self._columnar
+
     @property
     def step(self):
         if self._step is None:
+            if self._columnar:
+                return measure_interval_of_timestamps(self.timestamps_array)
             return measure_sequence_interval(self)
         return self._step
 
@@ -214,10 +350,22 @@ class Sequence(RPCJSONAble):
         return self._labels
 
     def copy(self):
+        if self._columnar:
+            return Sequence(
+                self.timestamps_array, self.values_array, self.name, self.step, self.labels, columnar=True
+            )
         return Sequence(
             self.timestamps, self.values, self.name, self.step, self.labels
         )
 
+    def to_columnar(self):
+        """Return a columnar copy of this sequence."""
+        if self._columnar:
+            return self
+        return Sequence(
+            self.timestamps_array, self.values_array, self.name, self._step, self.labels, columnar=True
+        )
+
     def __getitem__(self, item):
         """If parameter ``item`` is a two-tuple, create a sub-sequence and return it.
         If ``item`` is an integer, which represents an index (timestamp) of target, search and return
@@ -264,6 +412,9 @@ class Sequence(RPCJSONAble):
             if other.step != self.step:
                 specific.append('Step: %s vs %s.' % (self.step, other.step))
             raise TypeError('Cannot merge different type of sequences: ' + ' '.join(specific))
+        if self._columnar and other._columnar:
+            return self._concat_columnar(other)
+
         # eliminate overlap portion.
         sequences = [self, other]
         sequences.sort(key=lambda s: s.timestamps[0])
@@ -293,6 +444,36 @@ class Sequence(RPCJSONAble):
             values=new_values
         )
 
+    def _concat_columnar(self, other):
+        """The vectorized version of ``__add__()``, which is only
+        used when both of the sequences are in columnar mode."""
+        sequences = [self, other]
+        sequences.sort(key=lambda s: s.timestamps_array[0])
+        first_timestamps, second_timestamps = sequences[0].timestamps_array, sequences[1].timestamps_array
+        first_end = first_timestamps[-1]
+        second_start = second_timestamps[0]
+
+        step = self.step or 1
+        if second_start > first_end + step:
+            raise TypeError('Cannot merge due to dis-continuousness.')
+        positions = np.searchsorted(second_timestamps, (first_end, first_end + step))
+        if not any(p < len(second_timestamps) and second_timestamps[p] == t
+                   for p, t in zip(positions, (first_end, first_end + step))):
+            raise TypeError('Cannot merge due to unaligned sequences: (%d, %d, %d), (%d, %d, %d).'
+                            % (self.timestamps_array[0], self.timestamps_array[-1], self.step,
+                               other.timestamps_array[0], other.timestamps_array[-1], other.step)
+                            )
+
+        overlap_start_index = int(np.searchsorted(first_timestamps, second_start, side='left'))
+        return Sequence(
+            name=self.name,
+            labels=self.labels,
+            step=self.step,
+            timestamps=np.concatenate((first_timestamps[:overlap_start_index], second_timestamps)),
+            values=np.concatenate((sequences[0].values_array[:overlap_start_index], sequences[1].values_array)),
+            columnar=True
+        )
+
     def __eq__(self, other):
         if not isinstance(other, Sequence):
             return False
@@ -331,4 +512,17 @@ def measure_sequence_interval(sequence):
     return int(most_interval)
 
 
+def measure_interval_of_timestamps(timestamps: np.ndarray):
+    """The vectorized version of ``measure_sequence_interval()``.
+    If several intervals have the same frequency, select
+    the one that appears first as well."""
+    if len(timestamps) < 2:
+        return 0
+    intervals, first_indexes, counts = np.unique(
+        np.diff(timestamps), return_index=True, return_counts=True
+    )
+    candidates = np.flatnonzero(counts == counts.max())
+    return int(intervals[candidates[np.argmin(first_indexes[candidates])]])
+
+
 EMPTY_SEQUENCE = Sequence()
@@ -13,6 +13,7 @@
 
 import argparse
 import csv
+import heapq
 import http.client
 import multiprocessing as mp
 import os
@@ -22,11 +23,12 @@ import sys
 from collections import defaultdict
 from datetime import datetime
 
+import numpy as np
 from scipy.interpolate import interp1d
 
 from dbmind import global_vars
 from dbmind.cmd.edbmind import init_global_configs
-from dbmind.common.algorithm.correlation import CorrelationAnalysis
+from dbmind.common.algorithm.correlation import CorrelationAnalysis, batch_pearson_correlation
 from dbmind.common.tsdb import TsdbClientFactory
 from dbmind.common.utils.checking import (
     check_ip_valid, check_port_valid, date_type, path_type
@@ -40,6 +42,7 @@ from dbmind.service.utils import SequenceUtils
 LEAST_WINDOW = int(7.2e3) * 1000
 LOOK_BACK = 0
 LOOK_FORWARD = 0
+CORRELATION_CHUNK_SIZE = 512
 
 # The "chunk" is used in package--urllib3 which is only supported in HTTP/1.1 or later.
 # It will cause ChunkedEncodingError if the server only supports the request of HTTP/1.0.
@@ -117,6 +120,41 @@ def get_correlations(arg):
     return name, corr, delay, sequence.values, sequence.timestamps
 
 
+def get_top_correlations(this_sequence, named_sequences, topk=100, corr_threshold=0, sliding_length=0):
+    """Calculate the correlations between this_sequence and all the named sequences, which are
+    the same as get_correlations(). Sequences are aligned to the timestamps of this_sequence and
+    calculated chunk by chunk, and only the topk results ordered by correlation are kept.
+
+    :return: a list of (name, corr, delay, values, timestamps) in descending order of corr.
+    """
+    this_values = np.asarray(this_sequence.values, dtype=float)
+    this_diff = np.diff(this_values)
+    this_is_constant = np.all(this_values == this_values[0])
+    heap = []
+    for start in range(0, len(named_sequences), CORRELATION_CHUNK_SIZE):
+        chunk = named_sequences[start: start + CORRELATION_CHUNK_SIZE]
+        # The same as the interpolation by interp1d() in get_correlations().
+        aligned = np.array([
+            np.interp(this_sequence.timestamps, sequence.timestamps, sequence.values) for _, sequence in chunk
+        ]).reshape(len(chunk), len(this_values))
+        correlations, delays = batch_pearson_correlation(this_diff, np.diff(aligned, axis=1), sliding_length)
+        # CorrelationAnalysis doesn't preprocess the constant sequences and regards them as irrelevant.
+        is_constant = np.all(aligned == aligned[:, :1], axis=1) | this_is_constant
+        correlations[is_constant] = 0
+        delays[is_constant] = 0
+        for i, (name, sequence) in enumerate(chunk):
+            corr = float(correlations[i])
+            if abs(corr) < corr_threshold:
+                continue
+            # The earlier one wins when correlations are equal, i.e., a stable sort.
+            item = (corr, -(start + i), (name, corr, int(delays[i]), sequence.values, sequence.timestamps))
+            if len(heap) < topk:
+                heapq.heappush(heap, item)
+            elif topk > 0:
+                heapq.heappushpop(heap, item)
+    return [result for _, _, result in sorted(heap, reverse=True)]
+
+
 def multi_process_correlation_calculation(metric, sequence_args, corr_threshold=0, topk=100):
     with mp.Pool() as pool:
         sequence_result = pool.map(get_sequences, iterable=sequence_args)
@@ -128,20 +166,13 @@ def multi_process_correlation_calculation(metric, sequence_args, corr_threshold=
             write_to_terminal('The metric was not found.')
             return
 
-        correlation_results = dict()
-        for this_name, this_sequence in these_sequences:
-            correlation_args = list()
-            for sequences in sequence_result:
-                for name, sequence in sequences:
-                    correlation_args.append((name, sequence, this_sequence))
-            correlation_results[this_name] = pool.map(get_correlations, iterable=correlation_args)
-   
     pool.join()
 
-    for name in correlation_results:
-        correlation_results[name].sort(key=lambda item: item[1], reverse=True)
-        del (correlation_results[name][topk:])
-        
+    named_sequences = [(name, sequence) for sequences in sequence_result for name, sequence in sequences]
+    correlation_results = dict()
+    for this_name, this_sequence in these_sequences:
+        correlation_results[this_name] = get_top_correlations(this_sequence, named_sequences, topk=topk)
+
     return correlation_results
 
 
@@ -158,14 +189,10 @@ def single_process_correlation_calculation(metric, sequence_args, corr_threshold
         write_to_terminal('The metric was not found.')
         return
 
-    correlation_results = defaultdict(list)
+    correlation_results = dict()
     for this_name, this_sequence in these_sequences:
-        for name, sequence in sequence_result:
-            name, corr, delay, values, timestamps = get_correlations((name, sequence, this_sequence))
-            if abs(corr) >= corr_threshold:
-                correlation_results[this_name].append((name, corr, delay, values, timestamps))
-        correlation_results[this_name].sort(key=lambda item: item[1], reverse=True)
-        correlation_results[this_name] = correlation_results[this_name][:topk]
+        correlation_results[this_name] = get_top_correlations(this_sequence, sequence_result, topk=topk,
+                                                              corr_threshold=corr_threshold)
     return correlation_results
 
 
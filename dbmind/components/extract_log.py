@@ -12,13 +12,16 @@
 # See the Mulan PSL v2 for more details.
 
 import argparse
+import io
 import json
+import multiprocessing as mp
 import os
+import pickle
 import random
 import re
 import sys
+import tempfile
 import time
-from collections import deque
 
 import sqlparse
 
@@ -28,11 +31,22 @@ SQL_AMOUNT = 0
 PLACEHOLDER = r'@@@'
 SAMPLE_NUM = 5
 IS_ALL_LATEST_SQL = False
-FILEHANDLES = 500
+PARSE_CHUNK_SIZE = 64 * 1024 * 1024  # unit: byte
 SQL_PATTERN = [r'([^\\])\'((\')|(.*?([^\\])\'))',  # match all content in single quotes
                r'\((\s*(\-|\+)?\d+(\.\d+)?\s*)(,\s*(\-|\+)?\d+(\.\d+)?\s*)*\)',
                # match integer set in the IN collection
                r'(([<>=]+\s*)|(\s+))(\-|\+)?\d+(\.\d+)?']  # match single integer
+SQL_REGEXES = [re.compile(pattern) for pattern in SQL_PATTERN]
+TIME_REGEX = re.compile(rb'(\d{4})-(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{1,2}):(\d{1,2})')
+STATEMENT_REGEX = re.compile(r'statement: ', re.IGNORECASE)
+EXECUTE_REGEX = re.compile(r'execute .*:', re.IGNORECASE)
+EXECUTE_SQL_REGEX = re.compile(r'execute .*: (.*)', re.IGNORECASE)
+STATEMENT_SQL_REGEX = re.compile(r'statement: (.*)|execute .*: (.*)', re.IGNORECASE)
+PARAMETERS_REGEX = re.compile(r'parameters: (.*)', re.IGNORECASE)
+BEGIN_REGEX = re.compile(r'(start transaction)|(begin)|(begin transaction)')
+PREPARED_EQUAL_REGEX = re.compile(r'=([\s]+)?\$')
+PREPARED_IN_REGEX = re.compile(r'[\s]+\((([\s]+)?\$[\d]+([\s]+)?)((,([\s]+)?\$[\d]+([\s]+)?)+)?\)')
+FOR_UPDATE_REGEX = re.compile(r'for\s+update[\s;]*$', flags=re.I)
 
 
 def path_type(path):
@@ -82,8 +96,8 @@ def get_workload_template(templates, sqls, args):
         del templates[item]
     for sql in sqls:
         sql_template = sql
-        for pattern in SQL_PATTERN:
-            sql_template = re.sub(pattern, PLACEHOLDER, sql_template)
+        for regex in SQL_REGEXES:
+            sql_template = regex.sub(PLACEHOLDER, sql_template)
         if sql_template not in templates:
             # Prune the templates if the total size is greater than the given threshold.
             if len(templates) >= args.max_template_num:
@@ -114,15 +128,14 @@ def get_workload_template(templates, sqls, args):
 
 def output_valid_sql(sql):
     is_quotation_valid = sql.count("'") % 2
-    if re.search(r'=([\s]+)?\$', sql) or \
-            re.search(r'[\s]+\((([\s]+)?\$[\d]+([\s]+)?)((,([\s]+)?\$[\d]+([\s]+)?)+)?\)', sql
-                      ):
+    if PREPARED_EQUAL_REGEX.search(sql) or PREPARED_IN_REGEX.search(sql):
         return ''
-    if 'from pg_' in sql.lower() or 'gs_index_advise' in sql.lower() or is_quotation_valid:
+    lower_sql = sql.lower()
+    if 'from pg_' in lower_sql or 'gs_index_advise' in lower_sql or is_quotation_valid:
         return ''
-    if any(tp in sql.lower() for tp in SQL_TYPE[1:]) or \
-            (SQL_TYPE[0] in sql.lower() and 'from ' in sql.lower()):
-        sql = re.sub(r'for\s+update[\s;]*$', '', sql, flags=re.I)
+    if any(tp in lower_sql for tp in SQL_TYPE[1:]) or \
+            (SQL_TYPE[0] in lower_sql and 'from ' in lower_sql):
+        sql = FOR_UPDATE_REGEX.sub('', sql)
         return sql.strip('; ') + ';'
     return ''
 
@@ -137,33 +150,50 @@ def read_record_rest(file):
     """ Get the rest string for a record, and start line of the next record """
     line = file.readline()
     rest_content = ''
-    while re.match(r'^\t', line):
+    while line.startswith('\t'):
         rest_content += (line.strip('\n') + ' ')
         line = file.readline()
     return rest_content, line
 
 
-def get_parsed_sql(file, filter_config, log_info_position):
-    global SQL_AMOUNT
+# Kinds of the events parsed from log records.
+_EXECUTE = 0
+_PARAMETERS = 1
+
+
+def _substitute_parameters(sql, line):
+    param_list = PARAMETERS_REGEX.search(line.strip()).group(1).split(', $')
+    param_list = list(param.split('=', 1) for param in param_list)
+    param_list.sort(key=lambda x: int(x[0].strip(' $')),
+                    reverse=True)
+    for item in param_list:
+        sql = sql.replace(item[0].strip() if item[0].startswith('$') else
+                          ('$' + item[0].strip()), item[1].strip())
+    return sql
+
+
+def _parse_events(file, filter_config, log_info_position):
+    """Parse the records of the log into events, which don't depend on the
+    transaction state, so that chunks of the log can be parsed independently.
+
+    An execute event is (_EXECUTE, is_begin, is_end, output_sql, sql), and a parameters
+    event is (_PARAMETERS, output_sql, sql). If there is no statement before a parameters
+    line, the event is (_PARAMETERS, None, line) and is resolved while assembling.
+    The last event is (_PARAMETERS, '', sql), which passes the last statement to the
+    parameters at the beginning of the next chunk.
+    """
     user = filter_config['user']
     database = filter_config['database']
-    sql_amount = filter_config['sql_amount']
     statement = filter_config['statement']
     user_position = log_info_position.get('u')
     database_position = log_info_position.get('d')
     threadid_position = log_info_position.get('p')
+    search_regex = STATEMENT_SQL_REGEX if statement else EXECUTE_SQL_REGEX
+    sql = None
     line = file.readline()
-    sql_record = SqlRecord()
-    sql = ''
-    search_p = r'execute .*: (.*)'
-    if statement:
-        search_p = r'statement: (.*)|' + search_p
     while line:
-        if sql_amount and SQL_AMOUNT == sql_amount:
-            break
         try:
-            if (statement and re.search('statement: ', line.lower(), re.IGNORECASE)) \
-                    or re.search(r'execute .*:', line, re.IGNORECASE):
+            if (statement and STATEMENT_REGEX.search(line)) or EXECUTE_REGEX.search(line):
                 rest_content, nextline = read_record_rest(file)
                 recordstring = line.strip() + ' ' + rest_content.strip()
                 line = nextline
@@ -171,105 +201,244 @@ def get_parsed_sql(file, filter_config, log_info_position):
                 if (user and user != log_info[user_position]) \
                         or (database and database != log_info[database_position]):
                     continue
-                search_results = re.search(search_p, recordstring, re.IGNORECASE).groups()
+                search_results = search_regex.search(recordstring).groups()
                 sql = search_results[0] if search_results[0] else search_results[1]
-                if re.match(
-                        r'(start transaction)|(begin)|(begin transaction)',
-                        sql.lower().split(';')[0].strip()
-                ) and threadid_position:
-                    sql_record.in_transaction = True
-                    if sql_record.sqllist:
-                        yield ''.join(sql_record.sqllist)
-                        SQL_AMOUNT += 1
-                        sql_record.sqllist = []
+                is_begin = bool(threadid_position) and bool(BEGIN_REGEX.match(sql.lower().split(';')[0].strip()))
+                if is_begin:
                     sql = '' if len(sql.lower().strip(';').split(';', 1)) == 1 else \
                         sql.lower().strip(';').split(';', 1)[1]
-                if sql.lower().strip().strip(';').strip().endswith(('commit', 'rollback')) \
-                        and threadid_position:
+                is_end = bool(threadid_position) and sql.lower().strip().strip(';').strip().endswith(
+                    ('commit', 'rollback'))
+                if is_end:
                     output_sql = output_valid_sql(
                         sql.lower().strip().strip(';').replace('commit', '').replace('rollback', ''))
-                    if output_sql:
-                        sql_record.sqllist.append(output_sql)
-                    sql_record.in_transaction = False
-                    if sql_record.sqllist:
-                        yield ''.join(sql_record.sqllist)
-                        SQL_AMOUNT += 1
-                    sql_record.sqllist = []
                 else:
                     output_sql = output_valid_sql(sql)
-                    if output_sql:
-                        if not sql_record.in_transaction:
-                            yield output_sql
-                            SQL_AMOUNT += 1
-                        else:
-                            sql_record.sqllist.append(output_sql)
+                yield _EXECUTE, is_begin, is_end, output_sql, sql
                 continue
-            elif re.search(r'parameters: ', line, re.IGNORECASE):
-                param_list = re.search(r'parameters: (.*)', line.strip(),
-                                       re.IGNORECASE).group(1).split(', $')
-                param_list = list(param.split('=', 1) for param in param_list)
-                param_list.sort(key=lambda x: int(x[0].strip(' $')),
-                                reverse=True)
-                for item in param_list:
-                    sql = sql.replace(item[0].strip() if re.match(r'\$', item[0]) else
-                                      ('$' + item[0].strip()), item[1].strip())
-                output_sql = output_valid_sql(sql)
-                if output_sql:
-                    if not sql_record.in_transaction:
-                        yield output_sql
-                        SQL_AMOUNT += 1
-                    else:
-                        sql_record.sqllist.append(output_sql)
+            elif PARAMETERS_REGEX.search(line):
+                if sql is None:
+                    yield _PARAMETERS, None, line
+                else:
+                    sql = _substitute_parameters(sql, line)
+                    yield _PARAMETERS, output_valid_sql(sql), sql
                 line = file.readline()
             else:
                 line = file.readline()
-        except:
+        except Exception:
             line = file.readline()
+    if sql is not None:
+        yield _PARAMETERS, '', sql
+
+
+def _prune_events(events):
+    """Drop what the assembly doesn't need, so the parsed chunks take less space.
+    Only the last event keeps the statement for the parameters of the next chunk."""
+    pruned = []
+    for event in events[:-1]:
+        if event[0] == _EXECUTE:
+            _, is_begin, is_end, output_sql, _ = event
+            if is_begin or is_end or output_sql:
+                pruned.append((_EXECUTE, is_begin, is_end, output_sql, None))
+        elif event[1] is None or event[1]:
+            pruned.append((_PARAMETERS, event[1], event[2] if event[1] is None else None))
+    pruned.extend(events[-1:])
+    return pruned
+
+
+def _assemble_sqls(events, sql_amount):
+    """Group the statements in transactions by the events in the order of the log."""
+    global SQL_AMOUNT
+    sql_record = SqlRecord()
+    sql = ''
+    for event in events:
+        if sql_amount and SQL_AMOUNT == sql_amount:
+            break
+        if event[0] == _EXECUTE:
+            _, is_begin, is_end, output_sql, sql = event
+            if is_begin:
+                sql_record.in_transaction = True
+                if sql_record.sqllist:
+                    yield ''.join(sql_record.sqllist)
+                    SQL_AMOUNT += 1
+                    sql_record.sqllist = []
+            if is_end:
+                if output_sql:
+                    sql_record.sqllist.append(output_sql)
+                sql_record.in_transaction = False
+                if sql_record.sqllist:
+                    yield ''.join(sql_record.sqllist)
+                    SQL_AMOUNT += 1
+                sql_record.sqllist = []
+                continue
+        else:
+            _, output_sql, content = event
+            if output_sql is None:
+                # The statement comes from the previous chunk.
+                try:
+                    sql = _substitute_parameters(sql, content)
+                except Exception:
+                    continue
+                output_sql = output_valid_sql(sql)
+            else:
+                sql = content
+        if output_sql:
+            if not sql_record.in_transaction:
+                yield output_sql
+                SQL_AMOUNT += 1
+            else:
+                sql_record.sqllist.append(output_sql)
 
 
-def get_start_position(start_time, file_path):
-    time_pattern = re.compile(r'\d{4}-\d{1,2}-\d{1,2} \d{1,2}:\d{1,2}:\d{1,2}')
-    start_time_stamp = int(time.mktime(time.strptime(start_time, '%Y-%m-%d %H:%M:%S')))
-    start_position = 0
-    for line in open(file_path, 'r', errors='ignore'):
-        match_result = time_pattern.match(line)
-        if match_result:
-            matched_time = match_result.group()
-            current_time_stamp = int(time.mktime(time.strptime(matched_time, '%Y-%m-%d %H:%M:%S')))
-            if current_time_stamp >= start_time_stamp:
-                return start_position
-        start_position += len(line)
-
-    return -1
+def get_parsed_sql(file, filter_config, log_info_position):
+    yield from _assemble_sqls(_parse_events(file, filter_config, log_info_position), filter_config['sql_amount'])
 
 
-def make_not_existsfile(basename):
-    index = 0
-    tempname = basename
-    while os.path.exists(tempname):
-        tempname = basename + '.' + str(index)
-        index += 1
-    return tempname
+def _is_record_start(line, threadid_position):
+    if line.startswith(b'\t'):
+        return False
+    if not threadid_position:
+        return True
+    fields = line.strip().split()
+    return len(fields) > threadid_position and fields[threadid_position].isdigit()
+
+
+def _split_log(file_path, start_position, threadid_position, chunk_size):
+    """Split the log from start_position into ranges of offsets whose
+    boundaries are the start lines of records."""
+    boundaries = [start_position]
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        offset = start_position + chunk_size
+        while offset < size:
+            f.seek(offset - 1)
+            f.readline()
+            position = f.tell()
+            line = f.readline()
+            while line and not _is_record_start(line, threadid_position):
+                position = f.tell()
+                line = f.readline()
+            if not line:
+                break
+            boundaries.append(position)
+            offset = position + chunk_size
+    boundaries.append(max(size, start_position))
+    return list(zip(boundaries[:-1], boundaries[1:]))
 
 
-def get_tempfile_name(threadid):
-    return make_not_existsfile('/tmp/' + 'threadid_' + threadid + '.log')
+def _parse_log_chunk(args):
+    """Group the lines of a chunk by thread id, and then parse them into events
+    in the order of the first appearance of each thread id.
 
+    The events of each thread are pickled into events_path, and the thread ids
+    with the offsets of their events are returned."""
+    file_path, start, end, filter_config, log_info_position, events_path = args
+    threadid_position = log_info_position.get('p')
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        content = f.read(end - start)
+    threadid = '000000'
+    threadid_lines = {}
+    for line in generate_line(io.TextIOWrapper(io.BytesIO(content), errors='ignore')):
+        if not line.startswith('\t') and threadid_position:
+            if len(line.strip().split()) > threadid_position:
+                threadid = line.strip().split()[threadid_position]
+            else:
+                print(f'wrong format for log line:{line.strip()}')
+                continue
+            if not threadid.isdigit():
+                print(f'wrong format for log line:{line.strip()}')
+                continue
+        threadid_lines.setdefault(threadid, []).append(line)
+    del content
+
+    threadid_offsets = []
+    with open(events_path, 'wb') as f:
+        for threadid in list(threadid_lines):
+            events = _prune_events(list(_parse_events(
+                io.StringIO(''.join(threadid_lines.pop(threadid))), filter_config, log_info_position
+            )))
+            threadid_offsets.append((threadid, f.tell()))
+            pickle.dump(events, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return threadid_offsets
+
+
+def _load_events(events_paths, results):
+    """Load the events of the chunks, in the order of thread ids and then the order of chunks."""
+    threadid_locations = {}
+    for events_path, threadid_offsets in zip(events_paths, results):
+        for threadid, offset in threadid_offsets:
+            threadid_locations.setdefault(threadid, []).append((events_path, offset))
+    files = {}
+    try:
+        for locations in threadid_locations.values():
+            for events_path, offset in locations:
+                if events_path not in files:
+                    files[events_path] = open(events_path, 'rb')
+                files[events_path].seek(offset)
+                yield from pickle.load(files[events_path])
+    finally:
+        for f in files.values():
+            f.close()
+
+
+def parse_log_file(file_path, start_position, filter_config, log_info_position,
+                   processes=None, chunk_size=PARSE_CHUNK_SIZE):
+    """Extract the statements from the log, in the order of thread ids and then the order of the log.
+
+    The log is split into chunks at the start lines of records and the chunks are parsed in parallel.
+    Transactions of a thread may cross the boundaries of chunks, because the events of each thread
+    are concatenated across the chunks before grouping transactions. The parsed chunks are kept in
+    temporary files rather than in memory, and are loaded back one thread of a chunk at a time."""
+    with tempfile.TemporaryDirectory(prefix='extract_log_') as directory:
+        chunks = [(file_path, start, end, filter_config, log_info_position, os.path.join(directory, '%d.events' % i))
+                  for i, (start, end) in enumerate(
+                      _split_log(file_path, start_position, log_info_position.get('p'), chunk_size))]
+        if len(chunks) > 1 and processes != 1 and not mp.current_process().daemon:
+            with mp.Pool(min(processes or os.cpu_count() or 1, len(chunks))) as pool:
+                results = pool.map(_parse_log_chunk, chunks)
+        else:
+            results = [_parse_log_chunk(chunk) for chunk in chunks]
 
-class threadid_info:
+        yield from _assemble_sqls(_load_events([chunk[-1] for chunk in chunks], results),
+                                  filter_config['sql_amount'])
 
-    def __init__(self, filename):
-        self.filename = filename
-        self.fileh = open(self.filename, 'w')
 
-    def close(self):
-        self.fileh.close()
+def _get_first_timestamp(f, offset):
+    """Return the offset and the time of the first line with a timestamp
+    from the line that starts at or after the offset."""
+    if offset > 0:
+        f.seek(offset - 1)
+        f.readline()
+    else:
+        f.seek(0)
+    while True:
+        position = f.tell()
+        line = f.readline()
+        if not line:
+            return None, None
+        match_result = TIME_REGEX.match(line)
+        if match_result:
+            return position, tuple(int(field) for field in match_result.groups())
 
-    def open(self):
-        self.fileh = open(self.filename, 'a+')
 
-    def write(self, content):
-        self.fileh.write(content)
+def get_start_position(start_time, file_path):
+    """Return the offset of the first line whose time is not earlier than start_time.
+    As the log is written in time order, the offset is found by binary search."""
+    start_time_tuple = tuple(time.strptime(start_time, '%Y-%m-%d %H:%M:%S')[:6])
+    with open(file_path, 'rb') as f:
+        low, high = 0, os.fstat(f.fileno()).st_size
+        while low < high:
+            middle = (low + high) // 2
+            position, timestamp = _get_first_timestamp(f, middle)
+            if position is None or timestamp >= start_time_tuple:
+                high = middle
+            else:
+                low = position + 1
+        position, timestamp = _get_first_timestamp(f, low)
+    if position is None or timestamp < start_time_tuple:
+        return -1
+    return position
 
 
 def generate_line(file):
@@ -283,62 +452,6 @@ def generate_line(file):
             templine = ''
 
 
-def group_log_by_threadid(f, threadid_position):
-    """ Split the log to different files groupby the threadid with file handles below FILEHANDLES. """
-    threadid = '000000'
-    threadid_log = dict()
-    closed_files = deque()
-    opened_files = deque()
-    threadid_log_files = []
-
-    try:
-        for line in generate_line(f):
-            if not line.startswith('\t') and threadid_position:
-                if len(line.strip().split()) > threadid_position:
-                    threadid = line.strip().split()[threadid_position]
-                else:
-                    print(f'wrong format for log line:{line.strip()}')
-                    continue
-                if not threadid.isdigit():
-                    print(f'wrong format for log line:{line.strip()}')
-                    continue
-            if threadid not in threadid_log:
-                threadid_log_file = get_tempfile_name(threadid)
-                threadid_log_files.append(threadid_log_file)
-                threadid_log[threadid] = threadid_info(threadid_log_file)
-                opened_files.append(threadid)
-            elif threadid in closed_files:
-                closed_files.remove(threadid)
-                threadid_log[threadid].open()
-                opened_files.append(threadid)
-            threadid_log[threadid].write(line)
-            if len(opened_files) > FILEHANDLES:
-                threadid = opened_files.popleft()
-                threadid_log[threadid].close()
-                closed_files.append(threadid)
-        for threadid in opened_files:
-            threadid_log[threadid].close()
-    except Exception as ex:
-        for threadid in opened_files:
-            threadid_log[threadid].close()
-        for threadid_log_file in threadid_log_files:
-            os.remove(threadid_log_file)
-        raise ex
-
-    return threadid_log_files
-
-
-def merge_log(threadid_log_files, start_time):
-    merged_log_file = '/tmp/threadid_groupby_id' + start_time + '.log'
-    merged_log_file = make_not_existsfile(merged_log_file)
-    with open(merged_log_file, 'w') as fileh:
-        for threadid_log_file in threadid_log_files:
-            for line in open(threadid_log_file):
-                fileh.write(line)
-            os.remove(threadid_log_file)
-    return merged_log_file
-
-
 def split_transaction(transactions):
     for transaction in transactions:
         for sql in sqlparse.split(transaction.strip().strip(';')):
@@ -367,32 +480,14 @@ def record_sql(valid_files, args, log_info_position, output_obj):
                 start_position = get_start_position(args.start_time, file_path)
                 if start_position == -1:
                     continue
-            with open(file_path, errors='ignore') as f:
-                f.seek(start_position, 0)
-                threadid_log_files = group_log_by_threadid(f, log_info_position.get('p'))
-            try:
-                merged_log_file = merge_log(threadid_log_files, args.start_time if args.start_time else '')
-            except Exception as ex:
-                raise ex
-            finally:
-                for threadid_log_file in threadid_log_files:
-                    if os.path.isfile(threadid_log_file):
-                        os.remove(threadid_log_file)
             filter_config = {'user': args.db_user, 'database': args.database,
                              'sql_amount': args.sql_amount, 'statement': args.statement}
-            try:
-                with open(merged_log_file, mode='r', errors='ignore') as f:
-                    if isinstance(output_obj, dict):
-                        get_workload_template(output_obj, split_transaction(
-                            get_parsed_sql(f, filter_config, log_info_position)
-                        ), args)
-                    else:
-                        for sql in get_parsed_sql(f, filter_config, log_info_position):
-                            output_obj.write(sql + '\n')
-            except Exception as ex:
-                raise ex
-            finally:
-                os.remove(merged_log_file)
+            sqls = parse_log_file(file_path, start_position, filter_config, log_info_position)
+            if isinstance(output_obj, dict):
+                get_workload_template(output_obj, split_transaction(sqls), args)
+            else:
+                for sql in sqls:
+                    output_obj.write(sql + '\n')
 
 
 def extract_sql_from_log(args):
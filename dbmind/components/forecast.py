@@ -23,7 +23,7 @@ from prettytable import PrettyTable
 
 from dbmind.cmd.edbmind import init_global_configs
 from dbmind.common.utils.component import initialize_tsdb_param
-from dbmind.common.algorithm.forecasting import quickly_forecast
+from dbmind.common.algorithm.forecasting import quickly_forecast, quickly_forecast_many
 from dbmind.common.utils import write_to_terminal
 from dbmind.common.utils.checking import path_type
 from dbmind.common.utils.exporter import KVPairAction
@@ -41,7 +41,7 @@ def _get_sequences(metric, instance, labels, start_datetime, end_datetime):
     return sequences
 
 
-def risk_analysis(sequence, upper, lower, warning_minutes):
+def risk_analysis(sequence, upper, lower, warning_minutes, forecast_sequence=None):
     current_timestamp = int(time.time() * 1000)
     upper = inf if upper is None else upper
     lower = -inf if lower is None else lower
@@ -49,7 +49,8 @@ def risk_analysis(sequence, upper, lower, warning_minutes):
         return {'timestamps': None, 'values': None, 'risk': 'upper'}
     if sequence.values[-1] <= lower:
         return {'timestamps': None, 'values': None, 'risk': 'lower'}
-    forecast_sequence = quickly_forecast(sequence, warning_minutes)
+    if forecast_sequence is None:
+        forecast_sequence = quickly_forecast(sequence, warning_minutes)
     if is_sequence_valid(forecast_sequence):
         for timestamp, value in zip(forecast_sequence.timestamps, forecast_sequence.values):
             if value >= upper or value <= lower:
@@ -79,8 +80,18 @@ def early_warning(metric, instance, retroactive_period, warning_hours, upper=Non
     start_datetime = datetime.fromtimestamp(start_time / 1000)
     end_datetime = datetime.fromtimestamp(end_time / 1000)
     sequences = _get_sequences(metric, instance, labels, start_datetime, end_datetime)
-    for sequence in sequences:
-        risk_analysis_result = risk_analysis(sequence, upper, lower, warning_minutes)
+    # Only forecast the sequences which haven't exceeded the warning values.
+    to_forecast = [
+        i for i, sequence in enumerate(sequences)
+        if (upper is None or sequence.values[-1] < upper) and (lower is None or sequence.values[-1] > lower)
+    ]
+    forecast_sequences, forecast_seconds = quickly_forecast_many(
+        [sequences[i] for i in to_forecast], warning_minutes
+    )
+    forecast_results = dict(zip(to_forecast, zip(forecast_sequences, forecast_seconds)))
+    for i, sequence in enumerate(sequences):
+        forecast_sequence, elapsed_seconds = forecast_results.get(i, (None, 0.))
+        risk_analysis_result = risk_analysis(sequence, upper, lower, warning_minutes, forecast_sequence)
         if risk_analysis_result['risk'] == 'future upper':
             abnormal_detail = "exceed the warning value %s at %s(remaining %s hours)." % \
                               (upper, risk_analysis_result['occur_time'], risk_analysis_result['remaining_hours'])
@@ -101,18 +112,20 @@ def early_warning(metric, instance, retroactive_period, warning_hours, upper=Non
                                         'values': sequence.values,
                                         'timestamps': sequence.timestamps,
                                         'forecast_values': risk_analysis_result['values'],
-                                        'forecast_timestamps': risk_analysis_result['timestamps']
+                                        'forecast_timestamps': risk_analysis_result['timestamps'],
+                                        'forecast_seconds': round(elapsed_seconds, 3)
                                         })
     return warnings
 
 
 def display_warnings(warnings):
     output_table = PrettyTable()
-    output_table.field_names = ('name', 'label', 'warning information')
+    output_table.field_names = ('name', 'label', 'warning information', 'forecasting time (s)')
     output_table.align = "l"
     for name, details in warnings.items():
         for detail in details:
-            output_table.add_row([name, str(detail['labels']), detail['abnormal_detail']])
+            output_table.add_row([name, str(detail['labels']), detail['abnormal_detail'],
+                                  detail.get('forecast_seconds', 0.)])
     print(output_table)
 
 
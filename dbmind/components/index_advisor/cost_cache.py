@@ -0,0 +1,105 @@
+# Copyright (c) 2022 Huawei Technologies Co.,Ltd.
+#
+# openGauss is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#
+#          http://license.coscl.org.cn/MulanPSL2
+#
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_TTL = 7 * 24 * 3600  # unit: second
+
+
+def normalize_statement(statement):
+    return ' '.join(statement.split())
+
+
+def get_indexes_signature(indexes):
+    """The optimizer prefers the last created index when costs are the same,
+    so the signature keeps the creating order of the indexes."""
+    return ';'.join('%s(%s)%s' % (index.get_table(), index.get_columns(), index.get_index_type())
+                    for index in indexes or ())
+
+
+class CostCache:
+    """Persistent cache of the results of the hypothetical indexes and EXPLAIN.
+
+    Entries are keyed by the fingerprint of the schema and statistics, so they are
+    invalidated once the tables, the existing indexes or the statistics change.
+    The cache is backed by SQLite, therefore it can be shared by several processes,
+    e.g., the index_advisor command and the index_recommend timed task.
+    If the file cannot be used, e.g., it is read-only or corrupt, the cache is bypassed."""
+
+    def __init__(self, path, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._conn = None
+        self.disabled = False
+        try:
+            with self._lock, self._connection() as conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS cost_cache '
+                             '(key TEXT PRIMARY KEY, value TEXT, updated REAL)')
+                conn.execute('DELETE FROM cost_cache WHERE updated < ?', (time.time() - ttl,))
+        except sqlite3.Error as e:
+            logging.warning('Cannot use the cost cache %s, so it is disabled: %s.', self.path, e)
+            self.close()
+            self.disabled = True
+
+    def _connection(self):
+        # A SQLite connection cannot be used across fork, so reconnect in the child process.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        return self._conn
+
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha1(json.dumps(parts).encode()).hexdigest()
+
+    def get(self, key):
+        row = None
+        if not self.disabled:
+            try:
+                with self._lock:
+                    row = self._connection().execute('SELECT value, updated FROM cost_cache WHERE key = ?',
+                                                     (key,)).fetchone()
+            except sqlite3.Error as e:
+                logging.warning('Cannot read the cost cache %s: %s.', self.path, e)
+        if row is None or row[1] < time.time() - self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        if self.disabled:
+            return
+        try:
+            with self._lock, self._connection() as conn:
+                conn.execute('INSERT OR REPLACE INTO cost_cache VALUES (?, ?, ?)',
+                             (key, json.dumps(value), time.time()))
+        except sqlite3.Error as e:
+            logging.warning('Cannot save the cost cache to %s: %s.', self.path, e)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._pid = None
@@ -24,6 +24,8 @@ class BaseExecutor:
         self.port = port
         self.schema = schema
         self.driver = driver
+        # Sessions kept open to EXPLAIN statements in parallel, if the executor supports.
+        self.explain_pool = None
 
     def get_schema(self):
         return self.schema
@@ -10,7 +10,10 @@
 # EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
 # MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
 # See the Mulan PSL v2 for more details.
+import queue
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 import logging
 from contextlib import contextmanager
@@ -75,3 +78,113 @@ class DriverExecutor(BaseExecutor):
         self.__init_conn_handle()
         yield
         self.__close_conn()
+
+
+class DriverExecutorPool:
+    """Keep several sessions open to EXPLAIN statements in parallel.
+
+    Each session applies the session-level settings (e.g., the head SQLs of hypothetical
+    indexes) only once, so one EXPLAIN costs one round trip, and the results are the rows
+    fetched by the driver, rather than the text printed by gsql."""
+
+    def __init__(self, executor: DriverExecutor, size=8):
+        self.executor = executor
+        self.size = size
+        self._idle_sessions = queue.Queue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._thread_pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix='DriverExecutorPool')
+
+    def __connect(self):
+        conn = psycopg2.connect(dbname=self.executor.dbname,
+                                user=self.executor.user,
+                                password=self.executor.password,
+                                host=self.executor.host,
+                                port=self.executor.port,
+                                application_name='DBMind-index-advisor')
+        conn.autocommit = True
+        return {'conn': conn, 'session_sqls': None}
+
+    def __acquire(self):
+        try:
+            return self._idle_sessions.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if not can_open:
+            return self._idle_sessions.get()
+        try:
+            return self.__connect()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def __release(self, session, broken=False):
+        if broken:
+            with self._lock:
+                self._opened -= 1
+            session['conn'].close()
+        else:
+            self._idle_sessions.put(session)
+
+    def __explain_block(self, statements_sqls, setting_sqls, session_sqls):
+        session = self.__acquire()
+        broken = False
+        results = []
+        try:
+            with session['conn'].cursor() as cur:
+                if session['session_sqls'] != session_sqls:
+                    cur.execute(';'.join(['set current_schema = %s' % self.executor.get_schema()] + session_sqls))
+                    session['session_sqls'] = session_sqls
+                for sql in setting_sqls:
+                    cur.execute(sql)
+                deallocate_sql = ''
+                # Send the deallocation of the last statement together with the current
+                # statement, the results of the last statement (EXPLAIN) are fetched.
+                for prepare_sql, explain_sql, _deallocate_sql in statements_sqls:
+                    try:
+                        cur.execute(deallocate_sql + prepare_sql + ';' + explain_sql)
+                        results.append(('EXPLAIN',))
+                        results.extend(cur.fetchall())
+                    except psycopg2.DatabaseError as e:
+                        logging.warning('Found %s while explaining SQL statement.', e)
+                        results.append(('ERROR',))
+                    deallocate_sql = 'DEALLOCATE ALL;'
+                cur.execute('DEALLOCATE ALL;SELECT pg_catalog.hypopg_reset_index();')
+        except (psycopg2.InterfaceError, psycopg2.OperationalError):
+            broken = True
+            raise
+        finally:
+            self.__release(session, broken)
+        return results
+
+    def explain(self, statements_sqls, setting_sqls=(), session_sqls=()):
+        """Explain the statements under the settings in parallel.
+
+        :param statements_sqls: the prepare, explain and deallocate SQLs of each statement.
+        :param setting_sqls: SQLs executed before the statements, e.g., creating hypothetical indexes.
+        :param session_sqls: SQLs executed once for each session.
+        :return: results in the order of the statements, each statement begins
+         with ('EXPLAIN',) followed by its plan rows or is ('ERROR',).
+        """
+        if not statements_sqls:
+            return []
+        setting_sqls, session_sqls = list(setting_sqls), list(session_sqls)
+        block_size = -(-len(statements_sqls) // self.size)
+        blocks = [statements_sqls[i:i + block_size] for i in range(0, len(statements_sqls), block_size)]
+        results = []
+        for block_results in self._thread_pool.map(
+                lambda block: self.__explain_block(block, setting_sqls, session_sqls), blocks
+        ):
+            results.extend(block_results)
+        return results
+
+    def close(self):
+        self._thread_pool.shutdown()
+        while not self._idle_sessions.empty():
+            self._idle_sessions.get_nowait()['conn'].close()
+        self._opened = 0
@@ -24,9 +24,10 @@ import logging
 from logging.handlers import RotatingFileHandler
 from collections import defaultdict
 from functools import lru_cache
-from itertools import groupby, chain, combinations, permutations
+from itertools import groupby, chain, combinations
 from typing import Tuple, List
 import heapq
+import weakref
 from multiprocessing import Pool
 
 import sqlparse
@@ -36,7 +37,9 @@ try:
     from .sql_output_parser import parse_single_advisor_results, parse_explain_plan, \
         get_checked_indexes, parse_table_sql_results, parse_existing_indexes_results, parse_plan_cost, parse_hypo_index
     from .sql_generator import get_single_advisor_sql, get_index_check_sqls, get_existing_index_sql, \
-        get_workload_cost_sqls, get_index_setting_sqls, get_prepare_sqls, get_hypo_index_head_sqls
+        get_workload_cost_sqls, get_index_setting_sqls, get_prepare_sqls, get_hypo_index_head_sqls, \
+        get_schema_fingerprint_sql, get_hypo_index_create_sqls
+    from .cost_cache import CostCache, normalize_statement, get_indexes_signature
     from .executors.common import BaseExecutor
     from .executors.gsql_executor import GsqlExecutor
     from .mcts import MCTS
@@ -51,7 +54,9 @@ except ImportError:
     from sql_output_parser import parse_single_advisor_results, parse_explain_plan, \
         get_checked_indexes, parse_table_sql_results, parse_existing_indexes_results, parse_plan_cost, parse_hypo_index
     from sql_generator import get_single_advisor_sql, get_index_check_sqls, get_existing_index_sql, \
-        get_workload_cost_sqls, get_index_setting_sqls, get_prepare_sqls, get_hypo_index_head_sqls
+        get_workload_cost_sqls, get_index_setting_sqls, get_prepare_sqls, get_hypo_index_head_sqls, \
+        get_schema_fingerprint_sql, get_hypo_index_create_sqls
+    from cost_cache import CostCache, normalize_statement, get_indexes_signature
     from executors.common import BaseExecutor
     from executors.gsql_executor import GsqlExecutor
     from mcts import MCTS
@@ -66,6 +71,11 @@ except ImportError:
 SAMPLE_NUM = 5
 MAX_INDEX_COLUMN_NUM = 5
 MAX_CANDIDATE_COLUMNS = 40
+MAX_INDEX_CHECK_CALLS = 20
+EXPLAIN_SESSIONS = 8
+COST_CACHE_FILE = 'index_cost_cache.db'
+FINGERPRINT_PREFIX = 'fingerprint:'
+COST_CACHE = None  # Caches the results of hypothetical indexes, see `set_cost_cache()`.
 MAX_INDEX_NUM = None
 MAX_INDEX_STORAGE = None
 FULL_ARRANGEMENT_THRESHOLD = 20
@@ -75,6 +85,7 @@ SHARP = '#'
 JSON_TYPE = False
 BLANK = ' '
 GLOBAL_PROCESS_BAR = ProcessBar()
+_schema_fingerprints = weakref.WeakKeyDictionary()
 SQL_TYPE = ['select', 'delete', 'insert', 'update']
 NUMBER_SET_PATTERN = r'\((\s*(\-|\+)?\d+(\.\d+)?\s*)(,\s*(\-|\+)?\d+(\.\d+)?\s*)*[,]?\)'
 SQL_PATTERN = [r'([^\\])\'((\')|(.*?([^\\])\'))',  # match all content in single quotes
@@ -724,23 +735,100 @@ def get_workload_costs(statements, executor, threads=20):
     return costs, index_names_list, plans
 
 
+def get_pooled_workload_costs(statements, executor, indexes):
+    """EXPLAIN the statements over the sessions kept open by the executor,
+    fall back to `get_workload_costs()` if the executor has no sessions or they fail."""
+    if executor.explain_pool is not None:
+        try:
+            results = executor.explain_pool.explain([get_prepare_sqls(statement) for statement in statements],
+                                                    get_hypo_index_create_sqls(indexes),
+                                                    get_hypo_index_head_sqls(is_multi_node(executor)))
+            return parse_explain_plan(results, len(statements))
+        except Exception as e:
+            logging.warning('Failed to explain statements over the sessions: %s, '
+                            'falling back to the executor.', e)
+    return get_workload_costs(statements, executor)
+
+
+def set_cost_cache(path):
+    global COST_CACHE
+    if COST_CACHE is not None and COST_CACHE.path == path:
+        return COST_CACHE
+    if COST_CACHE is not None:
+        COST_CACHE.close()
+    COST_CACHE = CostCache(path) if path else None
+    return COST_CACHE
+
+
+def get_schema_fingerprint(executor):
+    if executor not in _schema_fingerprints:
+        fingerprint = None
+        for cur_tuple in executor.execute_sqls([get_schema_fingerprint_sql(executor.get_schema())]) or []:
+            text = str(cur_tuple[0]).strip()
+            if text.startswith(FINGERPRINT_PREFIX):
+                fingerprint = text[len(FINGERPRINT_PREFIX):]
+        _schema_fingerprints[executor] = fingerprint
+    return _schema_fingerprints[executor]
+
+
+def get_cost_cache_key(executor, *parts):
+    """Return None if the results cannot be cached."""
+    if COST_CACHE is None:
+        return None
+    fingerprint = get_schema_fingerprint(executor)
+    if fingerprint is None:
+        return None
+    return COST_CACHE.key(fingerprint, bool(is_multi_node(executor)), *parts)
+
+
+def get_cached_cost(cache_key):
+    return COST_CACHE.get(cache_key) if cache_key else None
+
+
+def set_cached_cost(cache_key, value):
+    if cache_key:
+        COST_CACHE.put(cache_key, value)
+
+
 def estimate_workload_cost_file(executor, workload, indexes=None):
-    select_queries = []
-    select_queries_pos = []
-    query_costs = [0] * len(workload.get_queries())
-    for i, query in enumerate(workload.get_queries()):
-        select_queries.append(query.get_statement())
-        select_queries_pos.append(i)
-    with hypo_index_ctx(executor):
-        index_setting_sqls = get_index_setting_sqls(indexes, is_multi_node(executor))
-        hypo_index_ids = parse_hypo_index(executor.execute_sqls(index_setting_sqls))
-        update_index_storage(indexes, hypo_index_ids, executor)
-        costs, index_names, plans = get_workload_costs([query.get_statement() for query in
-                                                        workload.get_queries()], executor)
-        # Update query cost for select queries and positive_pos for indexes.
-        for cost, query_pos in zip(costs, select_queries_pos):
-            query_costs[query_pos] = cost * workload.get_queries()[query_pos].get_frequency()
-        workload.add_indexes(indexes, query_costs, index_names, plans)
+    queries = workload.get_queries()
+    indexes_signature = get_indexes_signature(indexes)
+    plan_cache_keys = [get_cost_cache_key(executor, 'plan', normalize_statement(query.get_statement()),
+                                          indexes_signature) for query in queries]
+    plan_results = [get_cached_cost(cache_key) for cache_key in plan_cache_keys]
+    uncached_pos = [pos for pos, plan_result in enumerate(plan_results) if plan_result is None]
+    storage_cache_keys = [get_cost_cache_key(executor, 'storage', get_indexes_signature([index]))
+                          for index in indexes or ()]
+    for index, cache_key in zip(indexes or (), storage_cache_keys):
+        if not index.get_storage():
+            index.set_storage(get_cached_cost(cache_key) or index.get_storage())
+
+    if uncached_pos or any(not index.get_storage() for index in indexes or ()):
+        with hypo_index_ctx(executor):
+            index_setting_sqls = get_index_setting_sqls(indexes, is_multi_node(executor))
+            hypo_index_ids = parse_hypo_index(executor.execute_sqls(index_setting_sqls))
+            update_index_storage(indexes, hypo_index_ids, executor)
+            for index, cache_key in zip(indexes or (), storage_cache_keys):
+                if index.get_storage():
+                    set_cached_cost(cache_key, index.get_storage())
+            if uncached_pos:
+                costs, index_names, plans = get_pooled_workload_costs([queries[pos].get_statement()
+                                                                       for pos in uncached_pos], executor, indexes)
+                for pos, cost, _index_names, plan in zip(uncached_pos, costs, index_names, plans):
+                    plan_results[pos] = (cost, _index_names, plan)
+                    # Don't cache failed EXPLAINs.
+                    if cost > 0:
+                        set_cached_cost(plan_cache_keys[pos], plan_results[pos])
+
+    query_costs = [0] * len(queries)
+    query_index_names = [[] for _ in queries]
+    query_plans = [[] for _ in queries]
+    for pos, plan_result in enumerate(plan_results):
+        if plan_result is None:
+            continue
+        cost, query_index_names[pos], query_plans[pos] = plan_result
+        query_costs[pos] = cost * queries[pos].get_frequency()
+    workload.add_indexes(indexes, query_costs, query_index_names, query_plans)
 
 
 def query_index_check(executor, query, indexes, sort_by_column_no=True):
@@ -752,6 +840,11 @@ def query_index_check(executor, query, indexes, sort_by_column_no=True):
         # When the cost values are the same, the execution plan picks the last index created.
         # Sort indexes to ensure that short indexes have higher priority.
         indexes = sorted(indexes, key=lambda index: -len(index.get_columns()))
+    cache_key = get_cost_cache_key(executor, 'check', normalize_statement(query), get_indexes_signature(indexes))
+    cached = get_cached_cost(cache_key)
+    if cached is not None:
+        positions, cost = cached
+        return [indexes[pos] for pos in positions], cost
     indexable_indexes = list(get_indexable_indexes(indexes, executor))
     index_check_results = executor.execute_sqls(get_index_check_sqls(query, indexable_indexes, is_multi_node(executor)))
     valid_indexes = get_checked_indexes(indexable_indexes, index_check_results)
@@ -760,26 +853,60 @@ def query_index_check(executor, query, indexes, sort_by_column_no=True):
         if '(cost' in res[0]:
             cost = parse_plan_cost(res[0])
             break
+    if cost is not None:
+        set_cached_cost(cache_key, ([indexes.index(index) for index in valid_indexes], cost))
     return valid_indexes, cost
 
 
-def get_indexable_indexes(indexes, executor):
-    for index in indexes:
-        index_check_results = executor.execute_sqls(get_index_check_sqls('SELECT 1',[index],is_multi_node(executor)))
-        for cur_tuple in index_check_results:
-            text = cur_tuple[0]
-            if text.strip('()').startswith('<') and 'btree' in text:
-                yield index
+def is_indexable(index, executor):
+    index_check_results = executor.execute_sqls(get_index_check_sqls('SELECT 1', [index], is_multi_node(executor)))
+    for cur_tuple in index_check_results:
+        text = cur_tuple[0]
+        if text.strip('()').startswith('<') and 'btree' in text:
+            return True
+    return False
 
 
-def remove_unused_indexes(executor, statement, valid_indexes):
-    """ Remove invalid indexes by creating virtual indexes in different order. """
-    least_indexes = valid_indexes
-    for indexes in permutations(valid_indexes, len(valid_indexes)):
-        cur_indexes, cost = query_index_check(executor, statement, indexes, False)
-        if len(cur_indexes) < len(least_indexes):
-            least_indexes = cur_indexes
-    return least_indexes
+def get_indexable_indexes(indexes, executor):
+    for index in indexes:
+        cache_key = get_cost_cache_key(executor, 'indexable', get_indexes_signature([index]))
+        indexable = get_cached_cost(cache_key)
+        if indexable is None:
+            indexable = is_indexable(index, executor)
+            set_cached_cost(cache_key, indexable)
+        if indexable:
+            yield index
+
+
+def remove_unused_indexes(executor, statement, valid_indexes, max_calls=MAX_INDEX_CHECK_CALLS):
+    """ Remove functionally redundant indexes by greedy elimination.
+
+    The optimizer picks the last created index among the indexes with the same cost,
+    so the used indexes depend on the creating order. Rather than checking every order,
+    drop the indexes one by one as long as the cost of the statement doesn't increase,
+    spending at most `max_calls` optimizer calls.
+    Return the remaining indexes and the number of EXPLAINs spent. """
+    if not valid_indexes or max_calls <= 0:
+        return valid_indexes, 0
+    least_indexes, least_cost = query_index_check(executor, statement, valid_indexes, False)
+    explain_count = 1
+    if least_cost is None:
+        return least_indexes, explain_count
+    improved = True
+    while improved and len(least_indexes) > 1:
+        improved = False
+        # Try to drop the widest indexes first.
+        for index in sorted(least_indexes, key=lambda x: -x.get_columns_num()):
+            if explain_count >= max_calls:
+                return least_indexes, explain_count
+            remaining_indexes = [_index for _index in least_indexes if _index is not index]
+            cur_indexes, cost = query_index_check(executor, statement, remaining_indexes, False)
+            explain_count += 1
+            if cost is not None and cost <= least_cost and len(cur_indexes) < len(least_indexes):
+                least_indexes, least_cost = cur_indexes, cost
+                improved = True
+                break
+    return least_indexes, explain_count
 
 
 def filter_candidate_columns_by_cost(valid_indexes, statement, executor, max_candidate_columns):
@@ -857,7 +984,10 @@ def get_valid_indexes(advised_indexes, original_base_indexes, statement, executo
             break
 
     # filtering of functionally redundant indexes due to index order
-    valid_indexes = remove_unused_indexes(executor, statement, valid_indexes)
+    valid_indexes, explain_count = remove_unused_indexes(
+        executor, statement, valid_indexes, kwargs.get('max_index_check_calls', MAX_INDEX_CHECK_CALLS)
+    )
+    logging.info(f'spent {explain_count} EXPLAINs removing unused indexes for the query {statement}')
     set_source_indexes(valid_indexes, original_base_indexes)
     return valid_indexes
 
@@ -1276,6 +1406,9 @@ def index_advisor_workload(history_advise_indexes, executor: BaseExecutor, workl
         sql_info = json.dumps(
             index_advisor.display_detail_info, indent=4, separators=(',', ':'))
         bar_print(sql_info)
+    if COST_CACHE is not None:
+        logging.info('The cost cache %s was hit %d times and missed %d times.',
+                     COST_CACHE.path, COST_CACHE.hits, COST_CACHE.misses)
     return index_advisor.display_detail_info, index_advisor.index_benefits, index_advisor.redundant_indexes
 
 
@@ -1287,6 +1420,9 @@ def check_parameter(args):
     if args.max_candidate_columns <= 0:
         raise argparse.ArgumentTypeError("%s is an invalid positive int value" %
                                          args.max_candidate_columns)
+    if args.max_index_check_calls <= 0:
+        raise argparse.ArgumentTypeError("%s is an invalid positive int value" %
+                                         args.max_index_check_calls)
     if args.max_index_columns <= 0:
         raise argparse.ArgumentTypeError("%s is an invalid positive int value" %
                                          args.max_index_columns)
@@ -1341,6 +1477,13 @@ def main(argv):
     arg_parser.add_argument("--max-candidate-columns", type=int,
                             help='Maximum number of columns for candidate indexes',
                             default=MAX_CANDIDATE_COLUMNS)
+    arg_parser.add_argument("--max-index-check-calls", type=int,
+                            help='Maximum number of optimizer calls to remove unused indexes for a query',
+                            default=MAX_INDEX_CHECK_CALLS)
+    arg_parser.add_argument("--cost-cache",
+                            help="File of the persistent cost cache, which can be shared with the index_recommend "
+                                 "task of DBMind through the %s file under its configuration directory. "
+                                 "No cache is used by default." % COST_CACHE_FILE)
     arg_parser.add_argument('--max-index-columns', type=int,
                             help='Maximum number of columns in a joint index',
                             default=4)
@@ -1366,10 +1509,11 @@ def main(argv):
         try:
             import psycopg2
             try:
-                from .executors.driver_executor import DriverExecutor
+                from .executors.driver_executor import DriverExecutor, DriverExecutorPool
             except ImportError:
-                from executors.driver_executor import DriverExecutor
+                from executors.driver_executor import DriverExecutor, DriverExecutorPool
             executor = DriverExecutor(args.database, args.db_user, args.W, args.db_host, args.db_port, args.schema)
+            executor.explain_pool = DriverExecutorPool(executor, EXPLAIN_SESSIONS)
         except ImportError:
             logging.warning('Python driver import failed, '
                             'the gsql mode will be selected to connect to the database.')
@@ -1378,11 +1522,17 @@ def main(argv):
             args.driver = None
     else:
         executor = GsqlExecutor(args.database, args.db_user, args.W, args.db_host, args.db_port, args.schema)
+    set_cost_cache(args.cost_cache)
     use_all_columns = True
-    index_advisor_workload(get_last_indexes_result(args.file), executor, args.file,
-                           args.multi_iter_mode, args.show_detail, args.max_n_distinct, args.min_reltuples,
-                           use_all_columns, improved_rate=args.min_improved_rate,
-                           max_candidate_columns=args.max_candidate_columns, show_benefits=args.show_benefits)
+    try:
+        index_advisor_workload(get_last_indexes_result(args.file), executor, args.file,
+                               args.multi_iter_mode, args.show_detail, args.max_n_distinct, args.min_reltuples,
+                               use_all_columns, improved_rate=args.min_improved_rate,
+                               max_candidate_columns=args.max_candidate_columns, show_benefits=args.show_benefits,
+                               max_index_check_calls=args.max_index_check_calls)
+    finally:
+        if executor.explain_pool is not None:
+            executor.explain_pool.close()
 
 
 if __name__ == '__main__':
@@ -68,7 +68,11 @@ def get_workload_cost_sqls(statements, indexes, is_multi_node):
 
 
 def get_index_setting_sqls(indexes, is_multi_node):
-    sqls = get_hypo_index_head_sqls(is_multi_node)[:]
+    return get_hypo_index_head_sqls(is_multi_node) + get_hypo_index_create_sqls(indexes)
+
+
+def get_hypo_index_create_sqls(indexes):
+    sqls = []
     if indexes:
         # Create hypo-indexes.
         for index in indexes:
@@ -120,3 +124,14 @@ def get_table_info_sql(table, schema):
 def get_column_info_sql(table, schema):
     return f"select n_distinct, attname from pg_stats where tablename ilike '{table}' " \
            f"and schemaname = '{schema}';"
+
+
+def get_schema_fingerprint_sql(schema):
+    """The fingerprint changes once the tables, the indexes or the statistics of the schema change."""
+    schemas = ','.join("'%s'" % _schema.strip() for _schema in schema.split(','))
+    return "SELECT 'fingerprint:' || pg_catalog.md5(pg_catalog.current_database() || ':' || " \
+           "pg_catalog.coalesce(pg_catalog.inet_server_port(), 0) || ':' || " \
+           "pg_catalog.coalesce(pg_catalog.string_agg(n.nspname || '.' || c.relname || ':' || c.relkind || ':' || " \
+           "c.relnatts || ':' || c.relpages || ':' || c.reltuples, ',' ORDER BY n.nspname, c.relname), '')) " \
+           "FROM pg_catalog.pg_class c JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace " \
+           f"WHERE n.nspname IN ({schemas}) AND c.relkind IN ('r', 'i', 'm', 'p');"
@@ -18,6 +18,7 @@ from functools import lru_cache
 from typing import List, Tuple, Sequence, Any
 from contextlib import contextmanager
 
+import numpy as np
 import sqlparse
 from sqlparse.tokens import Name
 from sqlparse.sql import Function, Parenthesis, IdentifierList
@@ -272,18 +273,47 @@ class QueryItem:
 
 
 class WorkLoad:
+    """Costs are kept in a dense matrix of queries x index configs. The positions of
+    queries and index configs are hashed, so lookups don't scan the lists."""
+
     def __init__(self, queries: List[QueryItem]):
         self.__indexes_list = []
+        self.__indexes_positions = dict()
         self.__queries = queries
-        self.__index_names_list = [[] for _ in range(len(self.__queries))]
-        self.__indexes_costs = [[] for _ in range(len(self.__queries))]
-        self.__plan_list = [[] for _ in range(len(self.__queries))]
+        self.__query_positions = dict()
+        for pos, query in enumerate(queries):
+            self.__query_positions.setdefault(query, pos)
+        self.__index_names_list = []
+        self.__indexes_costs = []
+        self.__plan_list = []
+        # The matrix grows geometrically, only the first `self.__configs_count` columns are valid.
+        self.__costs_matrix = np.zeros((len(queries), 8))
+        self.__total_costs = []
+        self.__configs_count = 0
+        self.__related_queries_cache = dict()
+        self.__sql_num_cache = dict()
 
     def get_queries(self) -> List[QueryItem]:
         return self.__queries
 
     def has_indexes(self, indexes: Tuple[AdvisedIndex]):
-        return indexes in self.__indexes_list
+        return indexes in self.__indexes_positions
+
+    def clear_cache(self):
+        self.__related_queries_cache.clear()
+        self.__sql_num_cache.clear()
+
+    def _indexes_position(self, indexes):
+        try:
+            return self.__indexes_positions[indexes if indexes else None]
+        except KeyError:
+            raise ValueError('%s is not in the workload.' % (indexes,)) from None
+
+    def _query_position(self, query):
+        try:
+            return self.__query_positions[query]
+        except KeyError:
+            raise ValueError('%s is not in the workload.' % query) from None
 
     def get_used_index_names(self):
         used_indexes = set()
@@ -292,15 +322,11 @@ class WorkLoad:
                 used_indexes.add(index_name)
         return used_indexes
 
-    @lru_cache(maxsize=None)
     def get_workload_used_indexes(self, indexes: (Tuple[AdvisedIndex], None)):
-        return list([index_names[self.__indexes_list.index(indexes if indexes else None)]
-                     for index_names in self.__index_names_list])
+        return list(self.__index_names_list[self._indexes_position(indexes)])
 
     def get_query_advised_indexes(self, indexes, query):
-        query_idx = self.__queries.index(query)
-        indexes_idx = self.__indexes_list.index(indexes if indexes else None)
-        used_index_names = self.__index_names_list[indexes_idx][query_idx]
+        used_index_names = self.__index_names_list[self._indexes_position(indexes)][self._query_position(query)]
         used_advised_indexes = []
         for index in indexes:
             for index_name in used_index_names:
@@ -316,57 +342,68 @@ class WorkLoad:
     def replace_indexes(self, origin, new):
         if not new:
             new = None
-        self.__indexes_list[self.__indexes_list.index(origin if origin else None)] = new
+        self.__indexes_list[self._indexes_position(origin)] = new
+        self.__indexes_positions.clear()
+        for pos, indexes in enumerate(self.__indexes_list):
+            self.__indexes_positions.setdefault(indexes, pos)
+        self.clear_cache()
 
-    @lru_cache(maxsize=None)
     def get_total_index_cost(self, indexes: (Tuple[AdvisedIndex], None)):
-        return sum(
-            query_index_cost[self.__indexes_list.index(indexes if indexes else None)] for query_index_cost in
-            self.__indexes_costs)
+        return self.__total_costs[self._indexes_position(indexes)]
 
-    @lru_cache(maxsize=None)
     def get_total_origin_cost(self):
         return self.get_total_index_cost(None)
 
-    @lru_cache(maxsize=None)
     def get_indexes_benefit(self, indexes: Tuple[AdvisedIndex]):
         return self.get_total_origin_cost() - self.get_total_index_cost(indexes)
 
-    @lru_cache(maxsize=None)
     def get_index_benefit(self, index: AdvisedIndex):
         return self.get_indexes_benefit(tuple([index]))
 
-    @lru_cache(maxsize=None)
+    def get_costs_of_queries(self, indexes: (Tuple[AdvisedIndex], None)):
+        """Return the costs of all queries under the index config as an array."""
+        return self.__costs_matrix[:, self._indexes_position(indexes)]
+
+    def get_origin_costs_of_queries(self):
+        return self.get_costs_of_queries(None)
+
+    def get_benefits_of_queries(self, indexes: (Tuple[AdvisedIndex], None)):
+        return self.get_origin_costs_of_queries() - self.get_costs_of_queries(indexes)
+
     def get_indexes_cost_of_query(self, query: QueryItem, indexes: (Tuple[AdvisedIndex], None)):
-        return self.__indexes_costs[self.__queries.index(query)][
-            self.__indexes_list.index(indexes if indexes else None)]
+        return self.__indexes_costs[self._indexes_position(indexes)][self._query_position(query)]
 
-    @lru_cache(maxsize=None)
     def get_indexes_plan_of_query(self, query: QueryItem, indexes: (Tuple[AdvisedIndex], None)):
-        return self.__plan_list[self.__queries.index(query)][
-            self.__indexes_list.index(indexes if indexes else None)]
+        return self.__plan_list[self._indexes_position(indexes)][self._query_position(query)]
 
-    @lru_cache(maxsize=None)
     def get_origin_cost_of_query(self, query: QueryItem):
         return self.get_indexes_cost_of_query(query, None)
 
-    @lru_cache(maxsize=None)
     def is_positive_query(self, index: AdvisedIndex, query: QueryItem):
         return self.get_origin_cost_of_query(query) > self.get_indexes_cost_of_query(query, tuple([index]))
 
     def add_indexes(self, indexes: (Tuple[AdvisedIndex], None), costs, index_names, plan_list):
         if not indexes:
             indexes = None
-        self.__indexes_list.append(indexes)
         if len(costs) != len(self.__queries):
-            raise
-        for i, cost in enumerate(costs):
-            self.__indexes_costs[i].append(cost)
-            self.__index_names_list[i].append(index_names[i])
-            self.__plan_list[i].append(plan_list[i])
+            raise ValueError('The number of costs does not match the number of queries.')
+        if self.__configs_count == self.__costs_matrix.shape[1]:
+            self.__costs_matrix = np.concatenate((self.__costs_matrix, np.zeros_like(self.__costs_matrix)), axis=1)
+        self.__costs_matrix[:, self.__configs_count] = costs
+        self.__configs_count += 1
+        self.__indexes_positions.setdefault(indexes, len(self.__indexes_list))
+        self.__indexes_list.append(indexes)
+        self.__indexes_costs.append(list(costs))
+        self.__index_names_list.append(list(index_names))
+        self.__plan_list.append(list(plan_list))
+        self.__total_costs.append(sum(costs))
 
-    @lru_cache(maxsize=None)
     def get_index_related_queries(self, index: AdvisedIndex):
+        if index not in self.__related_queries_cache:
+            self.__related_queries_cache[index] = self._get_index_related_queries(index)
+        return self.__related_queries_cache[index]
+
+    def _get_index_related_queries(self, index: AdvisedIndex):
         insert_queries = []
         delete_queries = []
         update_queries = []
@@ -407,8 +444,12 @@ class WorkLoad:
         return insert_queries, delete_queries, update_queries, select_queries, \
             positive_queries, ineffective_queries, negative_queries
 
-    @lru_cache(maxsize=None)
     def get_index_sql_num(self, index: AdvisedIndex):
+        if index not in self.__sql_num_cache:
+            self.__sql_num_cache[index] = self._get_index_sql_num(index)
+        return self.__sql_num_cache[index]
+
+    def _get_index_sql_num(self, index: AdvisedIndex):
         insert_queries, delete_queries, update_queries, \
             select_queries, positive_queries, ineffective_queries, \
             negative_queries = self.get_index_related_queries(index)
@@ -473,37 +514,31 @@ def match_columns(column1, column2):
 def infer_workload_benefit(workload: WorkLoad, config: List[AdvisedIndex],
                            atomic_config_total: List[Tuple[AdvisedIndex]]):
     """ Infer the total cost of queries for a config according to the cost of atomic configs. """
-    total_benefit = 0
     atomic_subsets_configs = lookfor_subsets_configs(config, atomic_config_total)
-    is_recorded = [True] * len(atomic_subsets_configs)
-    for query in workload.get_queries():
-        origin_cost_of_query = workload.get_origin_cost_of_query(query)
-        if origin_cost_of_query == 0:
+    origin_costs = workload.get_origin_costs_of_queries()
+    valid = origin_costs != 0
+    if not valid.any():
+        return 0
+    origin_costs = origin_costs[valid]
+    # When there are multiple indexes, the benefit is the total benefit
+    # of the multiple indexes minus the benefit of every single index.
+    total_benefit = (origin_costs - workload.get_costs_of_queries((config[-1],))[valid]).sum()
+    queries = [query for query, is_valid in zip(workload.get_queries(), valid) if is_valid]
+    for sub_config in atomic_subsets_configs:
+        single_index_total_benefit = sum(workload.get_benefits_of_queries((index,))[valid]
+                                         for index in sub_config)
+        portfolio_returns = origin_costs - workload.get_costs_of_queries(sub_config)[valid] \
+            - single_index_total_benefit
+        total_benefit += portfolio_returns.sum()
+        # Record the portfolio returns of the index, unless they have been recorded
+        # before this inference.
+        association_indexes = ';'.join([str(index) for index in sub_config])
+        if association_indexes in config[-1].association_indexes:
             continue
-        # When there are multiple indexes, the benefit is the total benefit
-        # of the multiple indexes minus the benefit of every single index.
-        total_benefit += \
-            origin_cost_of_query - workload.get_indexes_cost_of_query(query, (config[-1],))
-        for k, sub_config in enumerate(atomic_subsets_configs):
-            single_index_total_benefit = sum(origin_cost_of_query -
-                                             workload.get_indexes_cost_of_query(query, (index,))
-                                             for index in sub_config)
-            portfolio_returns = \
-                origin_cost_of_query \
-                - workload.get_indexes_cost_of_query(query, sub_config) \
-                - single_index_total_benefit
-            total_benefit += portfolio_returns
-            if portfolio_returns / origin_cost_of_query <= 0.01:
-                continue
-            # Record the portfolio returns of the index.
-            association_indexes = ';'.join([str(index) for index in sub_config])
-            association_benefit = (query.get_statement(), portfolio_returns / origin_cost_of_query)
-            if association_indexes not in config[-1].association_indexes:
-                is_recorded[k] = False
-                config[-1].set_association_indexes(association_indexes, association_benefit)
-                continue
-            if not is_recorded[k]:
-                config[-1].set_association_indexes(association_indexes, association_benefit)
+        portfolio_ratios = portfolio_returns / origin_costs
+        for pos in np.flatnonzero(portfolio_ratios > 0.01):
+            association_benefit = (queries[pos].get_statement(), portfolio_ratios[pos])
+            config[-1].set_association_indexes(association_indexes, association_benefit)
 
     return total_benefit
 
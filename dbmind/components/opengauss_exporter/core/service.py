@@ -11,14 +11,15 @@
 # MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
 # See the Mulan PSL v2 for more details.
 import logging
+import threading
 import time
 import os
-from concurrent.futures import as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from concurrent.futures.thread import ThreadPoolExecutor
 from datetime import datetime
 
 from prometheus_client import (
-    Gauge, Summary, Histogram, Info, Enum
+    Counter, Gauge, Summary, Histogram, Info, Enum
 )
 from prometheus_client.exposition import generate_latest
 from prometheus_client.registry import CollectorRegistry
@@ -65,6 +66,10 @@ EXPORTER_FIXED_INFO = {
     'monitoring': None  # what address is the database instance
 }
 
+# How long (in seconds) a scrape waits for a query which doesn't set timeout.
+# If the query doesn't return in time, the last good result is served.
+DEFAULT_QUERY_DEADLINE = 10
+
 driver = None
 
 # yaml macros
@@ -80,6 +85,23 @@ _dbrole = DBROLE_UNSET  # default
 _dbversion = '9.2.24'
 
 query_instances = list()
+_scheduling_lock = threading.Lock()
+_rendering_lock = threading.Lock()
+
+# Self-monitoring metrics of the exporter.
+query_duration = Gauge(
+    name='opengauss_exporter_query_duration_seconds',
+    documentation='duration of the last execution of each query',
+    labelnames=('query_instance', 'query'),
+    registry=REGISTRY
+)
+query_skipped = Counter(
+    name='opengauss_exporter_query_skipped',
+    documentation='times that a scrape served the last result of a query, because the query '
+                  'was still running (in_flight), exceeded the deadline (deadline) or failed (error)',
+    labelnames=('query_instance', 'query', 'reason'),
+    registry=REGISTRY
+)
 
 
 def is_valid_version(version):
@@ -110,6 +132,8 @@ class Query:
 
         self._cache = None
         self._last_scrape_timestamp = int(time.time() * 1000) - 15000  # Default value is 15 seconds ago.
+        self.rows = None  # The last good result served for scrapes.
+        self.refreshing = None  # The future of the running execution.
 
     def fetch(self, alternative_timeout, force_connection_db=None):
         current_timestamp = int(time.time() * 1000)
@@ -130,7 +154,8 @@ class Query:
         logging.debug('Query the SQL statement: %s.', formatted)
         self._cache = driver.query(formatted,
                                    self.timeout or alternative_timeout,
-                                   force_connection_db)
+                                   force_connection_db,
+                                   raise_error=True)
         self._last_scrape_timestamp = current_timestamp
         return self._cache
 
@@ -245,58 +270,77 @@ class QueryInstance:
     def force_query_into_particular_db(self, db_name):
         self._forcing_db = db_name
 
-    def update(self):
+    def deadline(self, query):
+        return query.timeout or self.timeout or DEFAULT_QUERY_DEADLINE
+
+    def refresh(self, query):
+        """Execute the query and keep its result as the last good result.
+        If the execution fails, the last good result is kept."""
+        start_time = time.monotonic()
+        try:
+            # Force the query into connecting to the specific database
+            # rather than the default database, if needed.
+            rows = query.fetch(self.timeout, self._forcing_db)
+        except Exception as e:
+            logging.exception(e)
+            logging.info("Error SQL statement is '%s'.", query.sql)
+            query_skipped.labels(self.name, query.name, 'error').inc()
+            return
+        finally:
+            query_duration.labels(self.name, query.name).set(time.monotonic() - start_time)
+
+        if len(rows) == 0:
+            logging.warning("Fetched nothing for metric '%s'." % query.name)
+        query.rows = rows
+
+    def render(self):
         # Clear old metric's value and its labels.
         for metric in self.metrics:
             metric.value.clear()
 
         for query in self.queries:
-            # Force the query into connecting to the specific database
-            # rather than the default database, if needed.
-            try:
-                rows = query.fetch(self.timeout, self._forcing_db)
-            except Exception as e:
-                logging.exception(e)
-                logging.info("Error SQL statement is '%s'.", query.sql)
-                continue
-            else:
-                if len(rows) == 0:
-                    logging.warning("Fetched nothing for metric '%s'." % query.name)
-                    continue
-
-            # Update for all metrics in current query instance.
-            for row in rows:
-                # `global_labels` is the essential labels for each metric family.
-                labels = {}
-                for field_name in self.labels:
-                    field_value = str(row.get(field_name, global_labels.get(field_name)))
-                    field_value = process_particular_field(field_name, field_value)
-                    labels[field_name] = field_value
-
-                for metric in self.metrics:
-                    metric_family = metric.value.labels(**labels)
-                    value = row.get(metric.name)
-                    # None is equivalent to NaN instead of zero.
-                    if value is None:
-                        logging.warning(
-                            'Not found field %s in the %s.', metric.name, self.name
-                        )
-
-                    value = cast_to_numeric(value)
-                    # Different usages (Prometheus data type) have different setting methods.
-                    # Thus, we have to select to different if-branches according to metric's usage.
-                    if metric.usage == 'COUNTER':
-                        metric_family.set(value)
-                    elif metric.usage == 'GAUGE':
-                        metric_family.set(value)
-                    elif metric.usage == 'SUMMARY':
-                        metric_family.observe(value)
-                    elif metric.usage == 'HISTOGRAM':
-                        metric_family.observe(value)
-                    else:
-                        logging.error(
-                            'Not supported metric %s due to usage %s.' % (metric.name, metric.usage)
-                        )
+            if query.rows:
+                self._set_metrics(query.rows)
+
+    def update(self):
+        for query in self.queries:
+            self.refresh(query)
+        self.render()
+
+    def _set_metrics(self, rows):
+        # Update for all metrics in current query instance.
+        for row in rows:
+            # `global_labels` is the essential labels for each metric family.
+            labels = {}
+            for field_name in self.labels:
+                field_value = str(row.get(field_name, global_labels.get(field_name)))
+                field_value = process_particular_field(field_name, field_value)
+                labels[field_name] = field_value
+
+            for metric in self.metrics:
+                metric_family = metric.value.labels(**labels)
+                value = row.get(metric.name)
+                # None is equivalent to NaN instead of zero.
+                if value is None:
+                    logging.warning(
+                        'Not found field %s in the %s.', metric.name, self.name
+                    )
+
+                value = cast_to_numeric(value)
+                # Different usages (Prometheus data type) have different setting methods.
+                # Thus, we have to select to different if-branches according to metric's usage.
+                if metric.usage == 'COUNTER':
+                    metric_family.set(value)
+                elif metric.usage == 'GAUGE':
+                    metric_family.set(value)
+                elif metric.usage == 'SUMMARY':
+                    metric_family.observe(value)
+                elif metric.usage == 'HISTOGRAM':
+                    metric_family.observe(value)
+                else:
+                    logging.error(
+                        'Not supported metric %s due to usage %s.' % (metric.name, metric.usage)
+                    )
 
 
 def config_collecting_params(
@@ -370,17 +414,37 @@ def update_exporter_fixed_info(k, v):
     EXPORTER_FIXED_INFO[k] = v
 
 
+def _schedule(instance, query):
+    """Execute the query in the background unless its last execution is still running."""
+    if query.refreshing is not None and not query.refreshing.done():
+        query_skipped.labels(instance.name, query.name, 'in_flight').inc()
+    else:
+        query.refreshing = _thread_pool_executor.submit(instance.refresh, query)
+    return query.refreshing
+
+
 def query_all_metrics():
-    futures = []
-    if _thread_pool_executor._work_queue.qsize() == 0:
+    scrape_start_time = time.monotonic()
+    scheduled = []
+    with _scheduling_lock:
         for instance in query_instances:
-            futures.append(_thread_pool_executor.submit(instance.update))
+            for query in instance.queries:
+                scheduled.append((instance, query, _schedule(instance, query)))
 
-        for future in as_completed(futures):
-            try:
-                future.result()
-            except Exception as e:
-                logging.exception(e)
+    # Wait for each query until its deadline. A slow query keeps running
+    # in the background, and its last good result is served meanwhile.
+    for instance, query, future in scheduled:
+        remaining = scrape_start_time + instance.deadline(query) - time.monotonic()
+        try:
+            future.result(timeout=max(remaining, 0))
+        except FuturesTimeoutError:
+            query_skipped.labels(instance.name, query.name, 'deadline').inc()
+        except Exception as e:
+            logging.exception(e)
+
+    with _rendering_lock:
+        for instance in query_instances:
+            instance.render()
 
         # refresh fixed info below
         try:
@@ -395,4 +459,4 @@ def query_all_metrics():
         exporter_fixed_info.clear()
         exporter_fixed_info.labels(**EXPORTER_FIXED_INFO).set(1)
 
-    return generate_latest(REGISTRY)
+        return generate_latest(REGISTRY)
@@ -47,22 +47,8 @@ class Executor:
                 logging.warning('Database connector raised an exception: %s.', e)
                 self.conn.rollback()
 
-    def get_table_columns(self, table_name):
-        sql = f"SELECT column_name, ordinal_position FROM information_schema.columns WHERE table_name='{table_name}'" \
-              f" AND table_schema = '{self.schema}' AND table_catalog = '{self.dbname}';"
-        results = sorted(self._execute(sql), key=lambda x: x[1])
-        return [result[0] for result in results]
-
-    def exists_primary_key(self, table_name):
-        sql = f"SELECT pg_catalog.count(*)  FROM information_schema.table_constraints WHERE " \
-              f"constraint_type in ('PRIMARY KEY', 'UNIQUE') AND table_name = '{table_name}'" \
-              f" AND table_schema = '{self.schema}' AND table_catalog = '{self.dbname}';"
-        return self._execute(sql)[0][0] > 0
-
-    def get_notnull_columns(self, table_name):
-        sql = f"SELECT column_name FROM information_schema.columns WHERE table_catalog = '{self.dbname}' " \
-              f"AND table_schema = '{self.schema}' AND table_name = '{table_name}' AND is_nullable = 'NO';"
-        return [_tuple[0] for _tuple in self._execute(sql)]
+    def fetch_all(self, sql):
+        return self._execute(sql) or []
 
     def syntax_check(self, sql):
         if sql.upper().startswith('TRUNCATE TABLE'):
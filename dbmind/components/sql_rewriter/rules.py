@@ -40,11 +40,78 @@ SIGN_CONVERSION_OP = {'mul', 'div'}
 
 AGG_FUNCTIONS = {'sum', 'count', 'min', 'max', 'avg'}
 
+# Features of the parsed statement, a rule cannot match unless all its features are present.
+FEATURE_WHERE = 1 << 0
+FEATURE_OR = 1 << 1
+FEATURE_IN = 1 << 2
+FEATURE_ARITHMETIC = 1 << 3
+FEATURE_GROUPBY = 1 << 4
+FEATURE_SORT = 1 << 5
+FEATURE_SORT_CONST = 1 << 6
+FEATURE_STAR = 1 << 7
+FEATURE_DISTINCT_STAR = 1 << 8
+FEATURE_UNION = 1 << 9
+FEATURE_DELETE = 1 << 10
+FEATURE_SELF_JOIN = 1 << 11
+
+KEY_FEATURES = {
+    'where': FEATURE_WHERE,
+    'or': FEATURE_OR,
+    'in': FEATURE_IN,
+    'nin': FEATURE_IN,
+    'groupby': FEATURE_GROUPBY | FEATURE_SORT,
+    'orderby': FEATURE_SORT,
+    'union': FEATURE_UNION,
+    'delete': FEATURE_DELETE,
+}
+KEY_FEATURES.update({operator: FEATURE_ARITHMETIC for operator in OPERATOR_PAIR})
+
+
+def _is_const_sort_item(item):
+    if isinstance(item, list):
+        return any(_is_const_sort_item(sub_item) for sub_item in item)
+    return isinstance(item, dict) and isinstance(item.get('value'), int)
+
+
+def get_features(parsed_sql):
+    """Return the feature bitmap of the parsed statement by walking the tree once."""
+    features = 0
+    stack = [parsed_sql]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        if not isinstance(node, dict):
+            continue
+        for key, value in node.items():
+            features |= KEY_FEATURES.get(key, 0)
+            if key in ('groupby', 'orderby') and _is_const_sort_item(value):
+                features |= FEATURE_SORT_CONST
+            elif key == 'select' and value == '*':
+                features |= FEATURE_STAR
+            elif key == 'select_distinct' and value == '*':
+                features |= FEATURE_STAR | FEATURE_DISTINCT_STAR
+            elif key == 'from' and isinstance(value, list) and len(value) == 2 and \
+                    all(isinstance(item, dict) for item in value) and \
+                    'value' in value[0] and value[0].get('value') == value[1].get('value'):
+                features |= FEATURE_SELF_JOIN
+            if isinstance(value, (dict, list)):
+                stack.append(value)
+    return features
+
 
 class Rule:
+    # The features required by the rule, see get_features().
+    features = 0
+
     def __init__(self):
         self.tableinfo = None
 
+    @classmethod
+    def applicable(cls, features):
+        return features & cls.features == cls.features
+
     @abc.abstractmethod
     def _check_and_format(self, parsed_sql, count):
         pass
@@ -60,6 +127,7 @@ class Rule:
 class Delete2Truncate(Rule):
     """It is recommended that the DELETE
     without the WHERE condition be changed to TRUNCATE."""
+    features = FEATURE_DELETE
 
     def _check_and_format(self, parsed_sql, count):
         if len(parsed_sql) == 1 and 'delete' in parsed_sql:
@@ -70,6 +138,7 @@ class Delete2Truncate(Rule):
 
 class In2Exists(Rule):
     """Use (not) exists instead of (not) in if the associated field does not have a NULL value."""
+    features = FEATURE_WHERE | FEATURE_IN
 
     def _check_and_format(self, parsed_sql, in_count):
         if isinstance(parsed_sql, list):
@@ -114,6 +183,7 @@ class In2Exists(Rule):
 
 class Group2Hash(Rule):
     """Enables the executor to select hashagg instead of groupagg."""
+    features = FEATURE_GROUPBY
 
     def _check_and_format(self, parsed_sql, groupagg_count):
         if isinstance(parsed_sql, list):
@@ -171,6 +241,7 @@ class Group2Hash(Rule):
 
 class Star2Columns(Rule):
     """SELECT * type is not advised."""
+    features = FEATURE_STAR
 
     def _check_and_format(self, parsed_sql, star_count):
         if isinstance(parsed_sql, list):
@@ -228,6 +299,7 @@ class Having2Where(Rule):
 
 class AlwaysTrue(Rule):
     """Remove useless where clause."""
+    features = FEATURE_WHERE
 
     @staticmethod
     def rm_true_expr(where_clause, index, true_count):
@@ -305,6 +377,7 @@ class AlwaysTrue(Rule):
 
 class DistinctStar(Rule):
     """Distinct * is not meaningful for primary keys."""
+    features = FEATURE_DISTINCT_STAR
 
     def _check_and_format(self, parsed_sql, distinctstar_count):
         if isinstance(parsed_sql, list):
@@ -330,6 +403,7 @@ class DistinctStar(Rule):
 
 class UnionAll(Rule):
     """Change Union to Union All."""
+    features = FEATURE_UNION
 
     def _check_and_format(self, parsed_sql, union_count):
         if isinstance(parsed_sql, list):
@@ -353,6 +427,7 @@ class OrderbyConst(Rule):
     """Transform constant in ORDER BY or GROUP BY to column name.
     Example: "select id from test where id=1 order by 1.
     """
+    features = FEATURE_SORT_CONST
 
     @staticmethod
     def replace_const_by_column(parsed_sql, index, columns, checked=False):
@@ -404,6 +479,7 @@ class OrderbyConst(Rule):
 
 class Or2In(Rule):
     """Transform the OR query with different conditions in the same column to the IN query."""
+    features = FEATURE_OR
 
     def _check_and_format(self, parsed_sql, or_count):
         if isinstance(parsed_sql, list):
@@ -461,6 +537,7 @@ class OrderbyConstColumns(Rule):
     """Delete useless conditions in ORDER BY or GROUP BY.
     Example: "select id from test where id=1 order by id
     """
+    features = FEATURE_WHERE | FEATURE_SORT
 
     @staticmethod
     def get_columns(whereclause, columns=None):
@@ -524,6 +601,7 @@ class ImplicitConversion(Rule):
     """Expression transformation.
     SQL: select * from table1 where col1 + 1 < 2 -> select * from table1 where col1 < 1
     """
+    features = FEATURE_WHERE | FEATURE_ARITHMETIC
 
     @staticmethod
     def _exists_int_or_float(left_right):
@@ -637,6 +715,7 @@ class SelfJoin(Rule):
             SELECT a.c_id FROM bmsql_customer AS a, bmsql_customer AS b
                 WHERE TRUNC((a.c_id) / 20) = TRUNC(b.c_id / 20 + 1) AND a.c_id - b.c_id <= 20);'
     """
+    features = FEATURE_WHERE | FEATURE_SELF_JOIN
 
     @staticmethod
     def is_selfjoin(from_clause):
@@ -13,8 +13,12 @@
 import argparse
 import getpass
 import logging
+import multiprocessing
 import re
 import sys
+import threading
+import time
+from collections import defaultdict
 from copy import deepcopy
 from functools import partial
 
@@ -36,7 +40,7 @@ from .rules import (AlwaysTrue, DistinctStar, OrderbyConst, Star2Columns, UnionA
                     OrderbyConstColumns,
                     ImplicitConversion,
                     SelfJoin, Group2Hash)
-from .rules import Rule
+from .rules import Rule, get_features
 from .utils import get_table_names
 
 
@@ -90,35 +94,91 @@ def rewrite_no_column_insert_sql(sql, columns):
     return res
 
 
-def get_table_columns(sql, executor: Executor):
-    table2columns_mapper = dict()
-    involved_tables = get_all_involved_tables(sql)
-    for table_name in involved_tables:
-        table2columns_mapper[table_name] = executor.get_table_columns(table_name)
-    return table2columns_mapper
-
+class TableInfo:
 
-def exists_primary_key(tables, executor: Executor):
-    table_exists_primary = dict()
-    for table_name in tables:
-        table_exists_primary[table_name] = executor.exists_primary_key(table_name)
+    def __init__(self):
+        self.table_columns = None
+        self.table_exists_primary = None
+        self.table_notnull_columns = None
 
-    return table_exists_primary
 
+# Changes once a table, column or constraint is created, altered or dropped.
+CATALOG_VERSION_STMT = "SELECT (SELECT pg_catalog.count(*) FROM pg_catalog.pg_class) || ':' || " \
+                       "(SELECT pg_catalog.max(xmin::text::bigint) FROM pg_catalog.pg_class) || ':' || " \
+                       "(SELECT pg_catalog.max(xmin::text::bigint) FROM pg_catalog.pg_attribute) || ':' || " \
+                       "(SELECT pg_catalog.count(*) FROM pg_catalog.pg_constraint) || ':' || " \
+                       "(SELECT pg_catalog.max(xmin::text::bigint) FROM pg_catalog.pg_constraint);"
+# The catalog version scans the whole pg_attribute, so probe it at most once in the interval.
+CATALOG_PROBE_INTERVAL = 60  # unit: second
+
+
+class SchemaSnapshot:
+    """Columns, primary keys and not-null columns of all tables in a database.
+
+    The snapshot is loaded in bulk and shared by all statements and rules.
+    It is reloaded only if the version of the catalog changes, which is
+    probed at most once every `probe_interval` seconds.
+    """
+
+    def __init__(self, fetch, schema=None, probe_interval=CATALOG_PROBE_INTERVAL):
+        # `fetch` executes a statement and returns the result tuples.
+        self.fetch = fetch
+        self.schema = schema
+        self.probe_interval = probe_interval
+        self.probed_at = None
+        self.version = None
+        self.table_columns = dict()
+        self.table_exists_primary = dict()
+        self.table_notnull_columns = dict()
+
+    def refresh(self):
+        now = time.monotonic()
+        if self.probed_at is not None and now - self.probed_at < self.probe_interval:
+            return self
+        self.probed_at = now
+        results = self.fetch(CATALOG_VERSION_STMT)
+        version = results[0][0] if results else None
+        if version is None or version != self.version:
+            self.load()
+            self.version = version
+        return self
+
+    def load(self):
+        schema_condition = " AND table_schema = '%s'" % self.schema if self.schema else ''
+        columns_stmt = "SELECT table_name, column_name, ordinal_position, is_nullable " \
+                       "FROM information_schema.columns WHERE true%s;" % schema_condition
+        primary_stmt = "SELECT table_name, pg_catalog.count(*) FROM information_schema.table_constraints " \
+                       "WHERE constraint_type in ('PRIMARY KEY', 'UNIQUE')%s GROUP BY table_name;" % schema_condition
+        table_columns = defaultdict(list)
+        table_notnull_columns = defaultdict(list)
+        for table_name, column_name, _, is_nullable in sorted(self.fetch(columns_stmt) or (),
+                                                              key=lambda x: int(x[2])):
+            table_columns[table_name].append(column_name)
+            if is_nullable == 'NO':
+                table_notnull_columns[table_name].append(column_name)
+        self.table_columns = dict(table_columns)
+        self.table_notnull_columns = dict(table_notnull_columns)
+        self.table_exists_primary = {table_name: count for table_name, count in self.fetch(primary_stmt) or ()}
+
+    def get_tableinfo(self, tables):
+        tableinfo = TableInfo()
+        tableinfo.table_columns = {table: list(self.table_columns.get(table, ())) for table in tables}
+        tableinfo.table_exists_primary = {table: self.table_exists_primary.get(table, 0) for table in tables}
+        tableinfo.table_notnull_columns = {table: list(self.table_notnull_columns.get(table, ()))
+                                           for table in tables}
+        return tableinfo
 
-def get_notnull_columns(tables, executor: Executor):
-    table_notnull_columns = dict()
-    for table_name in tables:
-        table_notnull_columns[table_name] = executor.get_notnull_columns(table_name)
-    return table_notnull_columns
 
+_schema_snapshots = dict()
 
-class TableInfo:
 
-    def __init__(self):
-        self.table_columns = None
-        self.table_exists_primary = None
-        self.table_notnull_columns = None
+def get_schema_snapshot(scope, fetch, schema=None):
+    """Return the refreshed snapshot of the database identified by `scope`."""
+    if (scope, schema) not in _schema_snapshots:
+        _schema_snapshots[(scope, schema)] = SchemaSnapshot(fetch, schema)
+    snapshot = _schema_snapshots[(scope, schema)]
+    snapshot.fetch = fetch
+    return snapshot.refresh()
 
 
 def singleton(cls):
@@ -146,10 +206,27 @@ def get_offline_rewriter():
     return rewriter
 
 
+# The number of statements rewritten by a worker process at a time.
+REWRITE_BATCH_SIZE = 64
+# The rewriter is a singleton shared by the threads of the service.
+_counters_lock = threading.Lock()
+
+
+def _rewrite_batch(rules, sqls, tableinfo, if_format):
+    rewriter = deepcopy(SQLRewriter())
+    rewriter.rules = list(rules)
+    rewriter.reset_counters()
+    results = [rewriter.rewrite(sql, tableinfo, if_format) for sql in sqls]
+    return results, rewriter.get_counters()
+
+
 @singleton
 class SQLRewriter:
     def __init__(self):
         self.rules = []
+        self.rule_checked = defaultdict(int)
+        self.rule_skipped = defaultdict(int)
+        self.rule_elapsed = defaultdict(float)
         self.add_rule(In2Exists)
         self.add_rule(DistinctStar)
         self.add_rule(Star2Columns)
@@ -163,8 +240,9 @@ class SQLRewriter:
         self.add_rule(SelfJoin)
         self.add_rule(Group2Hash)
 
-    def rewrite(self, sql, tableinfo=TableInfo(), if_format=True):
-        parsed_sql = parse(sql)
+    def rewrite(self, sql, tableinfo=TableInfo(), if_format=True, parsed_sql=None):
+        if parsed_sql is None:
+            parsed_sql = parse(sql)
         try:
             checked_rules, parsed_sql = self._apply_rules(parsed_sql, tableinfo)
         except Exception as e:
@@ -181,6 +259,26 @@ class SQLRewriter:
 
         return True if checked_rules else False, sql_string
 
+    def rewrite_batch(self, sqls, tableinfo=TableInfo(), if_format=True, processes=1,
+                      batch_size=REWRITE_BATCH_SIZE):
+        """Rewrite the statements in batches over a pool of `processes` processes.
+        The results are returned in the same order as the statements.
+
+        The statements are rewritten in the current process by default. Only the
+        command line tool employs a pool, so the service doesn't fork for each request."""
+        batches = [sqls[i:i + batch_size] for i in range(0, len(sqls), batch_size)]
+        # Daemonic processes, e.g., the workers of DBMind service, are not allowed to have children.
+        if len(batches) <= 1 or processes <= 1 or multiprocessing.current_process().daemon:
+            return [self.rewrite(sql, tableinfo, if_format) for sql in sqls]
+        with multiprocessing.Pool(min(processes, len(batches))) as pool:
+            batch_results = pool.starmap(_rewrite_batch,
+                                         [(self.rules, batch, tableinfo, if_format) for batch in batches])
+        results = []
+        for _results, counters in batch_results:
+            results.extend(_results)
+            self.merge_counters(counters)
+        return results
+
     def add_rule(self, rule):
         if not issubclass(rule, Rule):
             raise NotImplementedError()
@@ -189,14 +287,45 @@ class SQLRewriter:
     def clear_rules(self):
         self.rules = []
 
+    def reset_counters(self):
+        with _counters_lock:
+            self.rule_checked.clear()
+            self.rule_skipped.clear()
+            self.rule_elapsed.clear()
+
+    def get_counters(self):
+        """Return the times each rule was checked and skipped and the seconds spent on it."""
+        with _counters_lock:
+            return {rule.__name__: {'checked': self.rule_checked[rule.__name__],
+                                    'skipped': self.rule_skipped[rule.__name__],
+                                    'elapsed': self.rule_elapsed[rule.__name__]}
+                    for rule in self.rules}
+
+    def merge_counters(self, counters):
+        with _counters_lock:
+            for name, counter in counters.items():
+                self.rule_checked[name] += counter['checked']
+                self.rule_skipped[name] += counter['skipped']
+                self.rule_elapsed[name] += counter['elapsed']
+
     def _apply_rules(self, parsed_sql, tableinfo):
         checked_rules = []
         # Format does not support "delete from" syntax.
         if not parsed_sql.get('delete'):
-            # Normalize the sql changed during the process.
-            parsed_sql = parse(format(parsed_sql))
+            # The statement that cannot be formatted cannot be rewritten either.
+            format(parsed_sql)
+        features = get_features(parsed_sql)
         for rule in self.rules:
+            if not rule.applicable(features):
+                with _counters_lock:
+                    self.rule_skipped[rule.__name__] += 1
+                continue
+            start = time.perf_counter()
             res, parsed_sql = rule().check_and_format(parsed_sql, tableinfo)
+            elapsed = time.perf_counter() - start
+            with _counters_lock:
+                self.rule_elapsed[rule.__name__] += elapsed
+                self.rule_checked[rule.__name__] += 1
             if res:
                 checked_rules.append(res)
         return checked_rules, parsed_sql
@@ -213,14 +342,6 @@ def get_password():
     return password
 
 
-def canbe_parsed(sql):
-    try:
-        parse(sql)
-    except Exception as e:
-        return False
-    return True
-
-
 def rewrite_sql_api(database, sqls, rewritten_flags=None, if_format=True, driver=None):
     rewritten_sqls = []
     get_prepare_sqls = get_generate_prepare_sqls_function()
@@ -232,6 +353,10 @@ def rewrite_sql_api(database, sqls, rewritten_flags=None, if_format=True, driver
         executor = partial(global_vars.agent_proxy.call, funcname='query_in_database', database=database)
     schemas_results = executor(stmt='select distinct(table_schema) from information_schema.tables;', return_tuples=True)
     schemas = ','.join([res[0] for res in schemas_results]) if schemas_results else 'public'
+    scope = driver.address if driver is not None else global_vars.agent_proxy.current_agent_addr()
+    snapshot = get_schema_snapshot((scope, database), lambda stmt: executor(stmt=stmt, return_tuples=True))
+    checked_sqls = []
+    involved_tables = dict()
     for _sql in sqls.split(';'):
         if not _sql.strip():
             continue
@@ -244,30 +369,18 @@ def rewrite_sql_api(database, sqls, rewritten_flags=None, if_format=True, driver
             rewritten_sqls.append(sql)
             rewritten_flags.append(False)
             continue
-        table_columns = dict()
-        table_exists_primary = dict()
-        table_notnull_columns = dict()
-        involved_tables = get_query_tables(formatted_sql)
-        tableinfo = TableInfo()
-        for table_name in involved_tables:
-            search_table_stmt = "select column_name, ordinal_position " \
-                                "from information_schema.columns where table_name='%s';" % table_name
-            results = sorted(executor(stmt=search_table_stmt, return_tuples=True), key=lambda x: x[1])
-            table_columns[table_name] = [res[0] for res in results]
-            exists_primary_stmt = "SELECT count(*)  FROM information_schema.table_constraints WHERE " \
-                                  "constraint_type in ('PRIMARY KEY', 'UNIQUE') AND table_name = '%s'" % table_name
-            table_exists_primary[table_name] = \
-                executor(stmt=exists_primary_stmt, return_tuples=True)[0][0]
-            notnull_columns_stmt = f"SELECT attname from pg_attribute where attrelid=(select oid from pg_class " \
-                                   f"where relname='{table_name}') and attnotnull=true"
-            table_notnull_columns[table_name] = [_tuple[0] for _tuple in
-                                                 executor(stmt=notnull_columns_stmt, return_tuples=True)]
-        tableinfo.table_columns = table_columns
-        tableinfo.table_exists_primary = table_exists_primary
-        tableinfo.table_notnull_columns = table_notnull_columns
-        rewritten_flag, output_sql = SQLRewriter().rewrite(formatted_sql, tableinfo, if_format)
-        rewritten_flags.append(rewritten_flag)
-        rewritten_sqls.append(output_sql)
+        involved_tables.update(dict.fromkeys(get_query_tables(formatted_sql)))
+        # The caller may pass in rewritten_flags containing the flags of former calls.
+        checked_sqls.append((len(rewritten_sqls), len(rewritten_flags), formatted_sql))
+        rewritten_sqls.append(None)
+        rewritten_flags.append(None)
+    # Rules only look up the tables of the statement, so the statements can share the table information.
+    tableinfo = snapshot.get_tableinfo(involved_tables)
+    results = SQLRewriter().rewrite_batch([formatted_sql for _, _, formatted_sql in checked_sqls], tableinfo,
+                                          if_format)
+    for (sql_index, flag_index, _), (rewritten_flag, output_sql) in zip(checked_sqls, results):
+        rewritten_sqls[sql_index] = output_sql
+        rewritten_flags[flag_index] = rewritten_flag
     return '\n'.join(rewritten_sqls)
 
 
@@ -289,39 +402,49 @@ def main(argv):
     args = arg_parser.parse_args(argv)
     args.W = get_password()
     executor = Executor(args.database, args.db_user, args.W, args.db_host, args.db_port, args.schema)
+    snapshot = SchemaSnapshot(executor.fetch_all, schema=args.schema).refresh()
     field_names = ('Raw SQL', 'Rewritten SQL')
     output_table = PrettyTable()
     output_table.field_names = field_names
     output_table.align = "l"
     with open(args.file) as file_h:
         content = file_h.read()
+    rows = []
+    # The statements rewritten by rules, which are rewritten in batches at last.
+    checked_sqls = []
+    involved_tables = dict()
     for _sql in sqlparse.split(content):
         if not _sql.strip():
             continue
         sql = _sql.strip() if _sql.strip().endswith(';') else _sql.strip() + ';'
-        if not executor.syntax_check(sql) or not canbe_parsed(sql):
-            output_table.add_row([sql, ''])
+        rows.append([sql, ''])
+        if not executor.syntax_check(sql):
             continue
         # Unify sql table names and keywords to lowercase for subsequent rules.
         formatted_sql = sqlparse.format(sql, keyword_case='lower', identifier_case='lower', strip_comments=True)
-        tableinfo = TableInfo()
-        tableinfo.table_columns = get_table_columns(formatted_sql, executor)
-        tables = tableinfo.table_columns.keys()
-        tableinfo.table_exists_primary = exists_primary_key(tables, executor)
-        tableinfo.table_notnull_columns = get_notnull_columns(tables, executor)
+        try:
+            parsed_sql = parse(formatted_sql)
+        except Exception:
+            continue
+        tables = dict.fromkeys(get_all_involved_tables(parsed_sql, []))
         if is_no_column_insert_sql(formatted_sql):
-            if len(tables) != 1:
-                res = False
-                rewritten_sql = formatted_sql
-            else:
-                res = True
+            tableinfo = snapshot.get_tableinfo(tables)
+            if len(tables) == 1:
                 rewritten_sql = rewrite_no_column_insert_sql(sql, tableinfo.table_columns[list(tables)[0]])
-        else:
-            res, rewritten_sql = SQLRewriter().rewrite(formatted_sql, tableinfo)
-        if not executor.syntax_check(rewritten_sql) or not res:
-            output_table.add_row([sql, ''])
-        else:
-            output_table.add_row([sql, rewritten_sql])
+                if executor.syntax_check(rewritten_sql):
+                    rows[-1][1] = rewritten_sql
+            continue
+        involved_tables.update(tables)
+        checked_sqls.append((len(rows) - 1, formatted_sql))
+    # Rules only look up the tables of the statement, so the statements can share the table information.
+    tableinfo = snapshot.get_tableinfo(involved_tables)
+    results = SQLRewriter().rewrite_batch([formatted_sql for _, formatted_sql in checked_sqls], tableinfo,
+                                          processes=multiprocessing.cpu_count())
+    for (row_index, _), (res, rewritten_sql) in zip(checked_sqls, results):
+        if res and executor.syntax_check(rewritten_sql):
+            rows[row_index][1] = rewritten_sql
+    for row in rows:
+        output_table.add_row(row)
     print(output_table)
 
 
@@ -56,6 +56,7 @@ class TemplateConfig(ModelConfig):
         self.similarity_algorithm = "list"
         self.time_list_size = 10
         self.knn_number = 3
+        self.candidate_number = 100
 
     def init_from(self, config):
         self.similarity_algorithm = config.get("template", "similarity_algorithm") if \
@@ -65,8 +66,11 @@ class TemplateConfig(ModelConfig):
             config.get("template", "time_list_size") else self.time_list_size
         self.knn_number = config.get("template", "knn_number", ) if \
             config.get("template", "knn_number") else self.knn_number
+        self.candidate_number = config.get("template", "candidate_number", fallback=None) if \
+            config.get("template", "candidate_number", fallback=None) else self.candidate_number
         self.time_list_size = int(self.time_list_size)
         self.knn_number = int(self.knn_number)
+        self.candidate_number = int(self.candidate_number)
 
 
 SUPPORTED_ALGORITHM = {'dnn': lambda config: DnnModel(DnnConfig.init_from_config_parser(config)),
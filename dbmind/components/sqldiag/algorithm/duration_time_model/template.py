@@ -20,6 +20,7 @@ from functools import reduce
 
 from . import AbstractModel
 from ..sql_similarity import calc_sql_distance
+from ..sql_similarity.ngram_index import NGramIndex
 from ...preprocessing import templatize_sql
 from ...utils import check_illegal_sql, LRUCache
 
@@ -30,12 +31,24 @@ class TemplateModel(AbstractModel):
         self.bias = 1e-5
         self.__hash_table = dict(INSERT=dict(), UPDATE=dict(), DELETE=dict(), SELECT=dict(),
                                  OTHER=dict())
+        # Indexes of the templates of each prefix, built lazily for predicting.
+        self.__indexes = dict()
         self.time_list_size = params.time_list_size
         self.knn_number = params.knn_number
+        self.candidate_number = max(params.candidate_number, params.knn_number)
         self.similarity_algorithm = calc_sql_distance(params.similarity_algorithm)
 
+    def __get_index(self, sql_prefix):
+        if sql_prefix not in self.__indexes:
+            index = NGramIndex()
+            for sql_template in self.__hash_table[sql_prefix]:
+                index.add(sql_template)
+            self.__indexes[sql_prefix] = index
+        return self.__indexes[sql_prefix]
+
     # training method for template model
     def fit(self, data):
+        self.__indexes.clear()
         for sql, duration_time in data:
             if check_illegal_sql(sql):
                 continue
@@ -86,13 +99,15 @@ class TemplateModel(AbstractModel):
             """
             if the template does not exist in the hash table,
             then calculate the possible execution time based on template
-            similarity and KNN algorithm in all other templates
+            similarity and KNN algorithm in the candidate templates
+            which share the most n-grams with it
             """
             status = 'No SQL template found'
-            for local_sql_template, local_sql_template_info in self.__hash_table[sql_prefix].items():
+            candidate_templates = self.__get_index(sql_prefix).search(sql_template, self.candidate_number)
+            for local_sql_template in candidate_templates:
                 similarity_info.append(
                     (self.similarity_algorithm(sql_template, local_sql_template),
-                     local_sql_template_info['mean_time'], local_sql_template))
+                     self.__hash_table[sql_prefix][local_sql_template]['mean_time'], local_sql_template))
             topn_similarity_info = heapq.nlargest(self.knn_number, similarity_info)
             sum_similarity_scores = sum(item[0] for item in topn_similarity_info)
             if not sum_similarity_scores:
@@ -118,6 +133,7 @@ class TemplateModel(AbstractModel):
             template_path = os.path.join(realpath, 'template.json')
             with open(template_path, mode='r') as f:
                 self.__hash_table = json.load(f)
+            self.__indexes.clear()
         else:
             logging.error("{} not exist.".format(realpath))
 
@@ -12,28 +12,49 @@
 # See the Mulan PSL v2 for more details.
 
 
-def distance(str1, str2):
+def edit_distance(str1, str2):
     """
-    func: calculate levenshtein distance between two strings.
+    func: calculate levenshtein distance between two strings by the bit-parallel
+    algorithm of Myers (Hyyrö's variant), which takes O(len(str1) * len(str2) / w)
+    instead of allocating the full matrix, w is the word size.
     :param str1: string1
     :param str2: string2
-    :return: distance
+    :return: levenshtein distance
     """
-    len_str1 = len(str1) + 1
-    len_str2 = len(str2) + 1
+    # Encode the shorter string as the pattern bit vectors.
+    if len(str1) < len(str2):
+        str1, str2 = str2, str1
+    length = len(str2)
+    if not length:
+        return len(str1)
+    peq = dict()
+    for i, char in enumerate(str2):
+        peq[char] = peq.get(char, 0) | (1 << i)
+    full_mask = (1 << length) - 1
+    last_bit = 1 << (length - 1)
+    pv, mv, score = full_mask, 0, length
+    for char in str1:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last_bit:
+            score += 1
+        elif mh & last_bit:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh = mh << 1
+        pv = (mh | ~(xv | ph)) & full_mask
+        mv = ph & xv & full_mask
+    return score
 
-    mat = [[0] * len_str2 for i in range(len_str1)]
-    mat[0][0] = 0
-    for i in range(1, len_str1):
-        mat[i][0] = mat[i - 1][0] + 1
-    for j in range(1, len_str2):
-        mat[0][j] = mat[0][j - 1] + 1
-    for i in range(1, len_str1):
-        for j in range(1, len_str2):
-            if str1[i - 1] == str2[j - 1]:
-                mat[i][j] = mat[i - 1][j - 1]
-            else:
-                mat[i][j] = min(mat[i - 1][j - 1], mat[i - 1][j], mat[i][j - 1]) + 1
 
-    # Polish later.
-    return 1 / mat[len_str1 - 1][j - 1]
+def distance(str1, str2):
+    """
+    func: calculate levenshtein similarity between two strings.
+    :param str1: string1
+    :param str2: string2
+    :return: reciprocal of the levenshtein distance plus one, which is 1 for identical strings
+    """
+    return 1 / (edit_distance(str1, str2) + 1)
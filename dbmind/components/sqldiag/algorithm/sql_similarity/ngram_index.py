@@ -0,0 +1,77 @@
+# Copyright (c) 2022 Huawei Technologies Co.,Ltd.
+#
+# openGauss is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#
+#          http://license.coscl.org.cn/MulanPSL2
+#
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+import heapq
+from collections import Counter, defaultdict
+
+
+class NGramIndex:
+    """Inverted index from token n-grams to SQL templates.
+
+    It narrows the templates down to the candidates sharing the most n-grams
+    with the queried template, so the exact similarity only needs to be
+    calculated for a few candidates instead of all the stored templates.
+    """
+
+    def __init__(self, n=2, max_df=0.5):
+        self.n = n
+        # N-grams contained in more than this proportion of templates are
+        # too common to narrow the candidates down, e.g., 'SELECT' and 'FROM'.
+        self.max_df = max_df
+        self.templates = []
+        self.ngram_numbers = []
+        self.postings = defaultdict(list)
+
+    def __len__(self):
+        return len(self.templates)
+
+    def get_ngrams(self, template):
+        tokens = template.split()
+        ngrams = set(tokens)
+        for i in range(len(tokens) - self.n + 1):
+            ngrams.add(' '.join(tokens[i:i + self.n]))
+        return ngrams
+
+    def add(self, template):
+        template_id = len(self.templates)
+        ngrams = self.get_ngrams(template)
+        self.templates.append(template)
+        self.ngram_numbers.append(len(ngrams))
+        for ngram in ngrams:
+            self.postings[ngram].append(template_id)
+
+    def search(self, template, limit):
+        """Return at most `limit` templates with the largest Jaccard similarity of n-grams."""
+        if len(self.templates) <= limit:
+            return list(self.templates)
+        ngrams = self.get_ngrams(template)
+        postings = [self.postings[ngram] for ngram in ngrams if ngram in self.postings]
+        max_postings_length = max(limit, self.max_df * len(self.templates))
+        overlaps = Counter()
+        for posting in postings:
+            if len(posting) <= max_postings_length:
+                overlaps.update(posting)
+        if len(overlaps) < limit:
+            # Too few templates share the selective n-grams, so fill the missing slots
+            # from the common ones. Only the heads of their postings are counted, which
+            # hold enough templates besides the counted ones, rather than all the templates.
+            head_length = limit + len(overlaps)
+            for posting in postings:
+                if len(posting) > max_postings_length:
+                    overlaps.update(posting[:head_length])
+        if not overlaps:
+            return self.templates[:limit]
+        top_overlaps = heapq.nlargest(
+            limit, overlaps.items(),
+            key=lambda item: (item[1] / (len(ngrams) + self.ngram_numbers[item[0]] - item[1]), -item[0])
+        )
+        return [self.templates[template_id] for template_id, _ in top_overlaps]
@@ -27,7 +27,7 @@ class Particle:
 
 class Pso:
     def __init__(self, func, dim, particle_nums, max_iteration, x_min, x_max, max_vel,
-                 c1=2, c2=2, w_max=1, w_min=0.1):
+                 c1=2, c2=2, w_max=1, w_min=0.1, init_positions=(), init_fitness=()):
         # hyper-parameters
         self.c1 = c1
         self.c2 = c2
@@ -49,7 +49,15 @@ class Pso:
         # initialize a particle list
         self.fitness_val_list = list()  # best fitness value from each iteration
         self.particles = list()
-        for _ in range(particle_nums):
+        # Seed the particles with the known positions and fitness, e.g., from the previous tuning.
+        for position, fitness in list(zip(init_positions, init_fitness))[:particle_nums]:
+            position = np.clip(np.array(position, dtype=float), x_min, x_max)
+            velocity = np.random.uniform(-max_vel, max_vel, dim)
+            self.particles.append(Particle(position, velocity, position, fitness))
+            if fitness < self.best_fitness:
+                self.best_fitness = fitness
+                self.best_position = position
+        for _ in range(particle_nums - len(self.particles)):
             position = np.random.uniform(x_min, x_max, dim)
             velocity = np.random.uniform(-max_vel, max_vel, dim)
             best_position = np.zeros((dim,))  # best position of particle
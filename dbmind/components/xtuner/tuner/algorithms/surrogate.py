@@ -0,0 +1,75 @@
+# Copyright (c) 2020 Huawei Technologies Co.,Ltd.
+#
+# openGauss is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#
+#          http://license.coscl.org.cn/MulanPSL2
+#
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+import logging
+
+import numpy as np
+
+
+class SurrogateScreener:
+    def __init__(self, observations=(), min_observations=10, quantile=0.9, kappa=1.0, max_consecutive_skips=4):
+        """
+        Screen candidate knob vectors by a Gaussian process regression model trained on
+        the observed rewards, so that only the promising vectors are benchmarked.
+        A vector is promising if the upper confidence bound of its predicted reward
+        reaches the given quantile of the observed rewards.
+
+        :param observations: Iterable of (normalized vector, reward).
+        :param min_observations: Do not screen until there are enough observations to train.
+        :param quantile: Float type. The quantile of the observed rewards that a promising vector reaches.
+        :param kappa: Float type. The weight of the standard deviation in the upper confidence bound.
+        :param max_consecutive_skips: Benchmark the vector anyway after skipping so many vectors,
+                                      which prevents the optimizer from being misled by the model.
+        """
+        self.vectors = [np.asarray(vector, dtype=float) for vector, _ in observations]
+        self.rewards = [float(reward) for _, reward in observations]
+        self.min_observations = min_observations
+        self.quantile = quantile
+        self.kappa = kappa
+        self.max_consecutive_skips = max_consecutive_skips
+        self.consecutive_skips = 0
+        self.skipped = 0
+        self._model = None
+
+    def add(self, vector, reward):
+        self.vectors.append(np.array(vector, dtype=float))
+        self.rewards.append(float(reward))
+        self._model = None
+
+    def _fit(self):
+        # Lazy loading. scikit-learn is only required by the optional tuning algorithms.
+        from sklearn.gaussian_process import GaussianProcessRegressor
+        from sklearn.gaussian_process.kernels import Matern
+
+        self._model = GaussianProcessRegressor(kernel=Matern(nu=2.5), alpha=1e-6, normalize_y=True)
+        self._model.fit(np.vstack(self.vectors), np.array(self.rewards))
+
+    def screen(self, vector):
+        """
+        :return: The predicted reward if the vector is not promising, otherwise None,
+                 which means the vector should be benchmarked.
+        """
+        if len(self.rewards) < self.min_observations or self.consecutive_skips >= self.max_consecutive_skips:
+            self.consecutive_skips = 0
+            return None
+
+        if self._model is None:
+            self._fit()
+        mean, std = self._model.predict(np.asarray(vector, dtype=float).reshape(1, -1), return_std=True)
+        if mean[0] + self.kappa * std[0] >= np.quantile(self.rewards, self.quantile):
+            self.consecutive_skips = 0
+            return None
+
+        self.consecutive_skips += 1
+        self.skipped += 1
+        logging.info('Skipped benchmarking %s, whose predicted reward is %f.', list(vector), mean[0])
+        return float(mean[0])
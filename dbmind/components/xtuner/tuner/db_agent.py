@@ -13,6 +13,8 @@
 
 import logging
 
+import psycopg2
+
 from .character import OpenGaussMetric
 from .exceptions import DBStatusError, SecurityError, ExecutionError, OptionError
 from dbmind.common.cmd_executor import ExecutorFactory
@@ -76,6 +78,7 @@ class DB_Agent:
             .set_port(ssh_port) \
             .get_executor()
 
+        self.host = host
         self.host_user = host_user
         self.db_user = host_user if not db_user else db_user
         self.db_user_pwd = db_user_pwd
@@ -84,8 +87,13 @@ class DB_Agent:
         self.data_path = None
         self.knobs = None
         self.ordered_knob_list = None
+        # The knob values that have been set by gs_guc, so unchanged knobs need not be set again.
+        self.applied_knob_values = dict()
+        # The long-lived database session. Statements are executed by gsql through SSH if it is None.
+        self.conn = None
 
         self.check_connection_params()
+        self.connect()
 
         # Set a connection session as unlimited.
         self.set_knob_value("statement_timeout", 0)
@@ -175,10 +183,53 @@ class DB_Agent:
             # The default value (knob.current) is the starting point while tuning. 
             if knob.current is None:
                 knob.current = knob.to_numeric(setting)
+            self.applied_knob_values[name] = knob.to_string(knob.to_numeric(setting))
+
+    def connect(self):
+        """
+        Try to connect to the database directly, so that statements are executed in one
+        long-lived session rather than by a new `gsql` process each time.
+        If the database cannot be reached, e.g., forbidden by pg_hba.conf, fall back to `gsql`.
+
+        :return: True means connected and vice versa.
+        """
+        self.close()
+        try:
+            self.conn = psycopg2.connect(host=self.host, port=self.db_port, user=self.db_user,
+                                         password=self.db_user_pwd, dbname=self.db_name,
+                                         connect_timeout=3, application_name='DBMind-xtuner')
+            self.conn.set_session(autocommit=True)
+            return True
+        except psycopg2.Error as e:
+            logging.info("Cannot connect to the database directly, hence use gsql instead. %s", e)
+            self.conn = None
+            return False
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except psycopg2.Error:
+                pass
+            self.conn = None
+
+    def _exec_statement_in_session(self, sql, timeout=None):
+        with self.conn.cursor() as cursor:
+            if timeout:
+                cursor.execute("SET statement_timeout = %d;" % (timeout * 1000))
+            try:
+                cursor.execute(sql)
+                rows = cursor.fetchall() if cursor.description else []
+            finally:
+                if timeout:
+                    cursor.execute("SET statement_timeout = 0;")
+        # Keep the same form as the text parsed from gsql.
+        return [tuple('' if value is None else str(value) for value in row) for row in rows]
 
     def exec_statement(self, sql, timeout=None):
         """
-        Connect to the remote database host through SSH,
+        Execute SQL statements in the long-lived session if connected.
+        Otherwise, connect to the remote database host through SSH,
         run the `gsql` command to execute SQL statements, and parse the execution result.
 
         p.s This is why we want users who log in to the Linux host
@@ -188,6 +239,23 @@ class DB_Agent:
         :param timeout: Int type. Unit second.
         :return: The parsed result from SQL statement execution.
         """
+        if self.conn is not None:
+            for retry in (True, False):
+                try:
+                    return self._exec_statement_in_session(sql, timeout)
+                except psycopg2.extensions.QueryCanceledError as e:
+                    # The statement timed out, which doesn't mean the session is broken.
+                    logging.error("Cannot execute SQL statement: %s. Error message: %s.", sql, e)
+                    raise ExecutionError("Cannot execute SQL statement: %s." % sql)
+                except (psycopg2.InterfaceError, psycopg2.OperationalError) as e:
+                    # The session is broken, e.g., the database restarted.
+                    if not (retry and self.connect()):
+                        logging.error("Cannot execute SQL statement: %s. Error message: %s.", sql, e)
+                        raise ExecutionError("Cannot execute SQL statement: %s." % sql)
+                except psycopg2.Error as e:
+                    logging.error("Cannot execute SQL statement: %s. Error message: %s.", sql, e)
+                    raise ExecutionError("Cannot execute SQL statement: %s." % sql)
+
         command = "gsql -p {db_port} -U {db_user} -d {db_name} -W {db_user_pwd} -c \"{sql}\";".format(
             db_port=self.db_port,
             db_user=self.db_user,
@@ -250,11 +318,8 @@ class DB_Agent:
         return stdout
 
     def get_knob_normalized_vector(self):
-        nv = list()
-        for name in self.ordered_knob_list:
-            val = self.get_knob_value(name)
-            nv.append(self.knobs[name].to_numeric(val))
-        return nv
+        values = self.get_knob_values(self.ordered_knob_list)
+        return [self.knobs[name].to_numeric(values[name]) for name in self.ordered_knob_list]
 
     def get_default_normalized_vector(self):
         """
@@ -268,29 +333,65 @@ class DB_Agent:
         return nv
 
     def set_knob_normalized_vector(self, nv):
-        restart = False
-        for i, val in enumerate(nv):
-            name = self.ordered_knob_list[i]
-            knob = self.knobs[name]
-            self.set_knob_value(name, knob.to_string(val))
-            restart = True if knob.restart else restart
-
-        if restart:
+        changed_values = dict()
+        for name, val in zip(self.ordered_knob_list, nv):
+            value = self.knobs[name].to_string(val)
+            if self.applied_knob_values.get(name) != value:
+                changed_values[name] = value
+        if not changed_values:
+            return
+
+        self.set_knob_values(changed_values)
+        # Only restart the database if a changed knob requires.
+        if any(self.knobs[name].restart for name in changed_values):
             self.restart()
 
     def get_knob_value(self, name):
-        check_special_character(name)
-        sql = "SELECT setting FROM pg_settings WHERE name = '{}';".format(name)
-        value = self.exec_statement(sql)[0][0]
-        return value
+        return self.get_knob_values([name])[name]
+
+    def get_knob_values(self, names):
+        """
+        Get the settings of several knobs by one query.
+
+        :param names: Iterable type. The names of the knobs.
+        :return: Dict type. The mapping from the knob name to its setting.
+        """
+        wherein_list = list()
+        for name in names:
+            check_special_character(name)
+            wherein_list.append("'%s'" % name)
+        if not wherein_list:
+            return dict()
+
+        sql = "SELECT name, setting FROM pg_settings WHERE name IN ({});".format(','.join(wherein_list))
+        return {name: setting for name, setting in self.exec_statement(sql)}
 
     def set_knob_value(self, name, value):
-        logging.info("change knob: [%s=%s]", name, value)
+        self.set_knob_values({name: value})
+
+    def set_knob_values(self, knob_values):
+        """
+        Set several knobs by one `gs_guc` invocation.
+
+        :param knob_values: Dict type. The mapping from the knob name to its value.
+        :return: True means the knobs were set successfully and vice versa.
+        """
+        if not knob_values:
+            return True
+
+        logging.info("change knobs: %s", ', '.join('[%s=%s]' % item for item in knob_values.items()))
+        options = ' '.join('-c "%s=%s"' % item for item in knob_values.items())
         try:
-            self.exec_command_on_host("gs_guc reload -c \"%s=%s\" -D %s" % (name, value, self.data_path))
+            self.exec_command_on_host("gs_guc reload %s -D %s" % (options, self.data_path))
         except ExecutionError as e:
             if str(e).find('Success to perform gs_guc!') < 0:
                 logging.warning(e)
+                # Set them again next time since it is unknown which knobs have been set.
+                for name in knob_values:
+                    self.applied_knob_values.pop(name, None)
+                return False
+        self.applied_knob_values.update(knob_values)
+        return True
 
     def reset_state(self):
         self.metric.reset()
@@ -301,6 +402,8 @@ class DB_Agent:
             self.exec_statement("checkpoint;")  # Prevent the database from being shut down for a long time.
         except ExecutionError:
             logging.warning("Cannot checkpoint perhaps due to bad GUC settings.")
+        session_connected = self.conn is not None
+        self.close()
         self.exec_command_on_host("gs_ctl stop -D {data_path}".format(data_path=self.data_path),
                                   ignore_status_code=True)
         self.exec_command_on_host("gs_ctl start -D {data_path}".format(data_path=self.data_path),
@@ -308,6 +411,8 @@ class DB_Agent:
 
         if self.is_alive():
             logging.info("The database restarted successfully.")
+            if session_connected:
+                self.connect()
         else:
             logging.fatal("The database restarted failed.")
             raise DBStatusError("The database restarted failed.")
@@ -106,6 +106,7 @@ class DB_Env(Env):
         return obs
 
     def close(self):
+        self.db.close()
         self.db.ssh.close()
 
     def perf(self, bm):
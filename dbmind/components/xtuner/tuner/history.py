@@ -0,0 +1,73 @@
+# Copyright (c) 2020 Huawei Technologies Co.,Ltd.
+#
+# openGauss is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#
+#          http://license.coscl.org.cn/MulanPSL2
+#
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+import json
+import logging
+import os
+
+
+class TuningHistory:
+    def __init__(self, filepath, context):
+        """
+        Persist the observation of each tuning step across tuning processes,
+        so that the following processes can start from the previous observations.
+        Each line of the file is a JSON record.
+
+        :param filepath: The file storing the history.
+        :param context: Dict type. Only the observations with the same context, e.g.,
+                        the same database and benchmark, are comparable.
+        """
+        self.filepath = filepath
+        self.context = context
+
+    def append(self, names, values, score, used_mem):
+        """
+        :values: A list contains each knob value. The knob value is str type, not denormalized numeric.
+        """
+        record = {'context': self.context, 'names': list(names), 'values': list(values),
+                  'score': score, 'used_mem': used_mem}
+        try:
+            with open(self.filepath, 'a') as fp:
+                fp.write(json.dumps(record) + '\n')
+        except OSError as e:
+            logging.warning('Cannot save the tuning history to %s: %s.', self.filepath, e)
+
+    def load(self, knobs, names):
+        """
+        Load the previous observations that contain all the given knobs.
+
+        :param knobs: RecommendedKnobs object, used to normalize the knob values.
+        :param names: The ordered knob names of the normalized vector.
+        :return: A list of (normalized vector, score, used_mem).
+        """
+        observations = list()
+        if not os.path.exists(self.filepath):
+            return observations
+
+        with open(self.filepath) as fp:
+            for line in fp:
+                try:
+                    record = json.loads(line)
+                    if record['context'] != self.context:
+                        continue
+                    values = dict(zip(record['names'], record['values']))
+                    if any(name not in values for name in names):
+                        continue
+                    vector = [knobs[name].to_numeric(values[name]) for name in names]
+                    score, used_mem = float(record['score']), float(record['used_mem'])
+                except (ValueError, TypeError, KeyError):
+                    continue
+                # The knob ranges may have changed since then.
+                if all(0 <= val <= 1 for val in vector):
+                    observations.append((vector, score, used_mem))
+        logging.info('Loaded %d observations from the tuning history %s.', len(observations), self.filepath)
+        return observations
@@ -181,6 +181,7 @@ def get_config(filepath):
     config['verbose'] = cp['Master'].getboolean('verbose', fallback=True)
     config['drop_cache'] = cp['Master'].getboolean('drop_cache', fallback=False)
     config['used_mem_penalty_term'] = cp['Master'].getfloat('used_mem_penalty_term')
+    config['history_file'] = cp['Master'].get('history_file', '').strip()
 
     # Section Benchmark:
     benchmarks = []
@@ -237,6 +238,8 @@ def get_config(filepath):
         config['max_iterations'] = cp['Gloabal Optimization Algorithm'].getint('max_iterations')
         config['particle_nums'] = cp['Gloabal Optimization Algorithm'].getint('particle_nums')
         check_positive_integer('max_iterations', 'particle_nums')
+        config['surrogate_screening'] = cp['Gloabal Optimization Algorithm'].getboolean('surrogate_screening',
+                                                                                        fallback=False)
 
     return config
 
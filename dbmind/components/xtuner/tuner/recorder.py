@@ -17,10 +17,12 @@ DELIMITER = ","
 
 
 class Recorder:
-    def __init__(self, filepath):
+    def __init__(self, filepath, history=None):
         """
         Record each tuning process and write it to a file.
+        If the TuningHistory object is given, append each tuning process to it as well.
         """
+        self.history = history
         self._fd = open(filepath, 'w', newline='')
         self.writer = csv.writer(self._fd, delimiter=DELIMITER,
                                  quotechar='\\', quoting=csv.QUOTE_MINIMAL)
@@ -61,6 +63,8 @@ class Recorder:
         record = (self.current_id,) + _values + (score, used_mem, reward, self.best_reward, self.best_id)
         self.writer.writerow(record)
         self._fd.flush()
+        if self.history is not None:
+            self.history.append(names, values, score, used_mem)
 
         self.current_id += 1
 
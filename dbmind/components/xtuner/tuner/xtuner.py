@@ -21,6 +21,7 @@ from .character import WORKLOAD_TYPE
 from .db_agent import new_db_agent
 from .db_env import DB_Env
 from .exceptions import ConfigureError
+from .history import TuningHistory
 from .knob import load_knobs_from_json_file
 from .recommend import recommend_knobs
 from .recorder import Recorder
@@ -114,7 +115,13 @@ def procedure_main(mode, db_info, config):
     if mode != 'recommend':
         prompt_restart_risks()  # Users need to be informed of risks.
 
-        recorder = Recorder(config['recorder_file'])
+        history = None
+        if config['history_file']:
+            history = TuningHistory(config['history_file'],
+                                    context={'host': db_info['host'], 'port': db_info['port'],
+                                             'db_name': db_info['db_name'],
+                                             'benchmark': config['benchmark_script']})
+        recorder = Recorder(config['recorder_file'], history)
         bm = benchmark.get_benchmark_instance(config['benchmark_script'],
                                               config['benchmark_path'],
                                               config['benchmark_cmd'],
@@ -132,13 +139,15 @@ def procedure_main(mode, db_info, config):
             # Run once the performance under the default knob configuration.
             # Its id is 0, aka the first one.
             original_knobs = db_agent.get_default_normalized_vector()
+            # Load the previous observations before this tuning process appends to the history.
+            observations = history.load(knobs, db_agent.ordered_knob_list) if history else []
             env.step(original_knobs)
 
             try:
                 if config['tune_strategy'] == 'rl':
                     rl_model('tune', env, config)
                 elif config['tune_strategy'] == 'gop':
-                    global_search(env, config)
+                    global_search(env, config, observations)
                 else:
                     raise ValueError('Incorrect tune strategy: %s.' % config['tune_strategy'])
 
@@ -196,8 +205,38 @@ def rl_model(mode, env, config):
         raise ValueError('Incorrect mode value: %s.' % mode)
 
 
-def global_search(env, config):
+def get_seeds(env, observations):
+    """Convert the observations (vector, score, used_mem) from the tuning history to
+    unique (vector, reward) pairs, ordered by reward descending."""
+    seeds = dict()
+    for vector, score, used_mem in observations:
+        seeds[tuple(vector)] = score - env.mem_penalty * used_mem
+    return sorted(seeds.items(), key=lambda item: item[1], reverse=True)
+
+
+def global_search(env, config, observations=()):
     method = config['gop_algorithm']
+    seeds = get_seeds(env, observations)
+    screener = None
+    if config['surrogate_screening']:
+        try:
+            from .algorithms.surrogate import SurrogateScreener
+            import sklearn  # The surrogate model depends on it.
+            screener = SurrogateScreener(seeds)
+        except ImportError:
+            logging.warning('Cannot screen knobs by the surrogate model since scikit-learn is not installed.')
+
+    def evaluate(action):
+        """Benchmark the knobs unless the surrogate model predicts they are not promising."""
+        if screener is not None:
+            predicted_reward = screener.screen(action)
+            if predicted_reward is not None:
+                return predicted_reward
+        s, r, d, _ = env.step(action)
+        if screener is not None:
+            screener.add(action, r)
+        return r
+
     if method == 'bayes':
         from bayes_opt import BayesianOptimization
 
@@ -210,22 +249,24 @@ def global_search(env, config):
                 index = env.db.ordered_knob_list.index(name)
                 action[index] = val
 
-            s, r, d, _ = env.step(action)
-            return r  # Wishes to maximize.
+            return evaluate(action)  # Wishes to maximize.
 
         optimizer = BayesianOptimization(
             f=performance_function,
             pbounds=pbound
         )
+        for vector, reward in seeds:
+            optimizer.register(params=dict(zip(env.db.ordered_knob_list, vector)), target=reward)
         optimizer.maximize(
+            # The observations from the tuning history take the place of random initial points.
+            init_points=max(0, 5 - len(seeds)),
             n_iter=config['max_iterations']
         )
     elif method == 'pso':
         from .algorithms.pso import Pso
 
         def performance_function(v):
-            s, r, d, _ = env.step(v)
-            return -r  # Use -reward because PSO wishes to minimize.
+            return -evaluate(v)  # Use -reward because PSO wishes to minimize.
 
         pso = Pso(
             func=performance_function,
@@ -234,8 +275,13 @@ def global_search(env, config):
             # max_iterations on the PSO indicates the maximum number of iterations per particle,
             # so it must be divided by the number of particles to be consistent with Bayes.
             max_iteration=config['max_iterations'] // config['particle_nums'],
-            x_min=0, x_max=1, max_vel=0.5
+            x_min=0, x_max=1, max_vel=0.5,
+            init_positions=[vector for vector, _ in seeds],
+            init_fitness=[-reward for _, reward in seeds]
         )
         pso.minimize()
     else:
         raise ValueError('Incorrect method value: %s.' % method)
+
+    if screener is not None:
+        logging.info('The surrogate model skipped benchmarking %d times.', screener.skipped)
@@ -27,6 +27,7 @@ METRIC_MAP_CONFIG = 'metric_map.conf'
 METRIC_VALUE_RANGE_CONFIG = "metric_value_range.conf"
 MUST_FILTER_LABEL_CONFIG = 'filter_label.conf'
 DYNAMIC_CONFIG = 'dynamic_config.db'
+SEQUENCE_BUFFER_DIRECTORY = 'sequence_buffer'
 DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
 with open(os.path.join(MISC_PATH, VERFILE_NAME)) as fp:
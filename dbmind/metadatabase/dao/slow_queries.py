@@ -22,7 +22,7 @@ import time
 
 from sqlalchemy import func
 from sqlalchemy.orm import load_only
-from sqlalchemy.sql import text, desc, and_
+from sqlalchemy.sql import text, desc, and_, or_
 
 from dbmind.common.parser import sql_parsing
 
@@ -30,7 +30,9 @@ from dbmind.metadatabase.ddl import truncate_table
 from ..result_db_session import get_session
 from ..schema import SlowQueries
 from ..schema import SlowQueriesJournal
+from ..schema import SlowQueriesJournalRollup
 from ..schema import SlowQueriesKilled
+from ..schema import SlowQueriesRollup
 
 
 def key_value_format(query):
@@ -55,35 +57,61 @@ def _recognize_query_type(query):
         return None  # e.g., the query stats with 'create' or comments.
 
 
+def _slow_query_columns(
+        instance, schema_name, db_name, query, hashcode1, hashcode2=None,
+        template_id=None, hit_rate=None, fetch_rate=None, plan_time=None,
+        parse_time=None, db_time=None, cpu_time=None, data_io_time=None,
+        root_cause=None, suggestion=None
+):
+    return dict(
+        instance=instance,
+        schema_name=schema_name,
+        db_name=db_name,
+        query=query,
+        query_type=_recognize_query_type(query),
+        involving_systable='PG_' in query.upper(),
+        template_id=template_id,
+        hashcode1=hashcode1,
+        hashcode2=hashcode2,
+        insert_at=int(time.time() * 1000),
+        hit_rate=hit_rate,
+        fetch_rate=fetch_rate,
+        cpu_time=cpu_time,
+        data_io_time=data_io_time,
+        plan_time=plan_time,
+        parse_time=parse_time,
+        db_time=db_time,
+        root_cause=root_cause,
+        suggestion=suggestion
+    )
+
+
+def _journal_columns(start_at, duration_time, instance, slow_query_id=None):
+    return dict(
+        slow_query_id=slow_query_id,
+        start_at=start_at,
+        round_start_at=int(start_at / 1000) * 1000,
+        duration_time=duration_time,
+        instance=instance
+    )
+
+
 def insert_slow_query(
         instance, schema_name, db_name, query, hashcode1, hashcode2=None,
         template_id=None, hit_rate=None, fetch_rate=None, plan_time=None,
         parse_time=None, db_time=None, cpu_time=None, data_io_time=None,
         root_cause=None, suggestion=None
 ):
-    query_type = _recognize_query_type(query)
     with get_session() as session:
         session.add(
             SlowQueries(
-                instance=instance,
-                schema_name=schema_name,
-                db_name=db_name,
-                query=query,
-                query_type=query_type,
-                involving_systable='PG_' in query.upper(),
-                template_id=template_id,
-                hashcode1=hashcode1,
-                hashcode2=hashcode2,
-                insert_at=int(time.time() * 1000),
-                hit_rate=hit_rate,
-                fetch_rate=fetch_rate,
-                cpu_time=cpu_time,
-                data_io_time=data_io_time,
-                plan_time=plan_time,
-                parse_time=parse_time,
-                db_time=db_time,
-                root_cause=root_cause,
-                suggestion=suggestion
+                **_slow_query_columns(
+                    instance, schema_name, db_name, query, hashcode1, hashcode2,
+                    template_id=template_id, hit_rate=hit_rate, fetch_rate=fetch_rate,
+                    plan_time=plan_time, parse_time=parse_time, db_time=db_time,
+                    cpu_time=cpu_time, data_io_time=data_io_time,
+                    root_cause=root_cause, suggestion=suggestion
+                )
             )
         )
 
@@ -92,15 +120,286 @@ def insert_slow_query_journal(slow_query_id, start_at, duration_time, instance):
     with get_session() as session:
         session.merge(
             SlowQueriesJournal(
-                slow_query_id=slow_query_id,
-                start_at=start_at,
-                round_start_at=int(start_at / 1000) * 1000,
-                duration_time=duration_time,
-                instance=instance
+                **_journal_columns(start_at, duration_time, instance, slow_query_id=slow_query_id)
             )
         )
 
 
+_IN_CLAUSE_BATCH_SIZE = 500
+ROLLUP_BUCKET = 3600 * 1000  # unit: ms
+_ROLLUP_KEY_COLUMNS = ('instance', 'bucket_at', 'db_name', 'schema_name',
+                       'template_id', 'query_type', 'involving_systable')
+_ROLLUP_MEAN_COLUMNS = ('cpu_time', 'data_io_time', 'fetch_rate', 'hit_rate')
+
+
+def _select_latest_slow_queries(session, hashcodes):
+    """Return the latest slow query for each pair of hash codes.
+    Only hashcode1 goes into the IN list, so this works on every backend,
+    and the pairs are matched after fetching."""
+    latest = {}
+    hashcode1_list = list({h1 for h1, _ in hashcodes})
+    for i in range(0, len(hashcode1_list), _IN_CLAUSE_BATCH_SIZE):
+        rows = session.query(
+            SlowQueries.slow_query_id, SlowQueries.hashcode1, SlowQueries.hashcode2,
+            SlowQueries.insert_at, SlowQueries.instance, SlowQueries.db_name,
+            SlowQueries.schema_name, SlowQueries.template_id, SlowQueries.query_type,
+            SlowQueries.involving_systable
+        ).filter(
+            SlowQueries.hashcode1.in_(hashcode1_list[i: i + _IN_CLAUSE_BATCH_SIZE])
+        )
+        for row in rows:
+            pair = (row.hashcode1, row.hashcode2)
+            if pair not in hashcodes:
+                continue
+            if pair not in latest or (row.insert_at, row.slow_query_id) > (latest[pair].insert_at,
+                                                                           latest[pair].slow_query_id):
+                latest[pair] = row
+    return latest
+
+
+def _rollup_key(slow_query):
+    # The instance is CHAR in tb_slow_queries, which may be padded.
+    return (slow_query['instance'].rstrip(),
+            slow_query['insert_at'] // ROLLUP_BUCKET * ROLLUP_BUCKET,
+            slow_query['db_name'], slow_query['schema_name'], slow_query['template_id'],
+            slow_query['query_type'], bool(slow_query['involving_systable']))
+
+
+def _accumulate_slow_query(deltas, slow_query, nb_journals=0):
+    delta = deltas.setdefault(_rollup_key(slow_query), {'nb_slow_queries': 0, 'nb_journals': 0})
+    delta['nb_slow_queries'] += 1
+    delta['nb_journals'] += nb_journals
+    for column in _ROLLUP_MEAN_COLUMNS:
+        if slow_query[column] is not None:
+            delta['sum_' + column] = delta.get('sum_' + column, 0) + slow_query[column]
+            delta['nb_' + column] = delta.get('nb_' + column, 0) + 1
+    if slow_query['insert_at'] >= delta.get('last_insert_at', -1):
+        delta['last_insert_at'] = slow_query['insert_at']
+        delta['last_query'] = slow_query['query']
+
+
+def _update_rollups(session, deltas, journal_deltas):
+    """Add the counters of deltas to tb_slow_queries_rollup and
+    tb_slow_queries_journal_rollup within the given session.
+
+    The counters are increased by `UPDATE ... SET nb_x = nb_x + delta`, so concurrent
+    sessions don't lose increments, and only the missing rows are inserted. If two sessions
+    insert the same missing row, the summary still adds both of them up."""
+    for key, delta in deltas.items():
+        conditions = [getattr(SlowQueriesRollup, column) == value
+                      for column, value in zip(_ROLLUP_KEY_COLUMNS, key)]
+        counters = {name: value for name, value in delta.items() if name not in ('last_insert_at', 'last_query')}
+        updated = session.query(SlowQueriesRollup).filter(*conditions).update(
+            {getattr(SlowQueriesRollup, name): getattr(SlowQueriesRollup, name) + value
+             for name, value in counters.items()},
+            synchronize_session=False
+        )
+        if not updated:
+            session.add(SlowQueriesRollup(
+                **dict(zip(_ROLLUP_KEY_COLUMNS, key)),
+                **{prefix + column: counters.get(prefix + column, 0)
+                   for column in _ROLLUP_MEAN_COLUMNS for prefix in ('sum_', 'nb_')},
+                nb_slow_queries=counters['nb_slow_queries'], nb_journals=counters['nb_journals'],
+                last_insert_at=delta.get('last_insert_at'), last_query=delta.get('last_query')
+            ))
+        elif 'last_insert_at' in delta:
+            session.query(SlowQueriesRollup).filter(
+                *conditions,
+                or_(SlowQueriesRollup.last_insert_at.is_(None),
+                    SlowQueriesRollup.last_insert_at <= delta['last_insert_at'])
+            ).update({SlowQueriesRollup.last_insert_at: delta['last_insert_at'],
+                      SlowQueriesRollup.last_query: delta['last_query']},
+                     synchronize_session=False)
+
+    for (instance, round_start_at), nb_journals in journal_deltas.items():
+        updated = session.query(SlowQueriesJournalRollup).filter(
+            SlowQueriesJournalRollup.instance == instance,
+            SlowQueriesJournalRollup.round_start_at == round_start_at
+        ).update({SlowQueriesJournalRollup.nb_journals: SlowQueriesJournalRollup.nb_journals + nb_journals},
+                 synchronize_session=False)
+        if not updated:
+            session.add(SlowQueriesJournalRollup(instance=instance, round_start_at=round_start_at,
+                                                 nb_journals=nb_journals))
+
+
+def insert_slow_queries_with_journals(records):
+    """Save a batch of slow queries and their journals in one transaction,
+    and update the rollup tables in the same transaction.
+
+    :param records: a sequence of (slow_query, journal, replicated), where slow_query is the keyword arguments
+        of `insert_slow_query()` and journal is the keyword arguments of `insert_slow_query_journal()`
+        without slow_query_id. A slow query is inserted if it is not replicated or if there is no
+        slow query with the same hash codes yet, once per hash codes in the batch.
+        Each journal refers to the latest slow query with the same hash codes.
+    """
+    if not records:
+        return
+    to_insert = {}
+    for slow_query, _, replicated in records:
+        if not replicated:
+            to_insert[(slow_query['hashcode1'], slow_query.get('hashcode2'))] = slow_query
+
+    with get_session() as session:
+        hashcodes = {(slow_query['hashcode1'], slow_query.get('hashcode2')) for slow_query, _, _ in records}
+        slow_queries = _select_latest_slow_queries(session, hashcodes - set(to_insert))
+        for slow_query, _, _ in records:
+            pair = (slow_query['hashcode1'], slow_query.get('hashcode2'))
+            if pair not in slow_queries and pair not in to_insert:
+                to_insert[pair] = slow_query
+
+        deltas = {}
+        if to_insert:
+            new_slow_queries = [_slow_query_columns(**slow_query) for slow_query in to_insert.values()]
+            session.execute(SlowQueries.__table__.insert(), new_slow_queries)
+            for slow_query in new_slow_queries:
+                _accumulate_slow_query(deltas, slow_query)
+            slow_queries.update(_select_latest_slow_queries(session, set(to_insert)))
+
+        journals = []
+        journal_deltas = {}
+        for slow_query, journal, _ in records:
+            slow_query = slow_queries[(slow_query['hashcode1'], slow_query.get('hashcode2'))]
+            journal = _journal_columns(slow_query_id=slow_query.slow_query_id, **journal)
+            journals.append(journal)
+            delta = deltas.setdefault(_rollup_key(slow_query._mapping), {'nb_slow_queries': 0, 'nb_journals': 0})
+            delta['nb_journals'] += 1
+            journal_key = (journal['instance'], journal['round_start_at'])
+            journal_deltas[journal_key] = journal_deltas.get(journal_key, 0) + 1
+        session.execute(SlowQueriesJournal.__table__.insert(), journals)
+        _update_rollups(session, deltas, journal_deltas)
+
+
+def rebuild_slow_queries_rollups():
+    """Recalculate the rollup tables from tb_slow_queries and tb_slow_queries_journal,
+    e.g., after upgrading from the version without the rollup tables."""
+    truncate_table(SlowQueriesRollup.__tablename__)
+    truncate_table(SlowQueriesJournalRollup.__tablename__)
+    with get_session() as session:
+        nb_journals = key_value_format(
+            session.query(SlowQueriesJournal.slow_query_id, func.count(1)).group_by(SlowQueriesJournal.slow_query_id)
+        )
+        deltas = {}
+        for row in session.query(
+                SlowQueries.slow_query_id, SlowQueries.instance, SlowQueries.insert_at, SlowQueries.db_name,
+                SlowQueries.schema_name, SlowQueries.template_id, SlowQueries.query_type,
+                SlowQueries.involving_systable, SlowQueries.query, SlowQueries.cpu_time,
+                SlowQueries.data_io_time, SlowQueries.fetch_rate, SlowQueries.hit_rate
+        ).yield_per(1000):
+            _accumulate_slow_query(deltas, row._mapping, nb_journals.get(row.slow_query_id, 0))
+        journal_deltas = {
+            (instance, round_start_at): count for instance, round_start_at, count in session.query(
+                SlowQueriesJournal.instance, SlowQueriesJournal.round_start_at, func.count(1)
+            ).group_by(SlowQueriesJournal.instance, SlowQueriesJournal.round_start_at)
+        }
+        _update_rollups(session, deltas, journal_deltas)
+
+
+def init_slow_queries_rollups():
+    """Create the rollup tables if they are missing, e.g., the service is upgraded
+    without running the setup again, and rebuild them if they are empty.
+    Return whether the rollup tables are rebuilt."""
+    with get_session() as session:
+        for model in (SlowQueriesRollup, SlowQueriesJournalRollup):
+            model.__table__.create(session.connection(), checkfirst=True)
+        rebuilding = (session.query(SlowQueriesRollup.bucket_at).first() is None
+                      and session.query(SlowQueries.slow_query_id).first() is not None)
+    if rebuilding:
+        rebuild_slow_queries_rollups()
+    return rebuilding
+
+
+def _filter_instance(query, column, instance):
+    if instance is None:
+        return query
+    if type(instance) in (tuple, list):
+        return query.filter(column.in_(instance))
+    return query.filter(column == instance)
+
+
+def summarize_slow_queries(instance=None):
+    """Summarize the slow queries from the rollup tables.
+    The returned values are the same as `count_slow_queries()`, `group_by_dbname()`,
+    `count_systable()`, `slow_query_trend()`, `mean_cpu_time()`, `slow_query_template()`, etc."""
+    summary = {
+        'nb_unique_slow_queries': 0,
+        'main_slow_queries': 0,
+        'statistics_for_database': {},
+        'statistics_for_schema': {},
+        'systable': {'system_table': 0, 'business_table': 0},
+        'distribution': {'select': 0, 'delete': 0, 'insert': 0, 'update': 0},
+    }
+    sums = {column: 0 for column in _ROLLUP_MEAN_COLUMNS}
+    counts = {column: 0 for column in _ROLLUP_MEAN_COLUMNS}
+    templates = {}
+    query_types = {'s': 'select', 'd': 'delete', 'i': 'insert', 'u': 'update'}
+    with get_session() as session:
+        rows = _filter_instance(session.query(
+            SlowQueriesRollup.db_name, SlowQueriesRollup.schema_name, SlowQueriesRollup.template_id,
+            SlowQueriesRollup.query_type, SlowQueriesRollup.involving_systable,
+            func.sum(SlowQueriesRollup.nb_slow_queries).label('nb_slow_queries'),
+            func.sum(SlowQueriesRollup.nb_journals).label('nb_journals'),
+            *(func.sum(getattr(SlowQueriesRollup, prefix + column)).label(prefix + column)
+              for column in _ROLLUP_MEAN_COLUMNS for prefix in ('sum_', 'nb_'))
+        ), SlowQueriesRollup.instance, instance).group_by(
+            SlowQueriesRollup.db_name, SlowQueriesRollup.schema_name, SlowQueriesRollup.template_id,
+            SlowQueriesRollup.query_type, SlowQueriesRollup.involving_systable
+        )
+        for row in rows:
+            # Some backends return the sum of integers as Decimal.
+            nb_slow_queries = int(row.nb_slow_queries)
+            if nb_slow_queries == 0:
+                continue
+            summary['nb_unique_slow_queries'] += int(row.nb_journals)
+            summary['main_slow_queries'] += nb_slow_queries
+            statistics = summary['statistics_for_database']
+            statistics[row.db_name] = statistics.get(row.db_name, 0) + nb_slow_queries
+            statistics = summary['statistics_for_schema']
+            statistics[row.schema_name] = statistics.get(row.schema_name, 0) + nb_slow_queries
+            summary['systable']['system_table' if row.involving_systable else 'business_table'] += nb_slow_queries
+            if row.query_type in query_types:
+                summary['distribution'][query_types[row.query_type]] += nb_slow_queries
+            for column in _ROLLUP_MEAN_COLUMNS:
+                sums[column] += float(getattr(row, 'sum_' + column))
+                counts[column] += int(getattr(row, 'nb_' + column))
+            if row.template_id is not None:
+                templates[row.template_id] = templates.get(row.template_id, 0) + nb_slow_queries
+
+        trend = _filter_instance(session.query(
+            SlowQueriesJournalRollup.round_start_at, func.sum(SlowQueriesJournalRollup.nb_journals)
+        ), SlowQueriesJournalRollup.instance, instance).group_by(
+            SlowQueriesJournalRollup.round_start_at
+        ).order_by(SlowQueriesJournalRollup.round_start_at).limit(100).all()
+        summary['slow_query_count'] = {
+            'timestamps': [round_start_at for round_start_at, _ in trend],
+            'values': [int(count) for _, count in trend]
+        }
+
+        top_templates = sorted(templates.items(), key=lambda item: item[1], reverse=True)[:50]
+        last_queries = {}
+        if top_templates:
+            for template_id, last_insert_at, last_query in session.query(
+                    SlowQueriesRollup.template_id, SlowQueriesRollup.last_insert_at, SlowQueriesRollup.last_query
+            ).filter(
+                SlowQueriesRollup.template_id.in_([template_id for template_id, _ in top_templates]),
+                SlowQueriesRollup.nb_slow_queries > 0
+            ):
+                if template_id not in last_queries or last_insert_at > last_queries[template_id][0]:
+                    last_queries[template_id] = (last_insert_at, last_query)
+        summary['slow_query_template'] = [
+            (template_id, count, last_queries[template_id][1])
+            for template_id, count in top_templates if template_id in last_queries
+        ]
+
+    def mean(column):
+        return sums[column] / counts[column] if counts[column] else None
+
+    summary['mean_cpu_time'] = -1 if mean('cpu_time') is None else mean('cpu_time') / 1000 / 1000
+    summary['mean_io_time'] = -1 if mean('data_io_time') is None else mean('data_io_time') / 1000 / 1000
+    summary['mean_fetch_rate'] = -1 if mean('fetch_rate') is None else mean('fetch_rate') * 100
+    summary['mean_buffer_hit_rate'] = -1 if mean('hit_rate') is None else mean('hit_rate') * 100
+    return summary
+
+
 def select_slow_query_id_by_hashcode(hashcode1, hashcode2):
     with get_session() as session:
         result = session.query(SlowQueries.slow_query_id).filter(
@@ -370,7 +669,12 @@ def mean_buffer_hit_rate(instance=None):
 
 
 def delete_slow_queries(retention_start_time):
-    """To prevent the table from over-expanding."""
+    """To prevent the table from over-expanding.
+
+    The rollup tables only drop the buckets that have expired entirely, so the summary
+    still counts the deleted slow queries of the bucket containing `retention_start_time`
+    until the bucket expires, i.e., the retention of the summary is rounded up to
+    `ROLLUP_BUCKET`."""
     with get_session() as session:
         session.query(SlowQueries).filter(
             SlowQueries.insert_at <= retention_start_time
@@ -378,11 +682,20 @@ def delete_slow_queries(retention_start_time):
         session.query(SlowQueriesJournal).filter(
             SlowQueriesJournal.start_at <= retention_start_time
         )
+        # Only the buckets that have expired entirely.
+        session.query(SlowQueriesRollup).filter(
+            SlowQueriesRollup.bucket_at + ROLLUP_BUCKET <= retention_start_time
+        ).delete()
+        session.query(SlowQueriesJournalRollup).filter(
+            SlowQueriesJournalRollup.round_start_at <= retention_start_time
+        ).delete()
 
 
 def truncate_slow_queries():
     truncate_table(SlowQueries.__tablename__)
     truncate_table(SlowQueriesJournal.__tablename__)
+    truncate_table(SlowQueriesRollup.__tablename__)
+    truncate_table(SlowQueriesJournalRollup.__tablename__)
 
 
 def slow_query_template(instance=None):
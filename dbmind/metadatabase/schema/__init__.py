@@ -23,7 +23,9 @@ from .knob_recomm_metric_snapshot import KnobRecommendationMetricSnapshot
 from .knob_recomm_warnings import KnobRecommendationWarnings
 from .slow_queries import SlowQueries
 from .slow_queries_journal import SlowQueriesJournal
+from .slow_queries_journal_rollup import SlowQueriesJournalRollup
 from .slow_queries_killed import SlowQueriesKilled
+from .slow_queries_rollup import SlowQueriesRollup
 from .regular_inspections import RegularInspection
 
 
@@ -0,0 +1,27 @@
+# Copyright (c) 2020 Huawei Technologies Co.,Ltd.
+#
+# openGauss is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#
+#          http://license.coscl.org.cn/MulanPSL2
+#
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+from sqlalchemy import Column, BigInteger, Integer, Index, String
+
+from .. import ResultDbBase
+
+
+class SlowQueriesJournalRollup(ResultDbBase):
+    """The number of tb_slow_queries_journal rows for each round_start_at."""
+    __tablename__ = "tb_slow_queries_journal_rollup"
+
+    rollup_id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    instance = Column(String, nullable=False)
+    round_start_at = Column(BigInteger, nullable=False)
+    nb_journals = Column(BigInteger, nullable=False, default=0)
+
+    idx_slow_queries_journal_rollup = Index("idx_slow_queries_journal_rollup", instance, round_start_at)
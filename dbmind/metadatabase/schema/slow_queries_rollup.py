@@ -0,0 +1,50 @@
+# Copyright (c) 2020 Huawei Technologies Co.,Ltd.
+#
+# openGauss is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#
+#          http://license.coscl.org.cn/MulanPSL2
+#
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+from sqlalchemy import Column, String, BigInteger, Integer, Float, Index, TEXT, CHAR, Boolean
+
+from .. import ResultDbBase
+
+
+class SlowQueriesRollup(ResultDbBase):
+    """Counters of tb_slow_queries and tb_slow_queries_journal, which are
+    maintained incrementally while saving slow queries, so the summary of
+    slow queries doesn't need to scan the whole tables."""
+    __tablename__ = "tb_slow_queries_rollup"
+
+    rollup_id = Column(
+        BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True
+    )
+    instance = Column(String, nullable=False)
+    # Refer to tb_slow_queries.insert_at, rounded down to the bucket.
+    bucket_at = Column(BigInteger, nullable=False)
+    db_name = Column(String(64), nullable=False)
+    schema_name = Column(String(64), nullable=False)
+    template_id = Column(BigInteger)
+    query_type = Column(CHAR(1), nullable=True)
+    involving_systable = Column(Boolean, nullable=False)
+    nb_slow_queries = Column(BigInteger, nullable=False, default=0)
+    # The number of journals that refer to the above slow queries.
+    nb_journals = Column(BigInteger, nullable=False, default=0)
+    # Sums and counts of the non-null values, used to calculate the means.
+    sum_cpu_time = Column(Float, nullable=False, default=0)
+    nb_cpu_time = Column(BigInteger, nullable=False, default=0)
+    sum_data_io_time = Column(Float, nullable=False, default=0)
+    nb_data_io_time = Column(BigInteger, nullable=False, default=0)
+    sum_fetch_rate = Column(Float, nullable=False, default=0)
+    nb_fetch_rate = Column(BigInteger, nullable=False, default=0)
+    sum_hit_rate = Column(Float, nullable=False, default=0)
+    nb_hit_rate = Column(BigInteger, nullable=False, default=0)
+    last_query = Column(TEXT)
+    last_insert_at = Column(BigInteger)
+
+    idx_slow_queries_rollup = Index("idx_slow_queries_rollup", instance, bucket_at)
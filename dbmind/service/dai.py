@@ -18,6 +18,8 @@
     - The data has been preprocessed here.
 """
 import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta, datetime
 import time
 
@@ -249,6 +251,66 @@ def get_latest_metric_value(metric_name):
     return LazyFetcher(metric_name)
 
 
+def get_metric_sequences_of_servers(metric_name, start_time, end_time, servers, **labels_like):
+    """Fetch the sequences of a metric from a batch of servers by
+    only one regex query rather than one query for each server.
+
+    :return: a dict, the key is the server and the value is the list
+     of sequences coming from the server.
+    """
+    servers = set(server for server in servers if server)
+    rv = defaultdict(list)
+    if not servers:
+        return rv
+
+    fetcher = get_metric_sequence(metric_name, start_time, end_time).from_server_like(
+        '|'.join(sorted(servers))
+    )
+    if labels_like:
+        fetcher.filter_like(**labels_like)
+    # The regex may match more servers than expected, e.g.,
+    # the dot of an IP address, so filter again.
+    label_name = _get_data_source_flag(fetcher.metric_name)
+    for sequence in fetcher.fetchall():
+        server = sequence.labels.get(label_name)
+        if server in servers:
+            rv[server].append(sequence)
+    return rv
+
+
+def fetch_joined_sequences(fetchers, on=()):
+    """Fetch the sequences of several metrics concurrently by only one query
+    for each fetcher, and join them on labels in memory rather than querying
+    the other metrics once for each sequence of the first metric.
+
+    :param fetchers: a list of LazyFetcher, e.g., get_metric_sequence(...).from_server(...).
+    :param on: the label names to join on, or a function that maps a sequence to the key.
+    :return: a dict in the order of the first appearance of keys, the key is the joined key
+     and the value is a tuple containing the list of sequences from each fetcher.
+    """
+    if not fetchers:
+        return {}
+    if len(fetchers) == 1:
+        results = [fetchers[0].fetchall()]
+    else:
+        with ThreadPoolExecutor(max_workers=len(fetchers)) as executor:
+            results = list(executor.map(lambda fetcher: fetcher.fetchall(), fetchers))
+
+    if callable(on):
+        get_key = on
+    else:
+        def get_key(sequence):
+            return tuple(sequence.labels.get(label) for label in on)
+    rv = {}
+    for i, sequences in enumerate(results):
+        for sequence in sequences or ():
+            key = get_key(sequence)
+            if key not in rv:
+                rv[key] = tuple([] for _ in fetchers)
+            rv[key][i].append(sequence)
+    return rv
+
+
 def save_history_alarms(history_alarms, detection_interval):
     if not history_alarms:
         return
@@ -323,15 +385,15 @@ def save_healing_record(record):
 
 
 def save_slow_queries(slow_queries):
+    records = []
     for slow_query in slow_queries:
         if slow_query is None:
             continue
 
         h1, h2 = slow_query.hash_query()
         instance = '%s:%s' % (slow_query.db_host, slow_query.db_port)
-
-        def insert():
-            dao.slow_queries.insert_slow_query(
+        records.append((
+            dict(
                 instance=instance,
                 schema_name=slow_query.schema_name,
                 db_name=slow_query.db_name,
@@ -343,26 +405,15 @@ def save_slow_queries(slow_queries):
                 db_time=slow_query.db_time, parse_time=slow_query.parse_time,
                 plan_time=slow_query.plan_time, root_cause=slow_query.root_causes,
                 suggestion=slow_query.suggestions, template_id=slow_query.template_id
-            )
-
-        if not slow_query.replicated:
-            insert()
-        query_id_result = dao.slow_queries.select_slow_query_id_by_hashcode(
-            hashcode1=h1, hashcode2=h2
-        ).all()
-        if len(query_id_result) == 0:
-            insert()
-            query_id_result = dao.slow_queries.select_slow_query_id_by_hashcode(
-                hashcode1=h1, hashcode2=h2
-            ).all()
-
-        slow_query_id = query_id_result[0][0]
-        dao.slow_queries.insert_slow_query_journal(
-            slow_query_id=slow_query_id,
-            start_at=slow_query.start_time,
-            duration_time=slow_query.duration_time,
-            instance=instance
-        )
+            ),
+            dict(
+                start_at=slow_query.start_time,
+                duration_time=slow_query.duration_time,
+                instance=instance
+            ),
+            slow_query.replicated
+        ))
+    dao.slow_queries.insert_slow_queries_with_journals(records)
 
 
 def delete_older_result(current_timestamp, retention_time):
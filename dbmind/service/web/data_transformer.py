@@ -19,6 +19,7 @@ import logging
 import math
 import os
 import sys
+import threading
 import time
 import json
 from collections import defaultdict, Counter
@@ -31,7 +32,7 @@ from dbmind.app.monitoring import ad_pool_manager, regular_inspection
 from dbmind.app.optimization import get_database_schemas, TemplateArgs
 from dbmind.app.optimization.index_recommendation import rpc_index_advise, is_rpc_available
 from dbmind.app.optimization.index_recommendation_rpc_executor import RpcExecutor
-from dbmind.common.algorithm.forecasting import quickly_forecast
+from dbmind.common.algorithm.forecasting import quickly_forecast_many
 from dbmind.common.types import ALARM_TYPES, ALARM_LEVEL
 from dbmind.common.types import Sequence
 from dbmind.components.extract_log import get_workload_template
@@ -39,9 +40,9 @@ from dbmind.components.slow_query_diagnosis import analyze_slow_query_with_rpc,
 from dbmind.components.sql_rewriter.sql_rewriter import rewrite_sql_api
 from dbmind.metadatabase import dao
 from dbmind.common.tsdb import TsdbClientFactory
-from dbmind.components.anomaly_analysis import get_sequences, get_correlations
+from dbmind.components.anomaly_analysis import get_sequences, get_top_correlations
 from dbmind.components.memory_check import memory_check
-from dbmind.common.utils import string_to_dict, cast_to_int_or_float
+from dbmind.common.utils import string_to_dict, cast_to_int_or_float, TTLOrderedDict
 from dbmind.common.dispatcher import TimedTaskManager
 from dbmind.components.forecast import early_warning
 from dbmind.service import dai
@@ -233,10 +234,11 @@ def get_metric_forecast_sequence(metric_name, from_timestamp=None, to_timestamp=
         lower, upper = 0, float("inf")
     # Sorted by labels to bring into correspondence with get_metric_sequence().
     sequences.sort(key=lambda _s: str(_s.labels))
-    future_sequences = global_vars.worker.parallel_execute(
-        quickly_forecast, ((sequence, forecast_minutes, lower, upper)
-                           for sequence in sequences)
-    ) or []
+    future_sequences, elapsed_seconds = quickly_forecast_many(
+        sequences, forecast_minutes, lower, upper, executor=global_vars.worker
+    )
+    for sequence, seconds in zip(sequences, elapsed_seconds):
+        logging.debug('Forecasting %s%s took %.3f seconds.', sequence.name, sequence.labels, seconds)
 
     # pop invalid sequences
     i = 0
@@ -896,6 +898,27 @@ def get_killed_slow_queries_count(instance=None, query=None, start_time=None, en
         query=query, start_time=start_time, end_time=end_time)
 
 
+# Several viewers of the dashboard share the summary in a short time.
+SLOW_QUERY_SUMMARY_TTL = 30  # unit: second
+_slow_query_summary_cache = TTLOrderedDict(SLOW_QUERY_SUMMARY_TTL)
+_slow_query_summary_lock = threading.Lock()
+
+
+def _summarize_slow_queries(instance):
+    key = tuple(instance) if type(instance) in (tuple, list) else instance
+    try:
+        return _slow_query_summary_cache[key]
+    except KeyError:
+        pass
+    with _slow_query_summary_lock:
+        try:
+            return _slow_query_summary_cache[key]
+        except KeyError:
+            summary = dao.slow_queries.summarize_slow_queries(instance=instance)
+            _slow_query_summary_cache[key] = summary
+            return summary
+
+
 def get_slow_query_summary(pagesize=None, current=None):
     # Maybe multiple nodes, but we don't need to care.
     # Because that is an abnormal scenario.
@@ -907,34 +930,22 @@ def get_slow_query_summary(pagesize=None, current=None):
         threshold = sequence.values[-1]
     else:
         threshold = 'Nan'
+    summary = _summarize_slow_queries(get_access_context(ACCESS_CONTEXT_NAME.AGENT_INSTANCE_IP_WITH_PORT))
     return {
-        'nb_unique_slow_queries': dao.slow_queries.count_slow_queries(
-            instance=get_access_context(ACCESS_CONTEXT_NAME.AGENT_INSTANCE_IP_WITH_PORT)),
+        'nb_unique_slow_queries': summary['nb_unique_slow_queries'],
         'slow_query_threshold': threshold,
-        'main_slow_queries': dao.slow_queries.count_slow_queries(distinct=True, instance=get_access_context(
-            ACCESS_CONTEXT_NAME.AGENT_INSTANCE_IP_WITH_PORT)),
-        'statistics_for_database': dao.slow_queries.group_by_dbname(
-            instance=get_access_context(ACCESS_CONTEXT_NAME.AGENT_INSTANCE_IP_WITH_PORT)),
-        'statistics_for_schema': dao.slow_queries.group_by_schema(
-            instance=get_access_context(ACCESS_CONTEXT_NAME.AGENT_INSTANCE_IP_WITH_PORT)),
-        'systable': dao.slow_queries.count_systable(
-            instance=get_access_context(ACCESS_CONTEXT_NAME.AGENT_INSTANCE_IP_WITH_PORT)),
-        'slow_query_count': dao.slow_queries.slow_query_trend(
-            instance=get_access_context(ACCESS_CONTEXT_NAME.AGENT_INSTANCE_IP_WITH_PORT)),
-        'distribution': dao.slow_queries.slow_query_distribution(
-            instance=get_access_context(ACCESS_CONTEXT_NAME.AGENT_INSTANCE_IP_WITH_PORT)),
-        'mean_cpu_time': dao.slow_queries.mean_cpu_time(
-            instance=get_access_context(ACCESS_CONTEXT_NAME.AGENT_INSTANCE_IP_WITH_PORT)),
-        'mean_io_time': dao.slow_queries.mean_io_time(
-            instance=get_access_context(ACCESS_CONTEXT_NAME.AGENT_INSTANCE_IP_WITH_PORT)),
-        'mean_buffer_hit_rate': dao.slow_queries.mean_buffer_hit_rate(
-            instance=get_access_context(ACCESS_CONTEXT_NAME.AGENT_INSTANCE_IP_WITH_PORT)),
-        'mean_fetch_rate': dao.slow_queries.mean_fetch_rate(
-            instance=get_access_context(ACCESS_CONTEXT_NAME.AGENT_INSTANCE_IP_WITH_PORT)),
+        'main_slow_queries': summary['main_slow_queries'],
+        'statistics_for_database': summary['statistics_for_database'],
+        'statistics_for_schema': summary['statistics_for_schema'],
+        'systable': summary['systable'],
+        'slow_query_count': summary['slow_query_count'],
+        'distribution': summary['distribution'],
+        'mean_cpu_time': summary['mean_cpu_time'],
+        'mean_io_time': summary['mean_io_time'],
+        'mean_buffer_hit_rate': summary['mean_buffer_hit_rate'],
+        'mean_fetch_rate': summary['mean_fetch_rate'],
         'slow_query_template': sqlalchemy_query_jsonify(
-            dao.slow_queries.slow_query_template(
-                instance=get_access_context(ACCESS_CONTEXT_NAME.AGENT_INSTANCE_IP_WITH_PORT)),
-            ['template_id', 'count', 'query']),
+            summary['slow_query_template'], ['template_id', 'count', 'query']),
         'table_of_slow_query': get_slow_queries(pagesize, current)
     }
 
@@ -1245,17 +1256,9 @@ def get_correlation_result(metric_name, instance, start_time, end_time, topk=10,
 
     correlation_results = dict()
     this_name = metric_name + " from " + instance
-    correlation_args = list()
-    for sequences in sequence_results:
-        for name, sequence in sequences:
-            correlation_args.append(((name, sequence, this_sequence),))
-
-    correlation_results[this_name] = global_vars.worker.parallel_execute(
-        get_correlations, correlation_args
-    ) or []
-
-    correlation_results[this_name].sort(key=lambda item: item[1], reverse=True)
-    del (correlation_results[this_name][topk:])
+    named_sequences = [(name, sequence) for sequences in sequence_results if sequences
+                       for name, sequence in sequences]
+    correlation_results[this_name] = get_top_correlations(this_sequence, named_sequences, topk=topk)
 
     return correlation_results
 
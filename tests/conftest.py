@@ -105,7 +105,7 @@ def mock_get_current_metric_value(metric_name, label_config=None, *args, **kwarg
     return [s]
 
 
-def mock_get_metric_sequence(metric_name, start_time, end_time):
+def mock_get_metric_sequence(metric_name, start_time, end_time, step=None):
     from dbmind.service import dai
 
     class MockFetcher(dai.LazyFetcher):
@@ -141,7 +141,7 @@ def mock_get_metric_sequence(metric_name, start_time, end_time):
                 rv.append(s)
             return rv
 
-    return MockFetcher(metric_name, start_time, end_time)
+    return MockFetcher(metric_name, start_time, end_time, step)
 
 
 def mock_get_latest_metric_sequence(metric_name, minutes):
@@ -15,11 +15,13 @@ import warnings
 
 import numpy as np
 
+from dbmind.common.algorithm.forecasting.arima_model import arima_alg
 from dbmind.common.algorithm.forecasting.forecasting_algorithm import quickly_forecast, \
-    sequence_interpolate
+    quickly_forecast_many, sequence_interpolate
 from dbmind.common.algorithm.stat_utils import trim_head_and_tail_nan
 from dbmind.common.types.sequence import Sequence
-from dbmind.common.algorithm.seasonal import is_seasonal_series
+from dbmind.common.algorithm.seasonal import is_seasonal_series, is_seasonal_series_2d, \
+    seasonal_decompose, seasonal_decompose_2d
 
 DATA = [13313.158424272488, 13325.379505621688, 13334.55192625661, 13340.650475363756, 13343.772205687826,
         13344.39494047619, 13344.166964285712, 13344.142559523809, 13343.943303571428, 13343.560714285712,
@@ -5078,6 +5080,40 @@ def test_arima_for_seasonal():
     assert mse(seasonal_data[train_length: train_length + forecast_length], forecast_sequence.values) <= 0.15
 
 
+def test_arima_order_cache(monkeypatch):
+    class SerialExecutor:
+        calls = 0
+
+        def parallel_execute(self, func, iterable):
+            self.calls += 1
+            return [func(*args) for args in iterable]
+
+    train_length = 500
+    data = DATA[2000: 2000 + train_length]
+    s = Sequence(timestamps=range(0, train_length * 10, 10), values=data,
+                 name='os_mem_usage', labels={'from_instance': 'xx.xx.xx.100'})
+    arima_alg.clear_order_cache()
+
+    serial_model = arima_alg.ARIMA()
+    serial_model.fit(Sequence(timestamps=s.timestamps, values=s.values))
+    executor = SerialExecutor()
+    monkeypatch.setattr(arima_alg.ARIMA, 'executor', executor)
+    model = arima_alg.ARIMA()
+    model.fit(s)
+    assert executor.calls == 2
+    assert model.order == serial_model.order
+    assert np.allclose(model.params, serial_model.params)
+
+    # The second fitting reuses the order without searching.
+    monkeypatch.setattr(arima_alg.ARIMA, '_search_order', None)
+    warm_model = arima_alg.ARIMA()
+    warm_model.fit(s)
+    assert executor.calls == 2
+    assert warm_model.order == model.order
+    assert mse(warm_model.forecast(10), model.forecast(10)) < 1
+    arima_alg.clear_order_cache()
+
+
 def test_cosine_sequence():
     t = list(range(300))
     v = np.cos(np.array(t) / np.pi) + 1
@@ -5186,3 +5222,41 @@ def test_is_seasonal_series():
         min_seasonal_freq=2
     )
     assert (is_seasonal and period == 200)
+
+
+def test_seasonal_2d():
+    np.random.seed(0)
+    t = np.arange(400)
+    x = np.array([10 + 10 * np.sin(t * np.pi / (5 + i)) + np.random.random(400) + t * 0.01 * i for i in range(6)] +
+                 [np.random.random(400)])
+    assert is_seasonal_series_2d(x, high_ac_threshold=0.1, min_seasonal_freq=2) == [
+        is_seasonal_series(row, high_ac_threshold=0.1, min_seasonal_freq=2) for row in x
+    ]
+    for components, row in zip(zip(*seasonal_decompose_2d(x, period=10)), x):
+        for a, b in zip(components, seasonal_decompose(row, period=10)):
+            assert np.allclose(a, b)
+
+
+def test_quickly_forecast_many():
+    class SerialExecutor:
+        def parallel_execute(self, func, iterable):
+            return [func(*args) for args in iterable]
+
+    t = list(range(0, 3000, 10))
+    sequences = [
+        Sequence(timestamps=t, values=[10 + 10 * np.sin(v * np.pi / 50) for v in range(300)]),
+        Sequence(timestamps=t, values=DATA[1000: 1300]),
+        Sequence(timestamps=t[:200], values=list(range(200))),
+        Sequence(timestamps=t[:1], values=[1])
+    ]
+    forecasting_minutes = 50 * 10 / (60 * 1000)
+    for executor in (None, SerialExecutor()):
+        forecast_sequences, elapsed_seconds = quickly_forecast_many(
+            sequences, forecasting_minutes, lower=-float('inf'), executor=executor
+        )
+        assert len(elapsed_seconds) == len(sequences)
+        for sequence, forecast_sequence in zip(sequences, forecast_sequences):
+            expected = quickly_forecast(sequence, forecasting_minutes, lower=-float('inf'))
+            assert forecast_sequence.timestamps == expected.timestamps
+            assert np.allclose(forecast_sequence.values, expected.values)
+        assert len(forecast_sequences[-1]) == 0
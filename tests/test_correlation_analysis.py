@@ -1,6 +1,8 @@
 import numpy as np
 
-from dbmind.common.algorithm.correlation import CorrelationAnalysis
+from dbmind.common.algorithm.correlation import CorrelationAnalysis, batch_pearson_correlation
+from dbmind.common.types import Sequence
+from dbmind.components.anomaly_analysis import get_correlations, get_top_correlations
 
 
 def test_correlation_analysis():
@@ -61,3 +63,43 @@ def test_correlation_analysis():
             correlation_analysis_result = my_correlation_analysis.analyze(y1_preprocessed, y2_preprocessed)
             assert 0.7 < abs(correlation_analysis_result[0]) < 1
 
+
+def test_batch_pearson_correlation():
+    rng = np.random.default_rng(0)
+    for data_size, sliding_length in ((50, 0), (50, 3), (80, 30), (10, 20)):
+        x = rng.normal(size=data_size).cumsum()
+        ys = np.vstack(
+            [rng.normal(size=data_size).cumsum() for _ in range(20)] +
+            [np.roll(x, 2) + 0.1 * rng.normal(size=data_size), np.ones(data_size), np.arange(data_size)]
+        )
+        correlations, shifts = batch_pearson_correlation(x, ys, sliding_length)
+        my_correlation_analysis = CorrelationAnalysis(preprocess_method='none',
+                                                      analyze_method='pearson',
+                                                      sliding_length=sliding_length)
+        for i, y in enumerate(ys):
+            correlation, shift = my_correlation_analysis.analyze(*my_correlation_analysis.preprocess(x, y))
+            assert abs(np.nan_to_num(correlation) - correlations[i]) < 1e-9
+            assert shift == shifts[i]
+
+
+def test_get_top_correlations():
+    rng = np.random.default_rng(1)
+    timestamps = list(range(0, 60000, 1000))
+    this_sequence = Sequence(timestamps, tuple(rng.normal(size=len(timestamps)).cumsum()))
+    named_sequences = [
+        ('m%d' % i, Sequence(list(range(500 * (i % 3), 60000, 1500)),
+                             tuple(rng.normal(size=len(range(500 * (i % 3), 60000, 1500))).cumsum())))
+        for i in range(30)
+    ]
+    named_sequences.append(('constant', Sequence(timestamps, (1,) * len(timestamps))))
+    named_sequences.append(('same', this_sequence))
+
+    expected = sorted((get_correlations((name, sequence, this_sequence)) for name, sequence in named_sequences),
+                      key=lambda item: item[1], reverse=True)[:10]
+    result = get_top_correlations(this_sequence, named_sequences, topk=10)
+    assert [item[0] for item in result] == [item[0] for item in expected]
+    assert result[0][0] == 'same'
+    for (_, corr, delay, _, _), (_, expected_corr, expected_delay, _, _) in zip(result, expected):
+        assert abs(corr - expected_corr) < 1e-9 and delay == expected_delay
+
+    assert len(get_top_correlations(this_sequence, named_sequences, topk=100, corr_threshold=0.99)) == 1
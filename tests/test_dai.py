@@ -122,3 +122,39 @@ def test_estimate_appropriate_step(monkeypatch):
 
     for default_scrape_interval in range(1, 60, 5):
         validate()
+
+
+def test_get_metric_sequences_of_servers():
+    end = datetime.datetime.now()
+    start = end - datetime.timedelta(minutes=5)
+    servers = ('xx.xx.xx.100:1234', 'xx.xx.xx.101:5678', 'not.existing:0')
+    grouped = dai.get_metric_sequences_of_servers('os_cpu_usage', start, end, servers)
+    assert set(grouped.keys()) == {'xx.xx.xx.100:1234', 'xx.xx.xx.101:5678'}
+    for server, sequences in grouped.items():
+        for sequence in sequences:
+            assert sequence.labels['from_instance'] == server
+    assert len(dai.get_metric_sequences_of_servers('os_cpu_usage', start, end, ())) == 0
+
+
+def test_fetch_joined_sequences():
+    end = datetime.datetime.now()
+    start = end - datetime.timedelta(minutes=5)
+
+    def fetchers():
+        return (dai.get_metric_sequence('os_cpu_usage', start, end),
+                dai.get_metric_sequence('os_mem_usage', start, end))
+
+    joined = dai.fetch_joined_sequences(fetchers(), on=('from_instance',))
+    assert list(joined.keys()) == [('xx.xx.xx.100:1234',), ('xx.xx.xx.101:5678',), ('xx.xx.xx.102:1111',)]
+    for (server,), (cpu_sequences, mem_sequences) in joined.items():
+        assert len(cpu_sequences) == len(mem_sequences) == 1
+        assert cpu_sequences[0].name == 'os_cpu_usage' and mem_sequences[0].name == 'os_mem_usage'
+        assert cpu_sequences[0].labels['from_instance'] == mem_sequences[0].labels['from_instance'] == server
+
+    joined = dai.fetch_joined_sequences(fetchers())
+    assert list(joined.keys()) == [()]
+    assert [len(sequences) for sequences in joined[()]] == [3, 3]
+
+    joined = dai.fetch_joined_sequences(fetchers(), on=lambda s: s.labels['from_instance'].split('.')[-1][:3])
+    assert set(joined.keys()) == {'100', '101', '102'}
+    assert dai.fetch_joined_sequences(()) == {}
@@ -14,12 +14,15 @@
 import multiprocessing
 import os
 import random
+from datetime import datetime, timedelta
 from configparser import ConfigParser
 from unittest import mock
 
 from dbmind.app.monitoring import ad_pool_manager, generic_anomaly_detector
 from dbmind.common import utils
 from dbmind.common.algorithm import anomaly_detection
+from dbmind.common.algorithm.anomaly_detection.mad_detector import MadDetector
+from dbmind.common.sequence_buffer import frozendict
 from dbmind.common.tsdb.tsdb_client_factory import TsdbClientFactory
 from dbmind.common.types import Sequence
 from dbmind.cmd import edbmind
@@ -572,6 +575,205 @@ def mock_configs(*args):
     return configs
 
 
+def test_fit_predict_many():
+    random.seed(0)
+    sequences = []
+    for i in range(12):
+        length = 60 if i % 3 else 45
+        values = [random.gauss(0, 1) + (50 if random.random() < 0.05 else 0) for _ in range(length)]
+        if i % 4 == 0:
+            values[10] = float('nan')
+        sequences.append(Sequence(timestamps=list(range(length)), values=values))
+    sequences.append(Sequence(timestamps=list(range(2)), values=[1, 2]))
+
+    detectors = [
+        anomaly_detection.InterQuartileRangeDetector(outliers=(1.5, 1.5)),
+        anomaly_detection.ThresholdDetector(high=1, percentage=0.1),
+        anomaly_detection.QuantileDetector(high=0.9, low=0.1),
+        anomaly_detection.SpikeDetector(side='both', window=3),
+        anomaly_detection.LevelShiftDetector(window=5),
+        anomaly_detection.VolatilityShiftDetector(window=4),
+        anomaly_detection.GradientDetector(),
+        MadDetector()
+    ]
+    for detector in detectors:
+        results = detector.fit_predict_many(sequences)
+        for sequence, result in zip(sequences, results):
+            expected = detector.fit_predict(sequence)
+            assert result.timestamps == expected.timestamps
+            assert tuple(map(bool, result.values)) == tuple(map(bool, expected.values)), detector
+
+
+def test_incremental_detection(monkeypatch):
+    fetched_ranges = []
+    spikes = set()
+    now = [datetime(2023, 1, 1, 0, 0, 0)]
+
+    class FakeFetcher:
+        def __init__(self, metric_name, start_time, end_time, step=None):
+            self.metric_name = metric_name
+            self.start_time, self.end_time = start_time, end_time
+
+        def filter(self, **kwargs):
+            return self
+
+        def fetchall(self):
+            fetched_ranges.append((self.start_time, self.end_time))
+            step = 5000
+            start = int(self.start_time.timestamp() * 1000) // step * step + step
+            timestamps = list(range(start, int(self.end_time.timestamp() * 1000) + 1, step))
+            values = [100 if t in spikes else 1 for t in timestamps]
+            return [Sequence(timestamps, values, name=self.metric_name, step=step,
+                             labels={'from_instance': 'xx.xx.xx.100:1234'})]
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now[0]
+
+    monkeypatch.setattr(generic_anomaly_detector, 'datetime', FakeDatetime)
+    monkeypatch.setattr(dai, 'get_metric_sequence', FakeFetcher)
+    detector = generic_anomaly_detector.GenericAnomalyDetector(
+        'test', 120, 0, generic_anomaly_detector.AlarmInfo(),
+        generic_anomaly_detector.DetectorInfo('os_cpu_usage', 'ThresholdDetector', detector_kwargs={'high': 10})
+    )
+
+    def timestamp_of(seconds):
+        return int((now[0] + timedelta(seconds=seconds)).timestamp() * 1000)
+
+    spikes.add(timestamp_of(-60))
+    assert len(detector.detect(incremental_fetch=True)) == 1
+
+    # The same anomaly is not reported again and only the new points are fetched.
+    last_now, now[0] = now[0], now[0] + timedelta(seconds=30)
+    assert detector.detect(incremental_fetch=True) == []
+    assert fetched_ranges[-1] == (last_now, now[0])
+
+    # No new point, nothing to do.
+    assert detector.detect(incremental_fetch=True) == []
+
+    now[0] += timedelta(seconds=30)
+    spikes.add(timestamp_of(-10))
+    alarms = detector.detect(incremental_fetch=True)
+    assert len(alarms) == 1 and alarms[0].end_timestamp == timestamp_of(-10)
+    window = detector._windows[('os_cpu_usage', (), None)][1][0]
+    assert window.timestamps[0] >= timestamp_of(-120)
+    assert window.timestamps[-1] == timestamp_of(0)
+
+    # The full detection is not affected.
+    assert len(detector.detect()) == 1
+
+
+def test_incremental_detection_of_long_duration(monkeypatch):
+    now = [datetime(2023, 1, 1, 0, 0, 0)]
+    fetched_steps = []
+
+    class FakeFetcher:
+        def __init__(self, metric_name, start_time, end_time, step=None):
+            self.metric_name = metric_name
+            self.start_time, self.end_time = start_time, end_time
+            self.step = step or 15000  # The raw resolution.
+
+        def filter(self, **kwargs):
+            return self
+
+        def fetchall(self):
+            fetched_steps.append(self.step)
+            start = int(self.start_time.timestamp() * 1000) // self.step * self.step + self.step
+            timestamps = list(range(start, int(self.end_time.timestamp() * 1000) + 1, self.step))
+            return [Sequence(timestamps, [1] * len(timestamps), name=self.metric_name, step=self.step,
+                             labels={'from_instance': 'xx.xx.xx.100:1234'})]
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now[0]
+
+    monkeypatch.setattr(generic_anomaly_detector, 'datetime', FakeDatetime)
+    monkeypatch.setattr(dai, 'get_metric_sequence', FakeFetcher)
+    monkeypatch.setattr(TsdbClientFactory, 'get_tsdb_client', lambda: mock.Mock(scrape_interval=15))
+    detector = generic_anomaly_detector.GenericAnomalyDetector(
+        'test', 7200, 0, generic_anomaly_detector.AlarmInfo(),
+        generic_anomaly_detector.DetectorInfo('os_cpu_usage', 'ThresholdDetector', detector_kwargs={'high': 10})
+    )
+    for _ in range(3):
+        detector.detect(incremental_fetch=True)
+        now[0] += timedelta(seconds=60)
+
+    # The new points are fetched by the step of the whole window.
+    assert fetched_steps == [30000] * 3
+    window = detector._windows[('os_cpu_usage', (), None)][1][0]
+    assert {b - a for a, b in zip(window.timestamps, window.timestamps[1:])} == {30000}
+
+
+def test_incremental_detection_with_stopped_series(monkeypatch):
+    now = [datetime(2023, 1, 1, 0, 0, 0)]
+    # The secondary series labeled 'b' stops reporting after one minute.
+    stop_at = int((now[0] + timedelta(seconds=60)).timestamp() * 1000)
+    main_instances = ['xx.xx.xx.100:1234', 'xx.xx.xx.101:5678']
+
+    class FakeFetcher:
+        def __init__(self, metric_name, start_time, end_time, step=None):
+            self.metric_name = metric_name
+            self.start_time, self.end_time = start_time, end_time
+
+        def filter(self, **kwargs):
+            return self
+
+        def from_server_like(self, instance_like):
+            return self
+
+        def fetchall(self):
+            step = 5000
+            start = int(self.start_time.timestamp() * 1000) // step * step + step
+            timestamps = list(range(start, int(self.end_time.timestamp() * 1000) + 1, step))
+            if self.metric_name == 'os_cpu_usage':
+                return [Sequence(timestamps, [100] * len(timestamps), name=self.metric_name, step=step,
+                                 labels={'from_instance': instance}) for instance in main_instances]
+            sequences = [Sequence(timestamps, [1] * len(timestamps), name=self.metric_name, step=step,
+                                  labels={'from_instance': 'xx.xx.xx.100:1234', 'device': 'a'})]
+            stopped_timestamps = [t for t in timestamps if t < stop_at]
+            if stopped_timestamps:
+                sequences.append(Sequence(stopped_timestamps, [1] * len(stopped_timestamps), name=self.metric_name,
+                                          step=step, labels={'from_instance': 'xx.xx.xx.100:1234', 'device': 'b'}))
+            return sequences
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now[0]
+
+    monkeypatch.setattr(generic_anomaly_detector, 'datetime', FakeDatetime)
+    monkeypatch.setattr(dai, 'get_metric_sequence', FakeFetcher)
+    detector = generic_anomaly_detector.GenericAnomalyDetector(
+        'test', 120, 0, generic_anomaly_detector.AlarmInfo(),
+        [generic_anomaly_detector.DetectorInfo('os_cpu_usage', 'ThresholdDetector', detector_kwargs={'high': 10}),
+         generic_anomaly_detector.DetectorInfo('os_disk_usage', 'QuantileDetector')]
+    )
+
+    def secondary_devices():
+        return sorted(s.labels['device'] for key, (_, sequences) in detector._windows.items()
+                      if key[0] == 'os_disk_usage' for s in sequences)
+
+    # The secondary metric doesn't deviate, so there is no alarm.
+    assert detector.detect(incremental_fetch=True) == []
+    assert secondary_devices() == ['a', 'a', 'b', 'b']
+
+    # The points of the stopped series age out of the window, then the series is dropped.
+    for _ in range(10):
+        now[0] += timedelta(seconds=30)
+        detector.detect(incremental_fetch=True)
+    assert secondary_devices() == ['a', 'a']
+
+    # The states of the main series which has gone away are dropped as well.
+    main_instances.pop()
+    for _ in range(5):
+        now[0] += timedelta(seconds=30)
+        detector.detect(incremental_fetch=True)
+    assert list(detector._last_seen_timestamps) == [frozendict({'from_instance': 'xx.xx.xx.100:1234'})]
+    assert len(detector._windows) == 2
+
+
 def test_detection_interface(monkeypatch):
     monkeypatch.setattr(os, 'chdir', mock.MagicMock())
     monkeypatch.setattr(utils, 'read_simple_config_file', lambda x: dict())
@@ -587,7 +789,7 @@ def test_detection_interface(monkeypatch):
     ad_main(['--action', 'plot'] + args + ['--anomaly', 'volatility_shift'])
 
 
-def mock_get_metric_sequence_beta(metric_name, start_time, end_time):
+def mock_get_metric_sequence_beta(metric_name, start_time, end_time, step=None):
 
     class MockFetcher(dai.LazyFetcher):
         def _read_buffer(self):
@@ -619,7 +821,7 @@ def mock_get_metric_sequence_beta(metric_name, start_time, end_time):
             )
             return [seq]
 
-    return MockFetcher(metric_name, start_time, end_time)
+    return MockFetcher(metric_name, start_time, end_time, step)
 
 
 def test_anomaly_detector_pool(monkeypatch):
@@ -12,11 +12,13 @@
 # See the Mulan PSL v2 for more details.
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest import mock
 from collections import defaultdict
 
 import psycopg2
 import requests
+from prometheus_client import generate_latest
 
 from dbmind.common.opengauss_driver import DriverBundle
 from dbmind.common.rpc import RPCClient
@@ -25,6 +27,7 @@ from dbmind.common.types.sequence import Sequence
 from dbmind.common.utils import exporter as exporter_utils
 from dbmind.components import opengauss_exporter
 from dbmind.components.opengauss_exporter.core import controller as oe_controller
+from dbmind.components.opengauss_exporter.core import service as oe_service
 from dbmind.components.opengauss_exporter.core.controller import app
 from dbmind.components.opengauss_exporter.core.main import ExporterMain as OpenGaussExporterMain
 from dbmind.components.opengauss_exporter.core.main import parse_argv as og_parse_argv
@@ -114,3 +117,94 @@ def test_http_and_rpc_service(monkeypatch, rpc_client_testing):
     assert res.text.count('# TYPE') > 0
     oe_controller.app.shutdown()
     thr.join()
+
+
+def sample_value(exposition, metric_name):
+    for line in exposition.splitlines():
+        if line.startswith(metric_name + b'{') or line.startswith(metric_name + b' '):
+            return line.rsplit(b' ', 1)[1]
+
+
+def test_query_deadline_serves_stale_result(monkeypatch):
+    release = threading.Event()
+    rows = [{'value': 1}]
+
+    def mock_query(stmt, timeout, force_connection_db, raise_error=False):
+        if stmt == 'select slow':
+            release.wait(5)
+        return rows
+
+    monkeypatch.setattr(oe_service, 'driver', mock.MagicMock(query=mock_query, is_standby=lambda: False))
+    monkeypatch.setattr(oe_service, '_thread_pool_executor', ThreadPoolExecutor(max_workers=2))
+    instance = oe_service.QueryInstance({
+        'name': 'test_deadline',
+        'timeout': 0.5,
+        'query': [{'name': 'test_deadline', 'sql': 'select slow'}],
+        'metrics': [{'name': 'value', 'usage': 'GAUGE'}]
+    })
+    query = instance.queries[0]
+    query.rows = [{'value': 0}]  # last good result
+    monkeypatch.setattr(oe_service, 'query_instances', [instance])
+    instance.register(oe_service.REGISTRY)
+    collectors = getattr(oe_service.REGISTRY, '_names_to_collectors')
+    fixed_info_registered = 'opengauss_exporter_fixed_info' in collectors
+    if not fixed_info_registered:
+        oe_service.register_exporter_fixed_info()
+    try:
+        # The slow query exceeds its deadline, so the stale result is served.
+        start_time = time.monotonic()
+        res = oe_service.query_all_metrics()
+        assert time.monotonic() - start_time < 2
+        assert sample_value(res, b'test_deadline_value') == b'0.0'
+        assert oe_service.query_skipped.labels('test_deadline', 'test_deadline', 'deadline')._value.get() == 1
+
+        # The query is still running, so the next scrape doesn't execute it again.
+        oe_service.query_all_metrics()
+        assert oe_service.query_skipped.labels('test_deadline', 'test_deadline', 'in_flight')._value.get() == 1
+
+        release.set()
+        query.refreshing.result()
+        assert sample_value(oe_service.query_all_metrics(), b'test_deadline_value') == b'1.0'
+        assert query.rows == rows
+        assert b'opengauss_exporter_query_duration_seconds' in oe_service.query_all_metrics()
+    finally:
+        release.set()
+        for metric in instance.metrics:
+            oe_service.REGISTRY.unregister(metric.value)
+        if not fixed_info_registered:
+            oe_service.REGISTRY.unregister(collectors['opengauss_exporter_fixed_info'])
+
+
+def test_query_error_keeps_last_result(monkeypatch):
+    responses = [[{'value': 1}], psycopg2.extensions.QueryCanceledError('canceling statement due to timeout')]
+
+    def mock_query(stmt, timeout, force_connection_db, raise_error=False):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            if raise_error:
+                raise response
+            return []
+        return response
+
+    monkeypatch.setattr(oe_service, 'driver', mock.MagicMock(query=mock_query))
+    instance = oe_service.QueryInstance({
+        'name': 'test_error',
+        'query': [{'name': 'test_error', 'sql': 'select 1'}],
+        'metrics': [{'name': 'value', 'usage': 'GAUGE'}]
+    })
+    query = instance.queries[0]
+    instance.register(oe_service.REGISTRY)
+    try:
+        instance.update()
+        assert sample_value(generate_latest(oe_service.REGISTRY), b'test_error_value') == b'1.0'
+
+        # The query fails after one success, so the last good result is still rendered.
+        with mock.patch.object(oe_service, 'logging') as mock_logging:
+            instance.update()
+        mock_logging.exception.assert_called_once()
+        assert query.rows == [{'value': 1}]
+        assert sample_value(generate_latest(oe_service.REGISTRY), b'test_error_value') == b'1.0'
+        assert oe_service.query_skipped.labels('test_error', 'test_error', 'error')._value.get() == 1
+    finally:
+        for metric in instance.metrics:
+            oe_service.REGISTRY.unregister(metric.value)
@@ -0,0 +1,69 @@
+# Copyright (c) 2022 Huawei Technologies Co.,Ltd.
+#
+# openGauss is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#
+#          http://license.coscl.org.cn/MulanPSL2
+#
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+import io
+
+from dbmind.components import extract_log
+
+log_lines = [
+    "2023-01-01 10:00:00.100 user1 db1 1001 LOG:  execute S_1: begin;select * from t1 where a = 1",
+    "2023-01-01 10:00:01.100 user1 db1 1002 LOG:  execute S_2: select b from t2 where c = $1",
+    "2023-01-01 10:00:02.100 user1 db1 1002 DETAIL:  parameters: $1 = '5'",
+    "2023-01-01 10:00:03.100 user1 db1 1001 LOG:  execute S_3: update t1 set a = 2",
+    "\twhere b = 3",
+    "2023-01-01 10:00:04.100 user2 db1 1003 LOG:  execute S_4: delete from t3 where d = 4",
+    "2023-01-01 10:00:05.100 user1 db1 1002 DETAIL:  parameters: $1 = '6'",
+    "2023-01-01 10:00:06.100 user1 db1 1001 LOG:  execute S_5: insert into t1 values(1);commit",
+    "2023-01-01 10:00:07.100 user1 db1 1002 LOG:  statement: select * from t2 where c in (1, 2)",
+]
+filter_config = {'user': None, 'database': None, 'sql_amount': None, 'statement': True}
+
+
+def _write_log(tmp_path):
+    log_file = tmp_path / 'postgresql.log'
+    log_file.write_text('\n'.join(log_lines) + '\n')
+    return str(log_file)
+
+
+def test_get_start_position(tmp_path):
+    log_file = _write_log(tmp_path)
+    assert extract_log.get_start_position('2023-01-01 09:00:00', log_file) == 0
+    assert extract_log.get_start_position('2023-01-01 10:00:04', log_file) == \
+        len(''.join(line + '\n' for line in log_lines[:5]))
+    assert extract_log.get_start_position('2023-01-01 11:00:00', log_file) == -1
+
+
+def test_parse_log_file(tmp_path):
+    log_file = _write_log(tmp_path)
+    log_info_position = extract_log.generate_info_position('%m %u %d %p')
+    extract_log.SQL_AMOUNT = 0
+    # Lines grouped by thread id in the order of the first appearance.
+    grouped_lines = [line for threadid in ('1001', '1002', '1003') for index, line in enumerate(log_lines)
+                     if threadid in line or (line.startswith('\t') and threadid in log_lines[index - 1])]
+    expected = list(extract_log.get_parsed_sql(io.StringIO('\n'.join(grouped_lines) + '\n'),
+                                               filter_config, log_info_position))
+    assert expected == ['select * from t1 where a = 1;update t1 set a = 2 where b = 3;insert into t1 values(1);',
+                        "select b from t2 where c = '5';", "select b from t2 where c = '5';",
+                        'select * from t2 where c in (1, 2);', 'delete from t3 where d = 4;']
+
+    # Each chunk holds a few lines, so the transaction of thread 1001 crosses the boundaries,
+    # and the second chunk starts with the parameters of a statement in the first chunk.
+    chunks = extract_log._split_log(log_file, 0, 4, 150)
+    assert len(chunks) > 2
+    with open(log_file, 'rb') as f:
+        f.seek(chunks[1][0])
+        assert b'parameters:' in f.readline()
+    for processes in (1, 2):
+        extract_log.SQL_AMOUNT = 0
+        assert list(extract_log.parse_log_file(log_file, 0, filter_config, log_info_position,
+                                               processes=processes, chunk_size=150)) == expected
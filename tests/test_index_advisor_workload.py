@@ -20,6 +20,9 @@ import sys
 import json
 import io
 import shlex
+import tempfile
+
+import psycopg2
 
 import dbmind.components.index_advisor.utils
 from dbmind.components.index_advisor.index_advisor_workload import IndexAdvisor
@@ -795,6 +798,188 @@ class IndexAdvisorTester(unittest.TestCase):
         self.assertEqual(dbmind.components.index_advisor.utils.lookfor_subsets_configs(cur_config, atomic_configs),
                          atomic_configs[-2:])
 
+    def test_workload_cost_matrix(self):
+        index1 = IndexItemFactory().get_index('public.cost_matrix', 'col1', index_type='')
+        index2 = IndexItemFactory().get_index('public.cost_matrix', 'col2', index_type='')
+        queries = [QueryItem('select * from cost_matrix where col1 = 1', 1),
+                   QueryItem('select * from cost_matrix where col2 = 1', 2),
+                   QueryItem('insert into cost_matrix values (1, 1)', 1)]
+        workload = WorkLoad(queries)
+        workload.add_indexes(None, [100, 200, 0], [[], [], []], [[], [], []])
+        workload.add_indexes((index1,), [60, 200, 0], [['idx1'], [], []], [[], [], []])
+        workload.add_indexes((index2,), [100, 150, 0], [[], ['idx2'], []], [[], [], []])
+        workload.add_indexes((index1, index2), [30, 120, 0], [['idx1'], ['idx2'], []], [[], [], []])
+        # More index configs than the initial capacity of the cost matrix.
+        for i in range(10):
+            index = IndexItemFactory().get_index('public.cost_matrix', 'col%d' % (i + 3), index_type='')
+            workload.add_indexes((index,), [100 - i, 200, 0], [[], [], []], [[], [], []])
+            self.assertEqual(workload.get_indexes_cost_of_query(queries[0], (index,)), 100 - i)
+
+        self.assertTrue(workload.has_indexes((index1, index2)))
+        self.assertFalse(workload.has_indexes((index2, index1)))
+        self.assertEqual(workload.get_total_origin_cost(), 300)
+        self.assertEqual(workload.get_index_benefit(index1), 40)
+        self.assertEqual(workload.get_indexes_cost_of_query(queries[1], (index1, index2)), 120)
+        self.assertEqual(workload.get_workload_used_indexes((index1, index2)), [['idx1'], ['idx2'], []])
+        self.assertEqual(list(workload.get_benefits_of_queries((index1, index2))), [70, 80, 0])
+        with self.assertRaises(ValueError):
+            workload.get_total_index_cost((index2, index1))
+
+        benefit = dbmind.components.index_advisor.utils.infer_workload_benefit(
+            workload, [index1, index2], [(index1,), (index2,), (index1, index2)])
+        self.assertAlmostEqual(benefit, 110)
+        association = index2.association_indexes[f'{index1};{index2}']
+        self.assertEqual([statement for statement, _ in association], [queries[0].get_statement(),
+                                                                       queries[1].get_statement()])
+        self.assertAlmostEqual(association[1][1], 0.15)
+
+        workload.replace_indexes((index1, index2), (index2, index1))
+        self.assertEqual(workload.get_total_index_cost((index2, index1)), 150)
+
+    def test_remove_unused_indexes(self):
+        index1 = IndexItemFactory().get_index('public.unused', 'col1', index_type='')
+        index2 = IndexItemFactory().get_index('public.unused', 'col1, col2', index_type='')
+        index3 = IndexItemFactory().get_index('public.unused', 'col3', index_type='')
+        plans = {(index1, index2, index3): ([index1, index2, index3], 10),
+                 (index1, index3): ([index1, index3], 10),
+                 (index3,): ([index3], 12),
+                 (index1,): ([index1], 10),
+                 (index2,): ([], 20)}
+
+        def mock_query_index_check(executor, statement, indexes, sort_by_column_no=True):
+            return plans[tuple(indexes)]
+
+        with patch('dbmind.components.index_advisor.index_advisor_workload.query_index_check',
+                   mock_query_index_check):
+            self.assertEqual(index_advisor_workload.remove_unused_indexes(None, 'select', [index1, index2, index3]),
+                             ([index1], 4))
+            # Stop when the budget of optimizer calls runs out.
+            self.assertEqual(index_advisor_workload.remove_unused_indexes(None, 'select', [index1, index2, index3],
+                                                                          max_calls=2),
+                             ([index1, index3], 2))
+            # A single index is still checked once, and dropped if the optimizer doesn't use it.
+            self.assertEqual(index_advisor_workload.remove_unused_indexes(None, 'select', [index1]), ([index1], 1))
+            self.assertEqual(index_advisor_workload.remove_unused_indexes(None, 'select', [index2]), ([], 1))
+            self.assertEqual(index_advisor_workload.remove_unused_indexes(None, 'select', []), ([], 0))
+
+    def test_cost_cache(self):
+        index = IndexItemFactory().get_index('public.cost_cache', 'col1', index_type='')
+
+        class CountingExecutor:
+            def __init__(self):
+                self.calls = 0
+
+            def get_schema(self):
+                return 'public'
+
+            def execute_sqls(self, sqls):
+                self.calls += 1
+                if any(sql.startswith("SELECT 'fingerprint:'") for sql in sqls):
+                    return [('fingerprint:abc',)]
+                if any('pgxc_node' in sql for sql in sqls):
+                    return [('0',)]
+                return [('(<1>btree_cost_cache_col1,1,cost_cache,"(col1)")',),
+                        (' Index Scan using <1>btree_cost_cache_col1 on cost_cache  (cost=0.00..8.27 rows=1 width=4)',)]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            index_advisor_workload.set_cost_cache(os.path.join(tmpdir, 'cost_cache.db'))
+            try:
+                statement = 'select * from cost_cache where col1 = 1'
+                executor = CountingExecutor()
+                self.assertEqual(index_advisor_workload.query_index_check(executor, statement, [index]),
+                                 ([index], 8.27))
+                calls = executor.calls
+                self.assertEqual(index_advisor_workload.query_index_check(executor, statement, [index]),
+                                 ([index], 8.27))
+                self.assertEqual(executor.calls, calls)
+
+                # Another run only has to fetch the fingerprint of the schema.
+                index_advisor_workload.set_cost_cache(None)
+                index_advisor_workload.set_cost_cache(os.path.join(tmpdir, 'cost_cache.db'))
+                executor = CountingExecutor()
+                self.assertEqual(index_advisor_workload.query_index_check(executor, '  ' + statement, [index]),
+                                 ([index], 8.27))
+                self.assertEqual(executor.calls, 2)
+
+                # A corrupt cache file is bypassed.
+                corrupt_path = os.path.join(tmpdir, 'corrupt.db')
+                with open(corrupt_path, 'w') as f:
+                    f.write('not a database' * 100)
+                cost_cache = index_advisor_workload.set_cost_cache(corrupt_path)
+                self.assertTrue(cost_cache.disabled)
+                cost_cache.put('key', 1)
+                self.assertIsNone(cost_cache.get('key'))
+                executor = CountingExecutor()
+                self.assertEqual(index_advisor_workload.query_index_check(executor, statement, [index]),
+                                 ([index], 8.27))
+            finally:
+                index_advisor_workload.set_cost_cache(None)
+
+    def test_driver_executor_pool(self):
+        from dbmind.components.index_advisor.executors.driver_executor import DriverExecutorPool
+        from dbmind.components.index_advisor.executors.common import BaseExecutor
+
+        executed = []
+
+        class FakeCursor:
+            def __init__(self):
+                self.rows = []
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+            def execute(self, sql):
+                executed.append(sql)
+                self.rows = [('Seq Scan on t  (cost=0.00..%s.00 rows=1 width=4)' % len(sql),)]
+                if 'explain execute' in sql and 'error' in sql:
+                    raise psycopg2.ProgrammingError('syntax error')
+
+            def fetchall(self):
+                return self.rows
+
+        class FakeConnection:
+            autocommit = False
+
+            def cursor(self):
+                return FakeCursor()
+
+            def close(self):
+                pass
+
+        connections = []
+
+        def mock_connect(**kwargs):
+            connections.append(FakeConnection())
+            return connections[-1]
+
+        class FakeExecutor(BaseExecutor):
+            def execute_sqls(self, sqls):
+                return [('0',)]
+
+        executor = FakeExecutor('db', 'user', 'pwd', '127.0.0.1', 5432, 'public')
+        index = IndexItemFactory().get_index('public.t', 'col1', index_type='')
+        statements = ['select * from t where col1 = %d' % i for i in range(5)] + ['error']
+        with patch('psycopg2.connect', mock_connect):
+            executor.explain_pool = DriverExecutorPool(executor, size=2)
+            try:
+                costs, index_names, plans = index_advisor_workload.get_pooled_workload_costs(
+                    statements, executor, (index,))
+                costs_again, _, _ = index_advisor_workload.get_pooled_workload_costs(
+                    statements, executor, (index,))
+            finally:
+                executor.explain_pool.close()
+        self.assertLessEqual(len(connections), 2)
+        self.assertEqual(costs[-1], 0)
+        self.assertTrue(all(cost > 0 for cost in costs[:-1]))
+        self.assertEqual(costs, costs_again)
+        self.assertEqual(len(costs), len(statements))
+        # The session settings are applied once for each session.
+        self.assertEqual(sum('set current_schema' in sql for sql in executed), len(connections))
+        self.assertEqual(sum('hypopg_create_index' in sql for sql in executed), 4)
+
     def test_recalculate_cost_for_opt_indexes(self):
         index1 = IndexItemFactory().get_index('public.a', 'col1', index_type='global')
         index1.set_storage(10)
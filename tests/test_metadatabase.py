@@ -88,6 +88,124 @@ def test_slow_queries():
     assert count_slow_queries() == 0
 
 
+def test_insert_slow_queries_with_journals():
+    truncate_slow_queries()
+    start_time = int(time.time() * 1000)
+    insert_slow_query('127.0.0.1:1234', 'schema', 'db0', 'query0', 20, 20, root_cause='a')
+
+    def record(query, h1, h2, replicated, offset=0):
+        return (dict(instance='127.0.0.1:1234', schema_name='schema', db_name='db0',
+                     query=query, hashcode1=h1, hashcode2=h2),
+                dict(start_at=start_time + offset, duration_time=1000, instance='127.0.0.1:1234'),
+                replicated)
+
+    insert_slow_queries_with_journals([
+        record('query0', 20, 20, True),  # reuses the existing one
+        record('query1', 21, 21, False),
+        record('query1', 21, 21, False, 1000),  # the same hash codes are inserted once
+        record('query2', 22, 22, True),  # not existing yet, so inserted
+        record('query2', 22, 22, True, 1000),
+    ])
+    assert count_slow_queries(distinct=True) == 3
+    ids = {h: list(select_slow_query_id_by_hashcode(h, h))[0][0] for h in (20, 21, 22)}
+    assert ids[20] == 1
+    with result_db_session.get_session() as s:
+        journals = sorted(
+            (j.slow_query_id, j.start_at, j.round_start_at) for j in s.query(SlowQueriesJournal)
+        )
+    assert journals == sorted([
+        (ids[20], start_time, start_time // 1000 * 1000),
+        (ids[21], start_time, start_time // 1000 * 1000),
+        (ids[21], start_time + 1000, (start_time + 1000) // 1000 * 1000),
+        (ids[22], start_time, start_time // 1000 * 1000),
+        (ids[22], start_time + 1000, (start_time + 1000) // 1000 * 1000),
+    ])
+
+    # A query that is not replicated always gets a new row and the journal refers to it.
+    insert_slow_queries_with_journals([record('query0', 20, 20, False)])
+    assert count_slow_queries(distinct=True) == 4
+    new_id = list(select_slow_query_id_by_hashcode(20, 20))[0][0]
+    assert new_id not in ids.values()
+    with result_db_session.get_session() as s:
+        assert s.query(SlowQueriesJournal).filter(SlowQueriesJournal.slow_query_id == new_id).count() == 1
+
+    insert_slow_queries_with_journals([])
+    truncate_slow_queries()
+
+
+def test_slow_queries_rollups():
+    truncate_slow_queries()
+    start_time = int(time.time() * 1000)
+
+    def record(query, h, replicated, instance='127.0.0.1:1234', db_name='db0', template_id=None, offset=0):
+        return (dict(instance=instance, schema_name='public', db_name=db_name, query=query,
+                     hashcode1=h, hashcode2=h, template_id=template_id, cpu_time=h * 1000.,
+                     hit_rate=0.5 if h % 2 else None),
+                dict(start_at=start_time + offset, duration_time=1000, instance=instance),
+                replicated)
+
+    insert_slow_queries_with_journals([
+        record('select * from pg_class', 1, False, template_id=10),
+        record('select * from t1', 2, False, template_id=20),
+        record('select * from t1', 2, True, template_id=20, offset=1000),
+        record('delete from t2', 3, False, db_name='db1'),
+        record('update t3 set a = 1', 4, False, instance='127.0.0.1:5678', template_id=20),
+    ])
+    insert_slow_queries_with_journals([
+        record('select * from t1', 2, True, template_id=20, offset=2000),
+        record('select * from t1', 2, False, template_id=20, offset=3000),
+    ])
+    with get_session() as session:
+        # The existing rollup rows are updated in place.
+        keys = [tuple(getattr(rollup, column) for column in ('instance', 'bucket_at', 'template_id', 'db_name'))
+                for rollup in session.query(SlowQueriesRollup)]
+        assert len(keys) == len(set(keys))
+
+    def legacy_summary(instance):
+        return {
+            'nb_unique_slow_queries': count_slow_queries(instance=instance),
+            'main_slow_queries': count_slow_queries(instance=instance, distinct=True),
+            'statistics_for_database': group_by_dbname(instance=instance),
+            'statistics_for_schema': group_by_schema(instance=instance),
+            'systable': count_systable(instance=instance),
+            'slow_query_count': slow_query_trend(instance=instance),
+            'distribution': slow_query_distribution(instance=instance),
+            'mean_cpu_time': mean_cpu_time(instance=instance),
+            'mean_io_time': mean_io_time(instance=instance),
+            'mean_fetch_rate': mean_fetch_rate(instance=instance),
+            'mean_buffer_hit_rate': mean_buffer_hit_rate(instance=instance),
+            'slow_query_template': sorted(tuple(row) for row in slow_query_template(instance=instance)),
+        }
+
+    def summary(instance):
+        rv = summarize_slow_queries(instance=instance)
+        rv['slow_query_template'] = sorted(rv['slow_query_template'])
+        return rv
+
+    for instance in (None, '127.0.0.1:1234', '127.0.0.1:5678'):
+        assert summary(instance) == legacy_summary(instance)
+    assert summary('127.0.0.1:1234')['main_slow_queries'] == 4
+    assert summary('127.0.0.1:1234')['nb_unique_slow_queries'] == 6
+
+    rebuild_slow_queries_rollups()
+    for instance in (None, '127.0.0.1:1234'):
+        assert summary(instance) == legacy_summary(instance)
+
+    # Upgraded without the rollup tables.
+    with get_session() as session:
+        SlowQueriesRollup.__table__.drop(session.connection())
+        SlowQueriesJournalRollup.__table__.drop(session.connection())
+    assert init_slow_queries_rollups()
+    for instance in (None, '127.0.0.1:1234'):
+        assert summary(instance) == legacy_summary(instance)
+    assert not init_slow_queries_rollups()
+
+    delete_slow_queries(start_time + ROLLUP_BUCKET * 2)
+    assert summarize_slow_queries()['main_slow_queries'] == 0
+    assert summarize_slow_queries()['slow_query_count'] == {'timestamps': [], 'values': []}
+    truncate_slow_queries()
+
+
 def test_history_alarms():
     truncate_history_alarm()
 
@@ -423,3 +423,53 @@ def mock_get_slow_queries(monkeypatch, mock_dai):
     monkeypatch.setattr(mock_dai, 'get_latest_metric_sequence',
                         mock.Mock(side_effect=lambda x, y: MockedFetcher(metric=x)))
     monkeypatch.setattr(mock_dai, 'get_metric_sequence', mock.Mock(side_effect=lambda x, y, z: MockedFetcher(metric=x)))
+
+
+def test_prefetch_query_contexts(monkeypatch):
+    from datetime import datetime, timedelta
+    from dbmind.app.diagnosis.query.slow_sql import query_info_source
+
+    base = datetime.fromtimestamp(1640139600)
+    calls = []
+
+    def mock_get_metric_sequences_of_servers(metric_name, start_time, end_time, servers, **labels_like):
+        calls.append((metric_name, start_time, end_time, frozenset(servers)))
+        timestamps = tuple(range(int(start_time.timestamp() * 1000), int(end_time.timestamp() * 1000) + 1, 15000))
+        return {server: [Sequence(timestamps, tuple(range(len(timestamps))), name=metric_name,
+                                  step=15000, labels={'from_instance': server, 'name': 'enable_nestloop'})]
+                for server in servers}
+
+    monkeypatch.setattr(dai, 'get_metric_sequences_of_servers', mock_get_metric_sequences_of_servers)
+
+    def make_context(db_host, start_offset):
+        context = query_info_source.QueryContextFromTSDBAndRPC.__new__(
+            query_info_source.QueryContextFromTSDBAndRPC
+        )
+        context.slow_sql_instance = SlowQuery(db_host=db_host, db_port='5432', db_name='database1',
+                                              schema_name='public', query='select 1',
+                                              start_timestamp=1640139690, duration_time=1000)
+        context.prefetched_sequences = dict()
+        context.query_start_time = base + timedelta(seconds=start_offset)
+        context.query_end_time = context.query_start_time + timedelta(seconds=60)
+        return context
+
+    contexts = [make_context('10.0.0.%d' % i, i * 60) for i in range(10)]
+    # This one is too far from the others, so it belongs to another group.
+    contexts.append(make_context('10.0.0.1', 7200))
+    query_info_source.prefetch_query_contexts(contexts)
+
+    metric_count = (len(query_info_source.PREFETCHED_INSTANCE_METRICS) +
+                    len(query_info_source.PREFETCHED_HOST_METRICS))
+    assert len(calls) == 2 * metric_count
+    for context in contexts:
+        start = int(context.query_start_time.timestamp() * 1000)
+        end = int(context.query_end_time.timestamp() * 1000)
+        fetcher = context.get_metric_sequence('os_cpu_usage').from_server(context.slow_sql_instance.db_host)
+        sequence = fetcher.fetchone()
+        assert sequence.labels['from_instance'] == context.slow_sql_instance.db_host
+        assert start <= sequence.timestamps[0] <= sequence.timestamps[-1] <= end
+        assert context.get_metric_sequence('pg_settings_setting').from_server(
+            context.slow_sql_instance.instance).filter(name='enable_nestloop').fetchone().values
+        assert not context.get_metric_sequence('pg_settings_setting').from_server(
+            context.slow_sql_instance.instance).filter(name='enable_sort').fetchone().values
+        assert context.get_metric_sequence('os_cpu_usage').from_server('other').fetchall() == []
@@ -13,12 +13,16 @@
 
 import re
 import unittest
+from unittest import mock
 
 import sqlparse
+from mo_sql_parsing import parse
 
+from dbmind import global_vars
 from dbmind.components.sql_rewriter import SQLRewriter, get_offline_rewriter, TableInfo
 from dbmind.components.sql_rewriter.sql_rewriter import get_insert_value_number, is_no_column_insert_sql,\
-    rewrite_no_column_insert_sql
+    rewrite_no_column_insert_sql, rewrite_sql_api, SchemaSnapshot, CATALOG_VERSION_STMT
+from dbmind.components.sql_rewriter.rules import get_features, Or2In, SelfJoin, Star2Columns, UnionAll
 
 mapper = {'DistinctStar': {
     'select distinct * from bmsql_config join bmsql_district b on True;':
@@ -383,6 +387,89 @@ class RewriteTester(unittest.TestCase):
                                                       ['col1', 'col2', 'col3', 'col4']),
                          'insert into table1 (col1,col2,col3) values (1,2,3)')
 
+    def test_schema_snapshot(self):
+        executed = []
+        version = ['1']
+
+        def fetch(stmt):
+            executed.append(stmt)
+            if stmt == CATALOG_VERSION_STMT:
+                return [(version[0],)]
+            if 'information_schema.columns' in stmt:
+                return [('t1', 'b', 2, 'YES'), ('t2', 'c', 1, 'NO'), ('t1', 'a', 1, 'NO')]
+            return [('t1', 1)]
+
+        snapshot = SchemaSnapshot(fetch, probe_interval=0).refresh()
+        tableinfo = snapshot.get_tableinfo(['t1', 't2', 't3'])
+        self.assertEqual(tableinfo.table_columns, {'t1': ['a', 'b'], 't2': ['c'], 't3': []})
+        self.assertEqual(tableinfo.table_exists_primary, {'t1': 1, 't2': 0, 't3': 0})
+        self.assertEqual(tableinfo.table_notnull_columns, {'t1': ['a'], 't2': ['c'], 't3': []})
+        self.assertEqual(len(executed), 3)
+        # The snapshot is not reloaded until the catalog changes.
+        snapshot.refresh()
+        self.assertEqual(len(executed), 4)
+        version[0] = '2'
+        snapshot.refresh()
+        self.assertEqual(len(executed), 7)
+        parsed_sql = parse('select * from t1;')
+        self.assertEqual(SQLRewriter().rewrite('select * from t1;', tableinfo, False, parsed_sql),
+                         (True, 'SELECT a, b FROM t1;'))
+        # The version of the catalog is not probed again within the interval.
+        snapshot = SchemaSnapshot(fetch, probe_interval=3600).refresh()
+        executed.clear()
+        version[0] = '3'
+        snapshot.refresh()
+        self.assertEqual(executed, [])
+
+    def test_rewrite_sql_api(self):
+        called = []
+
+        class FakeAgentProxy:
+            def current_agent_addr(self):
+                return 'fake_agent:1234'
+
+            def call(self, funcname, *args, **kwargs):
+                called.append((funcname, args, kwargs))
+                stmt = kwargs['stmt']
+                if 'information_schema.tables' in stmt:
+                    return [('public',)]
+                if stmt == CATALOG_VERSION_STMT:
+                    return [('1',)]
+                if 'information_schema.columns' in stmt:
+                    return [('t1', 'a', 1, 'NO'), ('t1', 'b', 2, 'YES')]
+                if 'information_schema.table_constraints' in stmt:
+                    return [('t1', 1)]
+                return [[('Seq Scan on t1',)]]
+
+        with mock.patch.object(global_vars, 'agent_proxy', FakeAgentProxy()):
+            self.assertEqual(rewrite_sql_api('db1', 'select * from t1;', if_format=False),
+                             'SELECT a, b FROM t1;')
+        self.assertTrue(all(funcname == 'query_in_database' and not args and kwargs['database'] == 'db1'
+                            for funcname, args, kwargs in called))
+
+    def test_get_features(self):
+        features = get_features(parse('select * from t1 a, t1 b where a.c1 = 1 or a.c1 = 2'))
+        self.assertTrue(Or2In.applicable(features))
+        self.assertTrue(SelfJoin.applicable(features))
+        self.assertTrue(Star2Columns.applicable(features))
+        self.assertFalse(UnionAll.applicable(features))
+
+    def test_rewrite_batch(self):
+        sqls = [sql.lower() for rule in mapper.values() for sql in rule]
+        rewriter = SQLRewriter()
+        expected = [rewriter.rewrite(sql, tableinfo, False) for sql in sqls]
+        rewriter.reset_counters()
+        self.assertEqual(rewriter.rewrite_batch(sqls, tableinfo, False, processes=2, batch_size=5), expected)
+        counters = rewriter.get_counters()
+        for rule in rewriter.rules:
+            # Statements that fail in a rule are not counted by the remaining rules.
+            self.assertLessEqual(counters[rule.__name__]['checked'] + counters[rule.__name__]['skipped'], len(sqls))
+        self.assertGreater(sum(counter['skipped'] for counter in counters.values()), 0)
+        # The service rewrites the statements in the current process.
+        with mock.patch('multiprocessing.Pool') as pool:
+            self.assertEqual(rewriter.rewrite_batch(sqls, tableinfo, False, batch_size=5), expected)
+            pool.assert_not_called()
+
 
 if __name__ == '__main__':
     unittest.main()
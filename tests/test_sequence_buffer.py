@@ -11,9 +11,16 @@
 # MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
 # See the Mulan PSL v2 for more details.
 import logging
+import os
+import threading
 
+from dbmind.common.sequence_buffer import LabelIndex
 from dbmind.common.sequence_buffer import SequenceBufferPool
+from dbmind.common.sequence_buffer import SequenceSegmentStore
 from dbmind.common.sequence_buffer import SequenceTree
+from dbmind.common.sequence_buffer import dict_belongs_to
+from dbmind.common.sequence_buffer import frozendict
+from dbmind.common.sequence_buffer import is_dict_matched_regex
 from dbmind.common.types import Sequence
 
 
@@ -217,6 +224,97 @@ def test_buffer_pool():
     only_test_get(6, 6, 1)
 
 
+def test_buffer_pool_with_disk_store(tmp_path):
+    directory = str(tmp_path)
+    labels = {'ip': '127.0.0.1'}
+
+    def fetch(pool, start, end):
+        return pool.get('os_usage_rate', start, end, 1, labels,
+                        lambda s_, e, step_: generate_sequence(s_, e, step_, labels=labels))
+
+    pool = SequenceBufferPool(vacuum_timeout=1000, disk_store=SequenceSegmentStore(directory))
+    fetch(pool, 1, 20)
+    assert latest_fetch_range == (1, 20, 1)
+
+    # Simulate a crash while appending a segment.
+    store = SequenceSegmentStore(directory)
+    series_id, = store.find('os_usage_rate', labels)
+    with open(os.path.join(directory, series_id + store.SEGMENT_SUFFIX), 'ab') as fp:
+        fp.write(b'\x10\x00\x00')
+
+    # A warm restart only fetches the missing range.
+    pool = SequenceBufferPool(vacuum_timeout=1000, disk_store=store)
+    result, = fetch(pool, 5, 30)
+    assert latest_fetch_range == (20, 30, 1)
+    assert result.timestamps == tuple(range(5, 31))
+    assert result.values == tuple(range(5, 31))
+
+    store.evict(10)
+    sequences = SequenceSegmentStore(directory).load(series_id)
+    assert min(s.timestamps[0] for s in sequences) == 10
+    assert max(s.timestamps[-1] for s in sequences) == 30
+
+    store.max_bytes = 0
+    store.evict(10)
+    assert os.listdir(directory) == []
+
+
+def test_buffer_pool_disk_io_without_lock(tmp_path):
+    labels = {'ip': '127.0.0.1'}
+    pool = SequenceBufferPool(vacuum_timeout=1000, disk_store=SequenceSegmentStore(str(tmp_path)))
+    lock_states = []
+
+    def try_lock():
+        lock_states.append(pool._lock.acquire(timeout=0))
+        if lock_states[-1]:
+            pool._lock.release()
+
+    def is_lock_free():
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+        return lock_states[-1]
+
+    class Store(SequenceSegmentStore):
+        def append(self, sequence):
+            assert is_lock_free()
+            return super().append(sequence)
+
+        def find(self, *args, **kwargs):
+            assert is_lock_free()
+            return super().find(*args, **kwargs)
+
+    pool.disk_store = Store(str(tmp_path))
+    pool.get('os_usage_rate', 1, 20, 1, labels,
+             lambda s_, e, step_: generate_sequence(s_, e, step_, labels=labels))
+    assert len(lock_states) == 2
+
+
+def test_label_index():
+    index = LabelIndex()
+    label_sets = [
+        {'from_instance': 'xx.xx.xx.%d:%d' % (i % 7, 5432 + i % 3), 'datname': 'db%d' % (i % 5)}
+        for i in range(100)
+    ]
+    index.update(frozendict(d) for d in label_sets[:50])
+
+    def check(labels, labels_like=None):
+        expected = [frozendict(d) for d in label_sets[:len(index)]
+                    if dict_belongs_to(d, labels) and is_dict_matched_regex(d, labels_like)]
+        assert index.search(labels, labels_like) == list(dict.fromkeys(expected))
+
+    check({})
+    check({'datname': 'db1'})
+    check({'datname': 'db1', 'from_instance': 'xx.xx.xx.1:5432'})
+    check({'datname': 'db_not_exist'})
+    check({}, {'from_instance': 'xx.xx.xx.(1|3)'})
+    check({'datname': 'db2'}, {'from_instance': r'xx.xx.xx.2:5432|xx.xx.xx.4'})
+    # The cached regex results should cover the label sets added later.
+    index.update(frozendict(d) for d in label_sets[50:])
+    check({}, {'from_instance': 'xx.xx.xx.(1|3)'})
+    check({'datname': 'db2'}, {'from_instance': r'xx.xx.xx.2:5432|xx.xx.xx.4'})
+
+
 def test_align_sequence():
     def compare(
             tree_start, tree_end,
@@ -0,0 +1,74 @@
+# Copyright (c) 2022 Huawei Technologies Co.,Ltd.
+#
+# openGauss is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#
+#          http://license.coscl.org.cn/MulanPSL2
+#
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+import random
+
+import pytest
+
+# The sqldiag package depends on the optional gensim.
+pytest.importorskip('gensim')
+
+from dbmind.components.sqldiag.algorithm.sql_similarity import levenshtein
+from dbmind.components.sqldiag.algorithm.sql_similarity.ngram_index import NGramIndex
+
+
+def dp_edit_distance(str1, str2):
+    row = list(range(len(str2) + 1))
+    for i, char1 in enumerate(str1, 1):
+        previous, row[0] = row[0], i
+        for j, char2 in enumerate(str2, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (char1 != char2))
+    return row[-1]
+
+
+def test_edit_distance():
+    assert levenshtein.edit_distance('', '') == 0
+    assert levenshtein.edit_distance('', 'abc') == 3
+    assert levenshtein.edit_distance('abc', '') == 3
+    assert levenshtein.edit_distance('kitten', 'sitting') == 3
+    assert levenshtein.edit_distance('sitting', 'kitten') == 3
+
+    rng = random.Random(0)
+    for _ in range(500):
+        # Long strings exceed the width of a machine word.
+        str1 = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 150)))
+        str2 = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 150)))
+        assert levenshtein.edit_distance(str1, str2) == dp_edit_distance(str1, str2)
+
+    # An exact match is more similar than a difference of one character.
+    assert levenshtein.distance('select a', 'select a') == 1
+    assert levenshtein.distance('select a', 'select b') == 0.5
+    assert levenshtein.distance('', '') == 1
+
+
+def test_ngram_index():
+    index = NGramIndex()
+    templates = ['SELECT a FROM t%d WHERE b = ?' % i for i in range(10)] + \
+                ['SELECT c , d FROM s WHERE e = ?', 'UPDATE s SET c = ? WHERE d = ?']
+    for template in templates:
+        index.add(template)
+    assert len(index) == 12
+
+    # All the templates are returned if there are not more than the limit.
+    assert index.search('SELECT c FROM s', 20) == templates
+    # The limit.
+    assert len(index.search('SELECT a FROM t3 WHERE b = ?', 3)) == 3
+    assert index.search('SELECT a FROM t3 WHERE b = ?', 3)[0] == templates[3]
+    assert index.search('SELECT c , d FROM s WHERE e = ?', 1) == [templates[10]]
+    # Fall back to the common n-grams if every n-gram is too common.
+    assert index.search('SELECT a FROM', 2) == templates[:2]
+    # The templates sharing selective n-grams come first, then the missing slots are filled.
+    assert index.search('SELECT a FROM t3', 3) == [templates[3]] + templates[:2]
+    # No overlap.
+    assert index.search('DELETE FROM x', 2) == templates[:2]
+    assert index.search('INSERT INTO x', 2) == templates[:2]
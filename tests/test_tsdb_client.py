@@ -0,0 +1,113 @@
+# Copyright (c) 2020 Huawei Technologies Co.,Ltd.
+#
+# openGauss is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#
+#          http://license.coscl.org.cn/MulanPSL2
+#
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+import json
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from dbmind.common.exceptions import ApiClientException
+from dbmind.common.tsdb import prometheus_client
+from dbmind.common.tsdb.prometheus_client import PrometheusClient, _iter_result_series
+
+HOSTS = ('127.0.0.1:5432', '127.0.0.2:5432')
+
+
+def make_body(start, end, step):
+    result = []
+    for host in HOSTS:
+        result.append({
+            'metric': {'__name__': 'os_cpu_usage', 'from_instance': host},
+            'values': [[t, str(t % 7)] for t in range(start, end + 1, step)]
+        })
+    return json.dumps({'status': 'success', 'data': {'resultType': 'matrix', 'result': result}})
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.content = body.encode()
+        self.encoding = 'utf-8'
+
+    def iter_content(self, chunk_size=1):
+        # Small pieces to exercise the incremental parser.
+        for i in range(0, len(self.content), 7):
+            yield self.content[i: i + 7]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeSession:
+    requests = []
+    lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def get(self, url, params=None, **kwargs):
+        with FakeSession.lock:
+            FakeSession.requests.append(params)
+        if 'bad' in params['query']:
+            return FakeResponse(400, 'bad query')
+        return FakeResponse(200, make_body(params['start'], params['end'], int(params['step'])))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    FakeSession.requests = []
+    monkeypatch.setattr(prometheus_client, 'create_requests_session', lambda *args: FakeSession())
+    return PrometheusClient('http://127.0.0.1:9090')
+
+
+def test_iter_result_series():
+    body = make_body(0, 100, 10)
+    chunks = [body[i: i + 3] for i in range(0, len(body), 3)]
+    series = list(_iter_result_series(iter(chunks)))
+    assert len(series) == len(HOSTS)
+    assert series[0]['values'][-1] == [100, '2']
+    assert list(_iter_result_series(iter(['{"status":"success","data":{"result": [ ]}}']))) == []
+
+
+def test_get_metric_range_data_in_chunks(client):
+    start_time = datetime.fromtimestamp(1600000000)
+    end_time = start_time + timedelta(hours=1)
+    whole = client.get_metric_range_data('os_cpu_usage', start_time=start_time, end_time=end_time, step=15)
+    assert len(FakeSession.requests) == 1
+
+    FakeSession.requests = []
+    chunked = client.get_metric_range_data('os_cpu_usage', start_time=start_time, end_time=end_time,
+                                           chunk_size=timedelta(minutes=7), step=15)
+    assert len(FakeSession.requests) == 9
+    assert sorted(whole, key=lambda s: s.labels['from_instance']) == \
+        sorted(chunked, key=lambda s: s.labels['from_instance'])
+    for sequence in chunked:
+        assert sequence.name == 'os_cpu_usage'
+        assert len(sequence) == 3600 // 15 + 1
+
+    # Split automatically due to the limit of points per series.
+    FakeSession.requests = []
+    long_end_time = start_time + timedelta(seconds=prometheus_client.MAX_POINTS_PER_SERIES * 2)
+    sequences = client.get_metric_range_data('os_cpu_usage', start_time=start_time,
+                                             end_time=long_end_time, step=1)
+    assert len(FakeSession.requests) == 3
+    assert all(len(s) == prometheus_client.MAX_POINTS_PER_SERIES * 2 + 1 for s in sequences)
+
+    with pytest.raises(ApiClientException):
+        client.get_metric_range_data('bad', start_time=start_time, end_time=end_time, step=15)
@@ -91,3 +91,58 @@ def test_sequence():
     assert s9.timestamps == (0, 3, 6, 9, 12, 15, 18, 21, 24, 27)
     s10 = s9[4, 13]
     assert s10.timestamps == (6, 9, 12)
+
+
+def test_columnar_sequence():
+    import numpy as np
+
+    s1 = Sequence(np.array((10, 20, 30, 40, 50)), np.array((1, 2, 3, 4, 5)), columnar=True)
+    assert s1.columnar
+    assert s1.timestamps == (10, 20, 30, 40, 50)
+    assert s1.values == (1, 2, 3, 4, 5)
+    assert s1.values_array.dtype == np.float64 and s1.timestamps_array.dtype == np.int64
+    assert len(s1) == 5 and s1.step == 10
+    assert s1[30] == 3
+    assert s1[1] is None
+    assert s1 == Sequence((10, 20, 30, 40, 50), (1, 2, 3, 4, 5))
+
+    sub1 = s1[20, 40]
+    assert sub1.timestamps == (20, 30, 40) and sub1.values == (2, 3, 4)
+    assert np.shares_memory(sub1.values_array, s1.values_array)
+    assert len(sub1[100, 111]) == 0
+    assert sub1[40, 80][40, 40].values == (4,)
+    # Immutable: the array view cannot be modified.
+    try:
+        sub1.values_array[0] = 100
+        assert False
+    except ValueError:
+        pass
+    assert s1[20] == 2
+
+    for invalid in (((1, 2, 2), (1, 2, 3)), ((3, 2, 1), (1, 2, 3)), ((1.5, 2), (1, 2)), ((1, 2), (1,))):
+        try:
+            Sequence(*invalid, columnar=True)
+            assert False
+        except ValueError:
+            pass
+
+    s8 = Sequence((1, 3, 5, 7, 8, 9), (1, 1, 1, 1, 1, 1), align_timestamp=True, columnar=True)
+    assert s8.timestamps == (1, 3, 5, 7, 9, 11)
+
+    s1 = Sequence((1, 2, 3, 4), (1, 2, 3, 4), columnar=True)
+    s2 = Sequence((4, 5, 6), (4, 2, 3), columnar=True)
+    s4 = Sequence((5, 7), (3, 4), columnar=True)
+    s5 = Sequence((6, 8), (3, 4), columnar=True)
+    s6 = Sequence((1, 3, 5, 7), (1, 1, 1, 1), columnar=True)
+    s7 = Sequence((9, 11, 13), (1, 1, 1), columnar=True)
+    assert (s1 + s2).columnar
+    assert Sequence((1, 2, 3, 4, 5, 6), (1, 2, 3, 4, 2, 3)) == s1 + s2
+    assert Sequence((1, 3, 5, 7), (1, 1, 3, 4)) == s4 + s6
+    assert Sequence((5, 7, 9, 11, 13), (3, 4, 1, 1, 1)) == s4 + s7
+    try:
+        s5 + s4
+    except TypeError as e:
+        assert 'unaligned' in str(e)
+    # Mixed modes fall back to the tuple implementation.
+    assert Sequence((1, 2, 3, 4, 5, 6), (1, 2, 3, 4, 2, 3)) == Sequence((1, 2, 3, 4), (1, 2, 3, 4)) + s2
+    assert Sequence((1, 2, 3), (4, 5, 6)).to_columnar().copy() == Sequence((1, 2, 3), (4, 5, 6))
@@ -0,0 +1,125 @@
+# Copyright (c) 2020 Huawei Technologies Co.,Ltd.
+#
+# openGauss is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#
+#          http://license.coscl.org.cn/MulanPSL2
+#
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+import re
+import unittest
+from unittest import mock
+
+import psycopg2
+
+from dbmind.components.xtuner.tuner.db_agent import DB_Agent
+from dbmind.components.xtuner.tuner.exceptions import ExecutionError
+from dbmind.components.xtuner.tuner.knob import RecommendedKnobs, Knob
+
+
+class FakeSSH:
+    def __init__(self, settings):
+        self.settings = settings
+        self.commands = []
+        self.exit_status = 0
+
+    def exec_command_sync(self, command, timeout=None):
+        self.commands.append(command)
+        if command.startswith('gs_guc reload'):
+            for name, value in re.findall(r'-c "(\w+)=([^"]*)"', command):
+                self.settings[name] = (value, self.settings.get(name, ('', ('0', '100')))[1])
+            return 'Success to perform gs_guc!', ''
+        names = re.findall(r"'(\w+)'", command)
+        columns = [column.strip() for column in re.search(r'SELECT (.*) FROM', command).group(1).split(',')]
+        rows = [columns]
+        for name in names:
+            if name in self.settings:
+                value, (min_val, max_val) = self.settings[name]
+                row = dict(name=name, setting=value, min_val=min_val, max_val=max_val)
+                rows.append([row[column] for column in columns])
+        # Output aligned like gsql.
+        lines = ['|'.join(' %-16s' % column for column in row) for row in rows]
+        lines.insert(1, '+'.join('-' * 17 for _ in rows[0]))
+        lines.append('(%d rows)' % (len(rows) - 1))
+        return '\n'.join(lines), ''
+
+
+class TestDBAgent(unittest.TestCase):
+    def setUp(self):
+        self.ssh = FakeSSH({'work_mem': ('64', ('0', '128')),
+                            'shared_buffers': ('32', ('0', '128')),
+                            'enable_seqscan': ('on', ('', ''))})
+        with mock.patch.object(DB_Agent, 'check_connection_params'), \
+                mock.patch.object(DB_Agent, 'connect'), \
+                mock.patch('dbmind.components.xtuner.tuner.db_agent.ExecutorFactory') as factory:
+            factory.return_value.set_host.return_value.set_user.return_value.set_pwd.return_value \
+                .set_port.return_value.get_executor.return_value = self.ssh
+            self.agent = DB_Agent('127.0.0.1', 'omm', 'pwd', 'omm', 'pwd', 'postgres', 5432)
+        self.agent.data_path = '/data'
+        knobs = RecommendedKnobs()
+        knobs.append_need_tune_knobs(Knob('work_mem', type='int', min=0, max=128),
+                                     Knob('shared_buffers', type='int', min=0, max=128, restart=True),
+                                     Knob('enable_seqscan', type='bool'))
+        self.agent.set_tuning_knobs(knobs)
+        self.ssh.commands.clear()
+
+    def test_get_knob_normalized_vector(self):
+        # The knobs are ordered by name.
+        self.assertEqual(self.agent.get_knob_normalized_vector(), [1., 0.25, 0.5])
+        # All knobs are fetched by one query.
+        self.assertEqual(len(self.ssh.commands), 1)
+
+    def test_set_knob_normalized_vector(self):
+        with mock.patch.object(DB_Agent, 'restart') as restart:
+            # Nothing changes.
+            self.agent.set_knob_normalized_vector([1., 0.25, 0.5])
+            self.assertEqual(self.ssh.commands, [])
+            # Knobs without restart change.
+            self.agent.set_knob_normalized_vector([0., 0.25, 0.75])
+            self.assertEqual(len(self.ssh.commands), 1)
+            self.assertIn('-c "enable_seqscan=off" -c "work_mem=96" -D', self.ssh.commands[0])
+            restart.assert_not_called()
+            # A knob requiring restart changes.
+            self.agent.set_knob_normalized_vector([0., 0.5, 0.75])
+            self.assertEqual(len(self.ssh.commands), 2)
+            self.assertIn('-c "shared_buffers=64" -D', self.ssh.commands[1])
+            restart.assert_called_once()
+        self.assertEqual(self.agent.get_knob_normalized_vector(), [0., 0.5, 0.75])
+
+    def test_exec_statement_in_session(self):
+        cursor = mock.MagicMock()
+        cursor.__enter__.return_value = cursor
+        cursor.description = [('setting',)]
+        cursor.fetchall.return_value = [(64, None)]
+        conn = mock.MagicMock()
+        conn.cursor.return_value = cursor
+        broken_conn = mock.MagicMock()
+        broken_conn.cursor.side_effect = psycopg2.OperationalError
+        self.agent.conn = broken_conn
+
+        def connect():
+            self.agent.conn = conn
+            return True
+
+        with mock.patch.object(self.agent, 'connect', side_effect=connect) as reconnect:
+            # Reconnect if the session is broken, and the rows are in the same form as gsql.
+            self.assertEqual(self.agent.exec_statement('SELECT 1;'), [('64', '')])
+            reconnect.assert_called_once()
+        self.assertEqual(self.ssh.commands, [])
+
+        # A statement timeout doesn't mean the session is broken, so it isn't retried.
+        conn.cursor.side_effect = psycopg2.extensions.QueryCanceledError
+        with mock.patch.object(self.agent, 'connect') as reconnect:
+            with self.assertRaises(ExecutionError), self.assertLogs(level='ERROR'):
+                self.agent.exec_statement('SELECT pg_sleep(2);', timeout=1)
+            reconnect.assert_not_called()
+        self.assertEqual(conn.cursor.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+# Copyright (c) 2020 Huawei Technologies Co.,Ltd.
+#
+# openGauss is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#
+#          http://license.coscl.org.cn/MulanPSL2
+#
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY KIND,
+# EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO NON-INFRINGEMENT,
+# MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from dbmind.components.xtuner.tuner.history import TuningHistory
+from dbmind.components.xtuner.tuner.knob import RecommendedKnobs, Knob
+from dbmind.components.xtuner.tuner.xtuner import global_search
+
+
+class FakeDB:
+    ordered_knob_list = ['knob1', 'knob2']
+
+
+class FakeEnv:
+    def __init__(self):
+        self.db = FakeDB()
+        self.nb_actions = len(self.db.ordered_knob_list)
+        self.mem_penalty = 0
+        self.steps = 0
+
+    def step(self, action):
+        self.steps += 1
+        reward = -float(np.sum((np.asarray(action) - 0.3) ** 2))
+        return None, reward, False, {}
+
+
+class TestGlobalSearch(unittest.TestCase):
+    def test_tuning_history(self):
+        knobs = RecommendedKnobs()
+        knobs.append_need_tune_knobs(Knob('knob1', type='int', min=0, max=100),
+                                     Knob('knob2', type='bool'))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'history.json')
+            history = TuningHistory(path, context={'db_name': 'db1'})
+            history.append(['knob1', 'knob2'], ['50', 'on'], 10., 1024)
+            history.append(['knob1'], ['20'], 20., 1024)
+            TuningHistory(path, context={'db_name': 'db2'}).append(['knob1', 'knob2'], ['0', 'off'], 30., 1024)
+            self.assertEqual(history.load(knobs, ['knob1', 'knob2']), [([0.5, 1.], 10., 1024.)])
+
+    def test_global_search_with_seeds(self):
+        np.random.seed(0)
+        observations = [(list(vector), -float(np.sum((vector - 0.3) ** 2)), 0)
+                        for vector in np.random.uniform(0, 1, (20, 2))]
+        config = {'gop_algorithm': 'pso', 'max_iterations': 60, 'particle_nums': 3, 'surrogate_screening': False}
+        env = FakeEnv()
+        global_search(env, config, observations)
+        benchmarked_steps = env.steps
+
+        config['surrogate_screening'] = True
+        env = FakeEnv()
+        global_search(env, config, observations)
+        # The surrogate model skips benchmarking the unpromising knobs.
+        self.assertLess(env.steps, benchmarked_steps)
+
+
+if __name__ == '__main__':
+    unittest.main()